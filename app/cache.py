@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+import hashlib
+import json
+import os
+import threading
+import time
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024")) # serialized responses kept per process
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60")) # seconds a response is served before it is read again
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    expires: float
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL, clock=time.monotonic):
+        """
+        In-process LRU cache of serialized JSON responses, each kept for at most ttl seconds.
+        Writes invalidate the entries they change in this process, the TTL bounds how long
+        other API processes can serve an entry that was invalidated elsewhere.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.expires <= self.clock():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, data) -> CachedResponse:
+        """
+        Serializes data (anything FastAPI can encode) once and keeps it under key.
+        """
+        body = json.dumps(jsonable_encoder(data)).encode()
+        entry = CachedResponse(body, make_etag(body), self.clock() + self.ttl)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix: str):
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    True when an If-None-Match header lists etag (weak comparison) or is *.
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+def respond(request: Request, entry: CachedResponse) -> Response:
+    """
+    The cached body, or an empty 304 when the client already holds it.
+    no-cache lets clients keep the body but revalidate it every time, which costs no database query.
+    """
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if not_modified(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+# Keys of cached responses
+def simulation_key(id: int) -> str:
+    return f"simulation/{id}"
+
+SIMULATIONS_PREFIX = "simulations?"
+
+def simulations_key(after_id: Optional[int], limit: Optional[int]) -> str:
+    return f"{SIMULATIONS_PREFIX}after_id={after_id}&limit={limit}"
+
+
+responses = ResponseCache()
@@ -1,16 +1,68 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 
 import os
 
-DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+def normalize_url(url: str, driver: str = None) -> str:
+    """
+    Accepts postgres:// URLs (as in docker-compose) and optionally forces a driver,
+    e.g. normalize_url("postgres://u:p@db/sim", "asyncpg") -> "postgresql+asyncpg://u:p@db/sim"
+    """
+    if url is None:
+        return None
+    scheme, rest = url.split("://", 1)
+    if scheme in ("postgres", "postgresql") or scheme.startswith("postgresql+"):
+        scheme = f"postgresql+{driver}" if driver else ("postgresql" if scheme == "postgres" else scheme)
+    return f"{scheme}://{rest}"
+
+
+# Pool configuration, shared by the sync and async engines
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # seconds, -1 to disable
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500")) # prepared statements per asyncpg connection
+
+POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+DATABASE_URL = normalize_url(os.getenv("DATABASE_URL"))
+
+engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+# Async engine (asyncpg by default), created on first use so the sync API works without asyncpg installed
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or normalize_url(os.getenv("DATABASE_URL"), "asyncpg")
+
+async_engine = None
+AsyncSessionLocal = None
+
+def get_async_engine():
+    global async_engine, AsyncSessionLocal
+    if async_engine is None:
+        connect_args = {}
+        if ASYNC_DATABASE_URL.startswith("postgresql+asyncpg"):
+            connect_args["statement_cache_size"] = DB_STATEMENT_CACHE_SIZE
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args=connect_args, **POOL_OPTIONS)
+        AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    return async_engine
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,128 @@
+from typing import Iterator, List
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # export is optional for the API
+    pa = None
+    pq = None
+
+from models import SimulationMetadata, ElevatorRequest
+
+EXPORT_BATCH_SIZE = 50000 # rows per record batch / row group
+
+# Exported columns: request features and label, then the parameters of their simulation
+REQUEST_COLUMNS = [
+    "id", "simulation_id", "elevator_id", "current_floor", "last_floor", "time_idle", "timestamp",
+    "hot_floor_last_30s", "requests_entropy", "mean_requested_floor", "distance_to_center_of_mass",
+    "requests_entropy_last_30s", "request_rate_last_30s", "next_floor_requested",
+]
+SIMULATION_COLUMNS = [
+    "wait_time", "elevator_speed", "expo_lambda", "start_datetime", "duration",
+    "base_floor", "base_floor_weight", "floor_min", "floor_max", "random_seed", "elevators",
+    "dispatch_policy",
+]
+
+
+def export_columns():
+    """
+    Columns selected for the export, requests joined with their simulation.
+    """
+    return (
+        [getattr(ElevatorRequest, name) for name in REQUEST_COLUMNS]
+        + [ElevatorRequest.floor_demand_histogram]
+        + [getattr(SimulationMetadata, name) for name in SIMULATION_COLUMNS]
+    )
+
+
+def export_schema(width: int):
+    """
+    Arrow schema of the export, the histogram is expanded into width columns demand_floor_<k>,
+    where k is the floor relative to floor_min (shorter histograms are padded with zeros).
+    """
+    columns = ElevatorRequest.__table__.c
+    sim_columns = SimulationMetadata.__table__.c
+    fields = [pa.field(name, arrow_type(columns[name].type)) for name in REQUEST_COLUMNS]
+    fields += [pa.field(f"demand_floor_{k}", pa.int32()) for k in range(width)]
+    fields += [pa.field(name, arrow_type(sim_columns[name].type)) for name in SIMULATION_COLUMNS]
+    return pa.schema(fields)
+
+
+def arrow_type(sql_type):
+    """
+    Arrow type of a scalar column of the models.
+    """
+    python_type = sql_type.python_type
+    if python_type is int:
+        return pa.int32()
+    if python_type is float:
+        return pa.float64()
+    if python_type is str:
+        return pa.string()
+    return pa.timestamp("us")
+
+
+def to_record_batch(rows: List[dict], schema, width: int):
+    """
+    Builds a record batch from joined rows, expanding the histograms into a fixed-width block.
+    """
+    columns = {name: [row[name] for row in rows] for name in REQUEST_COLUMNS + SIMULATION_COLUMNS}
+
+    histograms = np.zeros((len(rows), width), dtype=np.int32)
+    for i, row in enumerate(rows):
+        histogram = row["floor_demand_histogram"][:width]
+        histograms[i, :len(histogram)] = histogram
+    for k in range(width):
+        columns[f"demand_floor_{k}"] = histograms[:, k]
+
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+class ChunkSink:
+    """
+    Write-only file object that keeps what was written until drained,
+    lets a writer's output be streamed chunk by chunk.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_export(row_batches: Iterator[List[dict]], width: int, fmt: str) -> Iterator[bytes]:
+    """
+    Encodes batches of joined rows as an Arrow IPC stream or a Parquet file, yielding bytes as they are ready.
+    """
+    schema = export_schema(width)
+    sink = ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    for rows in row_batches:
+        writer.write_batch(to_record_batch(rows, schema, width))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
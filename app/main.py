@@ -1,11 +1,41 @@
-from fastapi import FastAPI
-from routes import router
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from routes import router, async_router
+from metrics import metrics, instrument_database
+import time
+import write_behind
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Flush rows still in the write-behind buffer
+    write_behind.shutdown()
+
 
 app = FastAPI(
     title="elevator-sim API",
     description="Stores simulation metadata and elevator requests for model training",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
+instrument_database()
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """
+    Times every request by route, up to the response headers (streamed bodies are not included).
+    """
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    metrics.observe_request(f"{request.method} {path}", time.perf_counter() - start, response.status_code)
+    return response
+
+
 # Include the endpoints
 app.include_router(router)
+app.include_router(async_router)
@@ -0,0 +1,96 @@
+from bisect import bisect_left
+from typing import Dict
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds (seconds) of the latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        """
+        Fixed bucket histogram of durations in seconds, with count, sum and max.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self) -> dict:
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "max": self.max,
+            "buckets": dict(zip(bounds, self.counts)),
+        }
+
+
+class APIMetrics:
+    def __init__(self):
+        """
+        Latency of the API since the process started: per route (method and path template)
+        and per database statement. Shared by the worker threads, updates take a lock.
+        """
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests: Dict[str, LatencyHistogram] = {}
+        self.errors: Dict[str, int] = {} # route -> responses with status >= 500
+        self.db = LatencyHistogram()
+
+    def observe_request(self, route: str, seconds: float, status_code: int):
+        with self.lock:
+            if route not in self.requests:
+                self.requests[route] = LatencyHistogram()
+                self.errors[route] = 0
+            self.requests[route].observe(seconds)
+            if status_code >= 500:
+                self.errors[route] += 1
+
+    def observe_db(self, seconds: float):
+        with self.lock:
+            self.db.observe(seconds)
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {
+                "uptime_seconds": time.time() - self.started,
+                "requests": {
+                    route: {**histogram.as_dict(), "errors": self.errors[route]}
+                    for route, histogram in sorted(self.requests.items())
+                },
+                "db": self.db.as_dict(),
+            }
+
+
+metrics = APIMetrics()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics.observe_db(time.perf_counter() - conn.info["query_start"].pop())
+
+
+def instrument_database():
+    """
+    Times every statement sent by any engine, sync or async (their statements run on a sync Engine).
+    """
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
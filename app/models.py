@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, Index, String, JSON
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -10,6 +10,11 @@ class SimulationMetadata(Base):
     Parameters can be used to reproduce a simulation or provide extra features.
     """
     __tablename__ = "simulations"
+    __table_args__ = (
+        # Simulation parameter ranges of filtered queries and exports
+        Index("ix_simulations_expo_lambda", "expo_lambda"),
+        Index("ix_simulations_floor_max", "floor_max"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
@@ -24,6 +29,8 @@ class SimulationMetadata(Base):
     floor_min = Column(Integer, nullable=False)
     floor_max = Column(Integer, nullable=False)
     random_seed = Column(Integer, nullable=False)  # for reproducibility
+    elevators = Column(Integer, nullable=False, server_default="1")  # cars in the bank
+    dispatch_policy = Column(String, nullable=False, server_default="fifo")  # fifo, scan, look or nearest
 
     # 1-N relationship with requests
     requests = relationship("ElevatorRequest", back_populates="simulation")
@@ -36,10 +43,21 @@ class ElevatorRequest(Base):
     Each record belongs to a single simulation.
     """
     __tablename__ = "elevator_requests"
+    __table_args__ = (
+        # Reads are always scoped to a simulation: keyset pages by id, time ranges by timestamp
+        Index("ix_elevator_requests_simulation_id_id", "simulation_id", "id"),
+        Index("ix_elevator_requests_simulation_id_timestamp", "simulation_id", "timestamp"),
+        # Filtered queries across simulations (GET /elevator_requests/query)
+        Index("ix_elevator_requests_timestamp", "timestamp"),
+        Index("ix_elevator_requests_next_floor_requested", "next_floor_requested"),
+        Index("ix_elevator_requests_current_floor", "current_floor"),
+        Index("ix_elevator_requests_time_idle", "time_idle"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
     # State features
+    elevator_id = Column(Integer, nullable=False, server_default="0")  # car of the bank, 0 to elevators - 1
     current_floor = Column(Integer, nullable=False)
     last_floor = Column(Integer, nullable=False)
     time_idle = Column(Float, nullable=False)
@@ -51,6 +69,8 @@ class ElevatorRequest(Base):
     requests_entropy = Column(Float, nullable=True)
     mean_requested_floor = Column(Float, nullable=True)
     distance_to_center_of_mass = Column(Float, nullable=True)
+    requests_entropy_last_30s = Column(Float, nullable=True)
+    request_rate_last_30s = Column(Float, nullable=True)  # req/sec
 
     # Label
     next_floor_requested = Column(Integer, nullable=True)
@@ -58,3 +78,28 @@ class ElevatorRequest(Base):
     # N-1 relationship with simulation
     simulation_id = Column(Integer, ForeignKey("simulations.id"), nullable=False)
     simulation = relationship("SimulationMetadata", back_populates="requests")
+
+
+class SimulationStats(Base):
+    """
+    Summary of the requests of a simulation, computed from elevator_requests (see stats.py).
+    Every ingestion into the simulation bumps the version, the summary is current while it was
+    computed at that version and is rebuilt on the next read otherwise, so finished simulations are summarized once.
+    """
+    __tablename__ = "simulation_stats"
+
+    simulation_id = Column(Integer, ForeignKey("simulations.id"), primary_key=True)
+    version = Column(Integer, nullable=False, server_default="0")
+    refreshed_version = Column(Integer, nullable=True)  # version the summary was computed at, null before the first one
+
+    # Summary, null until first computed
+    row_count = Column(Integer, nullable=True)
+    labeled_count = Column(Integer, nullable=True)  # rows with next_floor_requested
+    time_idle_mean = Column(Float, nullable=True)
+    time_idle_min = Column(Float, nullable=True)
+    time_idle_max = Column(Float, nullable=True)
+    first_timestamp = Column(DateTime, nullable=True)
+    last_timestamp = Column(DateTime, nullable=True)
+    label_distribution = Column(JSON, nullable=True)  # [{"floor", "count", "share"}] by floor
+    floor_demand_totals = Column(ARRAY(Integer), nullable=True)  # demand histogram of the last snapshot
+    refreshed_at = Column(DateTime, nullable=True)
@@ -0,0 +1,44 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import os
+
+# "list": elevator_requests is partitioned by simulation_id (migration 0003), one partition per simulation
+# "none": plain table
+ELEVATOR_REQUESTS_PARTITIONING = os.getenv("ELEVATOR_REQUESTS_PARTITIONING", "none")
+
+
+def partition_name(simulation_id: int) -> str:
+    return f"elevator_requests_sim_{int(simulation_id)}"
+
+
+def create_partition_statement(simulation_id: int):
+    """
+    DDL creating the partition of a new simulation, its rows would go to the default partition otherwise.
+    None when the table is not partitioned.
+    """
+    if ELEVATOR_REQUESTS_PARTITIONING != "list":
+        return None
+    return text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(simulation_id)} "
+        f"PARTITION OF elevator_requests FOR VALUES IN ({int(simulation_id)})"
+    )
+
+
+def create_partition(db: Session, simulation_id: int):
+    statement = create_partition_statement(simulation_id)
+    if statement is not None:
+        db.execute(statement)
+
+
+def drop_requests(db: Session, simulation_id: int):
+    """
+    Removes every request of a simulation: drops its partition in O(1) when partitioned,
+    deletes its rows (through the simulation_id index) otherwise.
+    Rows of a partitioned simulation that landed in the default partition are deleted too.
+    """
+    if ELEVATOR_REQUESTS_PARTITIONING == "list":
+        db.execute(text(f"DROP TABLE IF EXISTS {partition_name(simulation_id)}"))
+        db.execute(text("DELETE FROM elevator_requests_default WHERE simulation_id = :sim_id"), {"sim_id": simulation_id})
+    else:
+        db.execute(text("DELETE FROM elevator_requests WHERE simulation_id = :sim_id"), {"sim_id": simulation_id})
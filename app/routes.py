@@ -1,63 +1,430 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select, func
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Literal, Union
+from datetime import datetime
+import json
 
 from models import SimulationMetadata, ElevatorRequest
-from schemas import SimulationCreate, SimulationOut, ElevatorRequestCreate, ElevatorRequestOut
-from db import get_db
+from schemas import (
+  SimulationCreate, SimulationOut, ElevatorRequestCreate, ElevatorRequestOut, BulkInsertOut, IngestAck, SimulationStatsOut,
+)
+from db import get_db, get_async_db, SessionLocal
+import cache
+import export
+import metrics
+import partitioning
+import stats
+import write_behind
+
+MAX_PAGE_SIZE = 10000 # max rows per page of elevator requests
+STREAM_BATCH_SIZE = 5000 # rows fetched per round trip from the server-side cursor
 
 router = APIRouter()
 
+# Same endpoints on async sessions, ingestion does not hold a threadpool worker while waiting on the database
+async_router = APIRouter(prefix="/async")
+
 # Simulation endpoints ---
 
 @router.post("/simulation", response_model=SimulationOut)
 def create_simulation(sim_data: SimulationCreate, db: Session = Depends(get_db)):
   """
-  Create a single simulation object
+  Create a single simulation object, with its partition in the same transaction
+  so a failed partition never leaves a simulation behind
   """
   sim = SimulationMetadata(**sim_data.dict())
   db.add(sim)
+  db.flush() # assigns the id
+  partitioning.create_partition(db, sim.id)
   db.commit()
   db.refresh(sim)
+  cache.responses.invalidate_prefix(cache.SIMULATIONS_PREFIX)
   return sim
 
 
 @router.get("/simulations", response_model=List[SimulationOut])
-def get_simulations(db: Session = Depends(get_db)):
+def get_simulations(
+  request: Request,
+  after_id: Optional[int] = None,
+  limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+  db: Session = Depends(get_db),
+):
   """
-  Read all available simulations 
+  Read available simulations by id, all of them by default or a page of limit simulations after after_id.
+  Pages are cached serialized with an ETag until a simulation is created or deleted, If-None-Match gets a 304.
   """
-  return db.query(SimulationMetadata).all()
+  key = cache.simulations_key(after_id, limit)
+  entry = cache.responses.get(key)
+  if entry is None:
+      query = db.query(SimulationMetadata).order_by(SimulationMetadata.id)
+      if after_id is not None:
+          query = query.filter(SimulationMetadata.id > after_id)
+      if limit is not None:
+          query = query.limit(limit)
+      entry = cache.responses.put(key, [SimulationOut.model_validate(sim, from_attributes=True) for sim in query.all()])
+  return cache.respond(request, entry)
 
 
 @router.get("/simulation/{id}", response_model=SimulationOut)
-def get_simulation(id: int, db: Session = Depends(get_db)):
+def get_simulation(id: int, request: Request, db: Session = Depends(get_db)):
+  """
+  Read a specific simulation, cached serialized with an ETag (simulations are never updated)
+  """
+  entry = cache.responses.get(cache.simulation_key(id))
+  if entry is None:
+      sim = db.query(SimulationMetadata).filter(SimulationMetadata.id == id).first()
+      if not sim:
+          raise HTTPException(status_code=404, detail="Simulation not found")
+      entry = cache.responses.put(cache.simulation_key(id), SimulationOut.model_validate(sim, from_attributes=True))
+  return cache.respond(request, entry)
+
+
+@router.delete("/simulation/{id}", response_model=SimulationOut)
+def delete_simulation(id: int, db: Session = Depends(get_db)):
   """
-  Read a specific simulation
+  Delete a simulation and all its requests, a partition drop when elevator_requests is partitioned
   """
   sim = db.query(SimulationMetadata).filter(SimulationMetadata.id == id).first()
   if not sim:
       raise HTTPException(status_code=404, detail="Simulation not found")
-  return sim
+  deleted = SimulationOut.model_validate(sim, from_attributes=True)
+  stats.remove(db, [id])
+  partitioning.drop_requests(db, id)
+  db.delete(sim)
+  db.commit()
+  cache.responses.invalidate(cache.simulation_key(id))
+  cache.responses.invalidate_prefix(cache.SIMULATIONS_PREFIX)
+  return deleted
+
+
+@router.get("/simulations/stats", response_model=List[SimulationStatsOut])
+def get_simulations_stats(simulation_ids: Optional[List[int]] = Query(None), db: Session = Depends(get_db)):
+  """
+  Summary of the requests of many simulations (all of them by default), one row per simulation.
+  Served from the simulation_stats table, summaries invalidated by an ingestion are rebuilt in grouped queries.
+  """
+  return stats.get_stats(db, simulation_ids)
+
+
+@router.get("/simulation/{id}/stats", response_model=SimulationStatsOut)
+def get_simulation_stats(id: int, db: Session = Depends(get_db)):
+  """
+  Summary of the requests of a simulation: row counts, idle time, label distribution and demand per floor,
+  computed by the database (see stats.py) instead of downloading its rows
+  """
+  summaries = stats.get_stats(db, [id])
+  if not summaries:
+      raise HTTPException(status_code=404, detail="Simulation not found")
+  return summaries[0]
 
 
 # Requests endpoints ---
 
-@router.post("/elevator_request", response_model=ElevatorRequestOut)
+@router.post("/elevator_request", response_model=Union[ElevatorRequestOut, IngestAck])
 def create_elevator_request(req_data: ElevatorRequestCreate, db: Session = Depends(get_db)):
   """
-  Creates a single request
+  Creates a single request.
+  With write-behind enabled (WRITE_BEHIND_MODE) the row is coalesced with others into a multi-row INSERT,
+  and an acknowledgement is returned once committed (durable) or once queued (immediate).
   """
+  if write_behind.WRITE_BEHIND_MODE != "off":
+    future = write_behind.get_buffer().submit(req_data.dict())
+    if write_behind.WRITE_BEHIND_MODE == "durable":
+      future.result()
+      return {"status": "committed"}
+    return {"status": "queued"}
+
   req = ElevatorRequest(**req_data.dict())
   db.add(req)
+  stats.invalidate(db, [req_data.simulation_id])
   db.commit()
   db.refresh(req)
   return req
 
 
+@router.post("/elevator_requests/bulk", response_model=BulkInsertOut)
+def create_elevator_requests_bulk(reqs_data: List[ElevatorRequestCreate], db: Session = Depends(get_db)):
+  """
+  Creates many requests in a single transaction.
+  Rows are sent as one executemany, which the postgres driver turns into multi-row INSERTs,
+  so there is a single commit and no refresh per row.
+  """
+  if not reqs_data:
+    return {"inserted": 0}
+
+  db.execute(insert(ElevatorRequest), [req_data.dict() for req_data in reqs_data])
+  stats.invalidate(db, [req_data.simulation_id for req_data in reqs_data])
+  db.commit()
+  return {"inserted": len(reqs_data)}
+
+
 @router.get("/elevator_request/{sim_id}", response_model=List[ElevatorRequestOut])
-def get_requests_for_simulation(sim_id: int, db: Session = Depends(get_db)):
+def get_requests_for_simulation(
+  sim_id: int,
+  after_id: Optional[int] = None,
+  limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+  db: Session = Depends(get_db)
+):
+  """
+  Read requests that correspond to a specific simulation, ordered by id.
+  Keyset pagination: pass the id of the last row received as after_id to get the next page of size limit.
+  Without limit all rows are returned.
+  """
+  query = db.query(ElevatorRequest).filter(ElevatorRequest.simulation_id == sim_id)
+  if after_id is not None:
+    query = query.filter(ElevatorRequest.id > after_id)
+  query = query.order_by(ElevatorRequest.id)
+  if limit is not None:
+    query = query.limit(limit)
+  return query.all()
+
+
+@router.get("/elevator_requests/query")
+def query_requests(
+  columns: Optional[List[str]] = Query(None),
+  simulation_ids: Optional[List[int]] = Query(None),
+  start: Optional[datetime] = None,
+  end: Optional[datetime] = None,
+  current_floor: Optional[int] = None,
+  next_floor_requested: Optional[int] = None,
+  min_time_idle: Optional[float] = None,
+  max_time_idle: Optional[float] = None,
+  min_expo_lambda: Optional[float] = None,
+  max_expo_lambda: Optional[float] = None,
+  min_floor_max: Optional[int] = None,
+  max_floor_max: Optional[int] = None,
+  min_elevator_speed: Optional[float] = None,
+  max_elevator_speed: Optional[float] = None,
+  after_id: Optional[int] = None,
+  limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+  db: Session = Depends(get_db)
+):
+  """
+  Requests matching every given filter, ordered by id, with only the selected columns (all by default, id always).
+  Filters are pushed into the SQL query: timestamp range [start, end), floors, time_idle bounds, and ranges of
+  simulation parameters, which join simulations only when used. Keyset pagination as /elevator_request/{sim_id}.
+  """
+  table = ElevatorRequest.__table__
+  names = columns or list(table.c.keys())
+  unknown = [name for name in names if name not in table.c]
+  if unknown:
+    raise HTTPException(status_code=422, detail=f"Unknown columns: {unknown}")
+  selected = [table.c.id] + [table.c[name] for name in names if name != "id"]
+
+  conditions = []
+  if simulation_ids:
+    conditions.append(table.c.simulation_id.in_(simulation_ids))
+  if start is not None:
+    conditions.append(table.c.timestamp >= start)
+  if end is not None:
+    conditions.append(table.c.timestamp < end)
+  if current_floor is not None:
+    conditions.append(table.c.current_floor == current_floor)
+  if next_floor_requested is not None:
+    conditions.append(table.c.next_floor_requested == next_floor_requested)
+  if min_time_idle is not None:
+    conditions.append(table.c.time_idle >= min_time_idle)
+  if max_time_idle is not None:
+    conditions.append(table.c.time_idle <= max_time_idle)
+  if after_id is not None:
+    conditions.append(table.c.id > after_id)
+
+  simulation_conditions = []
+  for column, low, high in (
+    (SimulationMetadata.expo_lambda, min_expo_lambda, max_expo_lambda),
+    (SimulationMetadata.floor_max, min_floor_max, max_floor_max),
+    (SimulationMetadata.elevator_speed, min_elevator_speed, max_elevator_speed),
+  ):
+    if low is not None:
+      simulation_conditions.append(column >= low)
+    if high is not None:
+      simulation_conditions.append(column <= high)
+
+  stmt = select(*selected)
+  if simulation_conditions:
+    stmt = stmt.join_from(table, SimulationMetadata, table.c.simulation_id == SimulationMetadata.id)
+  stmt = stmt.where(*conditions, *simulation_conditions).order_by(table.c.id).limit(limit)
+  return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+@router.get("/elevator_request/{sim_id}/stream")
+def stream_requests_for_simulation(sim_id: int, after_id: Optional[int] = None):
+  """
+  Streams all requests of a simulation as NDJSON (one JSON object per line), ordered by id.
+  Rows come from a server-side cursor in batches and are serialized without ORM objects,
+  so memory stays flat no matter the size of the simulation.
+  """
+  table = ElevatorRequest.__table__
+  stmt = select(table).where(table.c.simulation_id == sim_id)
+  if after_id is not None:
+    stmt = stmt.where(table.c.id > after_id)
+  stmt = stmt.order_by(table.c.id)
+
+  def generate_lines():
+    # The session lives as long as the stream, not as long as the request handler
+    db = SessionLocal()
+    try:
+      result = db.execute(stmt.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE))
+      for rows in result.mappings().partitions():
+        yield "".join(json.dumps(dict(row), default=serialize_value) + "\n" for row in rows)
+    finally:
+      db.close()
+
+  return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+
+def serialize_value(value):
+  """
+  JSON fallback for column types json does not know (timestamps).
   """
-  Read all requests that correspond to a specific simulation
+  return value.isoformat()
+
+
+# Async endpoints ---
+
+@async_router.post("/simulation", response_model=SimulationOut)
+async def create_simulation_async(sim_data: SimulationCreate, db: AsyncSession = Depends(get_async_db)):
+  """
+  Create a single simulation object, with its partition in the same transaction
+  """
+  sim = SimulationMetadata(**sim_data.dict())
+  db.add(sim)
+  await db.flush() # assigns the id
+  statement = partitioning.create_partition_statement(sim.id)
+  if statement is not None:
+      await db.execute(statement)
+  await db.commit()
+  await db.refresh(sim)
+  cache.responses.invalidate_prefix(cache.SIMULATIONS_PREFIX)
+  return sim
+
+
+@async_router.get("/simulation/{id}", response_model=SimulationOut)
+async def get_simulation_async(id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+  """
+  Read a specific simulation, from the same cache as the sync endpoint
+  """
+  entry = cache.responses.get(cache.simulation_key(id))
+  if entry is None:
+      sim = await db.get(SimulationMetadata, id)
+      if not sim:
+          raise HTTPException(status_code=404, detail="Simulation not found")
+      entry = cache.responses.put(cache.simulation_key(id), SimulationOut.model_validate(sim, from_attributes=True))
+  return cache.respond(request, entry)
+
+
+@async_router.post("/elevator_request", response_model=ElevatorRequestOut)
+async def create_elevator_request_async(req_data: ElevatorRequestCreate, db: AsyncSession = Depends(get_async_db)):
+  """
+  Creates a single request
+  """
+  req = ElevatorRequest(**req_data.dict())
+  db.add(req)
+  await db.execute(stats.invalidate_statement([req_data.simulation_id]))
+  await db.commit()
+  await db.refresh(req)
+  return req
+
+
+@async_router.post("/elevator_requests/bulk", response_model=BulkInsertOut)
+async def create_elevator_requests_bulk_async(reqs_data: List[ElevatorRequestCreate], db: AsyncSession = Depends(get_async_db)):
   """
-  return db.query(ElevatorRequest).filter(ElevatorRequest.simulation_id == sim_id).all()
+  Creates many requests in a single transaction with multi-row INSERTs
+  """
+  if not reqs_data:
+    return {"inserted": 0}
+
+  await db.execute(insert(ElevatorRequest), [req_data.dict() for req_data in reqs_data])
+  await db.execute(stats.invalidate_statement([req_data.simulation_id for req_data in reqs_data]))
+  await db.commit()
+  return {"inserted": len(reqs_data)}
+
+
+@async_router.get("/elevator_request/{sim_id}", response_model=List[ElevatorRequestOut])
+async def get_requests_for_simulation_async(
+  sim_id: int,
+  after_id: Optional[int] = None,
+  limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+  db: AsyncSession = Depends(get_async_db)
+):
+  """
+  Read requests that correspond to a specific simulation, ordered by id, with keyset pagination
+  """
+  stmt = select(ElevatorRequest).where(ElevatorRequest.simulation_id == sim_id)
+  if after_id is not None:
+    stmt = stmt.where(ElevatorRequest.id > after_id)
+  stmt = stmt.order_by(ElevatorRequest.id)
+  if limit is not None:
+    stmt = stmt.limit(limit)
+  return (await db.execute(stmt)).scalars().all()
+
+
+# Metrics endpoint ---
+
+@router.get("/metrics")
+def get_metrics():
+  """
+  Latency histograms of the API since it started: per route (count, sum, mean, max, buckets, 5xx errors)
+  and of the database statements
+  """
+  return metrics.metrics.as_dict()
+
+
+# Export endpoints ---
+
+@router.get("/export")
+def export_requests(
+  simulation_ids: Optional[List[int]] = Query(None),
+  min_expo_lambda: Optional[float] = None,
+  max_expo_lambda: Optional[float] = None,
+  floor_max: Optional[int] = None,
+  format: Literal["arrow", "parquet"] = "arrow",
+  db: Session = Depends(get_db)
+):
+  """
+  Exports requests as a columnar dataset for the ML pipeline: an Arrow IPC stream or a Parquet file.
+  Selects simulations by id and/or parameters, joins their parameters as columns
+  and expands the demand histogram into fixed-width columns demand_floor_<k> (k = floor - floor_min).
+  """
+  if export.pa is None:
+    raise HTTPException(status_code=501, detail="Export needs pyarrow installed in the API")
+
+  conditions = []
+  if simulation_ids:
+    conditions.append(SimulationMetadata.id.in_(simulation_ids))
+  if min_expo_lambda is not None:
+    conditions.append(SimulationMetadata.expo_lambda >= min_expo_lambda)
+  if max_expo_lambda is not None:
+    conditions.append(SimulationMetadata.expo_lambda <= max_expo_lambda)
+  if floor_max is not None:
+    conditions.append(SimulationMetadata.floor_max == floor_max)
+
+  # Width of the histogram block, from the tallest selected building
+  width = db.query(func.max(SimulationMetadata.floor_max - SimulationMetadata.floor_min + 1)).filter(*conditions).scalar() or 0
+
+  stmt = (
+    select(*export.export_columns())
+    .join_from(ElevatorRequest, SimulationMetadata, ElevatorRequest.simulation_id == SimulationMetadata.id)
+    .where(*conditions)
+    .order_by(ElevatorRequest.id)
+  )
+
+  def generate_batches():
+    # The session lives as long as the stream, not as long as the request handler
+    stream_db = SessionLocal()
+    try:
+      result = stream_db.execute(stmt.execution_options(stream_results=True, yield_per=export.EXPORT_BATCH_SIZE))
+      for rows in result.mappings().partitions():
+        yield rows
+    finally:
+      stream_db.close()
+
+  media_type = "application/vnd.apache.parquet" if format == "parquet" else "application/vnd.apache.arrow.stream"
+  return StreamingResponse(
+    export.stream_export(generate_batches(), width, format),
+    media_type=media_type,
+    headers={"Content-Disposition": f"attachment; filename=elevator_requests.{format}"}
+  )
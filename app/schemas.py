@@ -16,6 +16,8 @@ class SimulationBase(BaseModel):
     floor_min: int
     floor_max: int
     random_seed: int
+    elevators: int = 1
+    dispatch_policy: str = "fifo"
 
 class SimulationCreate(SimulationBase):
     pass
@@ -29,6 +31,7 @@ class SimulationOut(SimulationBase):
 # Request schema ---
 
 class ElevatorRequestBase(BaseModel):
+    elevator_id: int = 0
     current_floor: int
     last_floor: int
     time_idle: float
@@ -38,6 +41,8 @@ class ElevatorRequestBase(BaseModel):
     requests_entropy: Optional[float] = None
     mean_requested_floor: Optional[float] = None
     distance_to_center_of_mass: Optional[float] = None
+    requests_entropy_last_30s: Optional[float] = None
+    request_rate_last_30s: Optional[float] = None
     next_floor_requested: Optional[int] = None
 
 class ElevatorRequestCreate(ElevatorRequestBase):
@@ -49,3 +54,35 @@ class ElevatorRequestOut(ElevatorRequestBase):
 
     class Config:
         orm_mode = True
+
+
+class BulkInsertOut(BaseModel):
+    inserted: int
+
+
+class IngestAck(BaseModel):
+    status: str # "committed" or "queued"
+
+
+# Stats schema ---
+
+class LabelCount(BaseModel):
+    floor: int
+    count: int
+    share: float # of the labeled rows of the simulation
+
+class SimulationStatsOut(BaseModel):
+    simulation_id: int
+    row_count: int
+    labeled_count: int
+    time_idle_mean: Optional[float] = None
+    time_idle_min: Optional[float] = None
+    time_idle_max: Optional[float] = None
+    first_timestamp: Optional[datetime] = None
+    last_timestamp: Optional[datetime] = None
+    label_distribution: List[LabelCount]
+    floor_demand_totals: Optional[List[int]] = None
+    refreshed_at: datetime
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,159 @@
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import Float, bindparam, cast, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import distinct_on, insert
+from sqlalchemy.orm import Session
+
+from models import SimulationMetadata, ElevatorRequest, SimulationStats
+
+
+def invalidate_statement(simulation_ids: Iterable[int]):
+    """
+    Upsert bumping the version of the summaries of simulations receiving rows, run in the ingestion transaction
+    so a summary computed without those rows is never stored as current (see refresh).
+    """
+    rows = [{"simulation_id": simulation_id, "version": 1} for simulation_id in sorted(set(simulation_ids))]
+    return insert(SimulationStats).values(rows).on_conflict_do_update(
+        index_elements=[SimulationStats.simulation_id],
+        set_={"version": SimulationStats.version + 1},
+    )
+
+
+def invalidate(db: Session, simulation_ids: Iterable[int]):
+    db.execute(invalidate_statement(simulation_ids))
+
+
+def remove(db: Session, simulation_ids: Iterable[int]):
+    """
+    Deletes the summaries of simulations being deleted.
+    """
+    db.execute(delete(SimulationStats).where(SimulationStats.simulation_id.in_(sorted(set(simulation_ids)))))
+
+
+def compute(db: Session, simulation_ids: List[int]) -> List[dict]:
+    """
+    Summaries of simulations, aggregated by the database in three grouped queries:
+    row counts and idle time, label counts with their share of the simulation (window over the groups),
+    and the demand histogram of the last snapshot of each simulation (DISTINCT ON, served by the (simulation_id, id) index).
+    """
+    in_simulations = ElevatorRequest.simulation_id.in_(simulation_ids)
+    summaries = {
+        simulation_id: {
+            "simulation_id": simulation_id,
+            "row_count": 0,
+            "labeled_count": 0,
+            "label_distribution": [],
+            "floor_demand_totals": None,
+        }
+        for simulation_id in simulation_ids
+    }
+
+    aggregates = (
+        select(
+            ElevatorRequest.simulation_id,
+            func.count().label("row_count"),
+            func.count(ElevatorRequest.next_floor_requested).label("labeled_count"),
+            func.avg(ElevatorRequest.time_idle).label("time_idle_mean"),
+            func.min(ElevatorRequest.time_idle).label("time_idle_min"),
+            func.max(ElevatorRequest.time_idle).label("time_idle_max"),
+            func.min(ElevatorRequest.timestamp).label("first_timestamp"),
+            func.max(ElevatorRequest.timestamp).label("last_timestamp"),
+        )
+        .where(in_simulations)
+        .group_by(ElevatorRequest.simulation_id)
+    )
+    for row in db.execute(aggregates).mappings():
+        summary = summaries[row["simulation_id"]]
+        summary.update(row)
+        summary["time_idle_mean"] = float(row["time_idle_mean"]) # numeric in postgres
+
+    count = func.count()
+    labels = (
+        select(
+            ElevatorRequest.simulation_id,
+            ElevatorRequest.next_floor_requested,
+            count.label("count"),
+            (cast(count, Float) / func.sum(count).over(partition_by=ElevatorRequest.simulation_id)).label("share"),
+        )
+        .where(in_simulations, ElevatorRequest.next_floor_requested.isnot(None))
+        .group_by(ElevatorRequest.simulation_id, ElevatorRequest.next_floor_requested)
+        .order_by(ElevatorRequest.simulation_id, ElevatorRequest.next_floor_requested)
+    )
+    for simulation_id, floor, floor_count, share in db.execute(labels):
+        summaries[simulation_id]["label_distribution"].append({"floor": floor, "count": floor_count, "share": float(share)})
+
+    # The histogram is cumulative, the last snapshot holds the demand per floor of the whole run
+    last_histograms = (
+        select(ElevatorRequest.simulation_id, ElevatorRequest.floor_demand_histogram)
+        .where(in_simulations)
+        .ext(distinct_on(ElevatorRequest.simulation_id))
+        .order_by(ElevatorRequest.simulation_id, ElevatorRequest.id.desc())
+    )
+    for simulation_id, histogram in db.execute(last_histograms):
+        summaries[simulation_id]["floor_demand_totals"] = histogram
+
+    return [summaries[simulation_id] for simulation_id in simulation_ids]
+
+
+def refresh(db: Session, simulation_ids: List[int]) -> List[SimulationStats]:
+    """
+    Rebuilds the summaries of existing simulations among simulation_ids and returns them, without row locks.
+    Every ingestion bumps the version of its simulation's summary (invalidate_statement): versions are read
+    before the rows are aggregated and a summary is stored only while its version is unchanged. An ingestion
+    committed meanwhile, or still in flight (its upsert waits for this update, then bumps the version),
+    leaves the summary stale, to be rebuilt on the next read.
+    The returned summaries cover every row committed before they were computed, stored or not.
+    """
+    existing = db.execute(
+        select(SimulationMetadata.id).where(SimulationMetadata.id.in_(simulation_ids)).order_by(SimulationMetadata.id)
+    ).scalars().all()
+    if not existing:
+        return []
+
+    # Version rows of simulations never ingested into, committed right away so ingestions can bump them
+    db.execute(insert(SimulationStats).values([{"simulation_id": simulation_id} for simulation_id in existing]).on_conflict_do_nothing())
+    db.commit()
+
+    versions = dict(db.execute(select(SimulationStats.simulation_id, SimulationStats.version).where(SimulationStats.simulation_id.in_(existing))).all())
+    refreshed_at = datetime.utcnow()
+    summaries = [{**summary, "refreshed_at": refreshed_at} for summary in compute(db, existing)]
+
+    guarded = update(SimulationStats.__table__).where(
+        SimulationStats.simulation_id == bindparam("summary_id"),
+        SimulationStats.version == bindparam("read_version"),
+    )
+    db.execute(guarded, [
+        {
+            **{key: value for key, value in summary.items() if key != "simulation_id"},
+            "refreshed_version": versions[summary["simulation_id"]],
+            "summary_id": summary["simulation_id"],
+            "read_version": versions[summary["simulation_id"]],
+        }
+        for summary in summaries
+    ])
+    db.commit()
+    return [SimulationStats(**summary) for summary in summaries]
+
+
+def get_stats(db: Session, simulation_ids: Optional[List[int]] = None) -> List[SimulationStats]:
+    """
+    Summaries of the given simulations (all of them if None) ordered by simulation id, from the summary table,
+    rebuilding the ones stale since their last ingestion. Unknown simulations are left out.
+    """
+    stale = (
+        select(SimulationMetadata.id)
+        .outerjoin(SimulationStats)
+        .where(or_(SimulationStats.refreshed_version.is_(None), SimulationStats.refreshed_version != SimulationStats.version))
+    )
+    if simulation_ids is not None:
+        stale = stale.where(SimulationMetadata.id.in_(simulation_ids))
+    stale_ids = db.execute(stale).scalars().all()
+    refreshed = refresh(db, stale_ids) if stale_ids else []
+
+    query = db.query(SimulationStats).filter(SimulationStats.refreshed_version == SimulationStats.version)
+    if simulation_ids is not None:
+        query = query.filter(SimulationStats.simulation_id.in_(simulation_ids))
+    summaries = {summary.simulation_id: summary for summary in query.all()}
+    summaries.update((summary.simulation_id, summary) for summary in refreshed)
+    return [summaries[simulation_id] for simulation_id in sorted(summaries)]
@@ -0,0 +1,157 @@
+from concurrent.futures import Future
+from typing import List, Tuple
+import threading
+import logging
+import time
+import os
+
+from sqlalchemy import insert
+
+from models import ElevatorRequest
+from db import SessionLocal
+import stats
+
+logger = logging.getLogger(__name__)
+
+# off: POST /elevator_request commits each row itself (default)
+# durable: rows are coalesced and the request is answered once its batch is committed
+# immediate: rows are coalesced and the request is answered as soon as the row is queued
+WRITE_BEHIND_MODES = ("off", "durable", "immediate")
+
+
+def parse_mode(mode: str) -> str:
+    """
+    Checks a WRITE_BEHIND_MODE value, a typo must not fall back to fire-and-forget writes.
+    """
+    if mode not in WRITE_BEHIND_MODES:
+        raise ValueError(f"Invalid WRITE_BEHIND_MODE: {mode!r}, expected one of {', '.join(WRITE_BEHIND_MODES)}")
+    return mode
+
+
+WRITE_BEHIND_MODE = parse_mode(os.getenv("WRITE_BEHIND_MODE", "off"))
+WRITE_BEHIND_MAX_ROWS = int(os.getenv("WRITE_BEHIND_MAX_ROWS", "1000")) # rows that trigger a flush
+WRITE_BEHIND_MAX_LATENCY = float(os.getenv("WRITE_BEHIND_MAX_LATENCY", "0.05")) # seconds a row can wait
+
+
+class WriteBehindBuffer:
+    def __init__(self, session_factory=SessionLocal, max_rows: int = WRITE_BEHIND_MAX_ROWS, max_latency: float = WRITE_BEHIND_MAX_LATENCY):
+        """
+        Coalesces single elevator requests into multi-row INSERTs, flushed by a background thread
+        when max_rows are pending or the oldest row waited max_latency seconds.
+        One commit per batch instead of one commit and refresh per row.
+        """
+        self.session_factory = session_factory
+        self.max_rows = max_rows
+        self.max_latency = max_latency
+
+        self.condition = threading.Condition()
+        self.pending: List[Tuple[dict, Future]] = []
+        self.oldest_time = None
+        self.stopped = False
+
+        self.thread = threading.Thread(target=self.run, name="write-behind", daemon=True)
+        self.thread.start()
+
+    def submit(self, row: dict) -> Future:
+        """
+        Queues a validated row, the future resolves once its batch is committed.
+        """
+        future = Future()
+        with self.condition:
+            if self.stopped:
+                raise RuntimeError("Write-behind buffer is stopped")
+            if not self.pending:
+                self.oldest_time = time.monotonic()
+            self.pending.append((row, future))
+            # Wake the flusher to start the latency timer, or to flush a full batch
+            if len(self.pending) == 1 or len(self.pending) >= self.max_rows:
+                self.condition.notify()
+        return future
+
+    def run(self):
+        """
+        Flusher loop.
+        """
+        while True:
+            with self.condition:
+                while not self.stopped and (not self.pending or (
+                    len(self.pending) < self.max_rows and time.monotonic() - self.oldest_time < self.max_latency
+                )):
+                    timeout = None if not self.pending else self.max_latency - (time.monotonic() - self.oldest_time)
+                    self.condition.wait(timeout)
+                if self.stopped and not self.pending:
+                    return
+                batch, self.pending = self.pending[:self.max_rows], self.pending[self.max_rows:]
+                self.oldest_time = time.monotonic() if self.pending else None
+
+            self.flush(batch)
+
+    def flush(self, batch: List[Tuple[dict, Future]]):
+        """
+        Inserts a batch in one transaction and resolves its futures.
+        A failed batch is bisected and each half retried, so only the rows that fail on their own
+        (e.g. a constraint violation) get the exception, at the cost of about log2(n) retries per bad row.
+        """
+        try:
+            self.insert([row for row, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                logger.exception("Write-behind insert of a row failed")
+                batch[0][1].set_exception(e)
+                return
+            logger.warning("Write-behind flush of %d rows failed, retrying each half", len(batch))
+            middle = len(batch) // 2
+            self.flush(batch[:middle])
+            self.flush(batch[middle:])
+            return
+
+        for _, future in batch:
+            future.set_result(True)
+
+    def insert(self, rows: List[dict]):
+        """
+        Inserts rows in one transaction, rolled back if any of them fails.
+        """
+        db = self.session_factory()
+        try:
+            db.execute(insert(ElevatorRequest), rows)
+            stats.invalidate(db, [row["simulation_id"] for row in rows])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def stop(self):
+        """
+        Flushes everything pending and stops the flusher thread.
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.thread.join()
+
+
+buffer = None
+buffer_lock = threading.Lock()
+
+def get_buffer() -> WriteBehindBuffer:
+    """
+    Process-wide buffer, started on first use.
+    """
+    global buffer
+    with buffer_lock:
+        if buffer is None:
+            buffer = WriteBehindBuffer()
+        return buffer
+
+def shutdown():
+    """
+    Flushes pending rows, called when the app stops.
+    """
+    global buffer
+    with buffer_lock:
+        if buffer is not None:
+            buffer.stop()
+            buffer = None
@@ -0,0 +1,121 @@
+"""
+Single-simulation read latency as elevator_requests grows.
+
+Fills the database of DATABASE_URL (migrated with alembic upgrade head) with synthetic simulations
+of a fixed size, and after each growth step times the reads the API does for one simulation:
+a keyset page (GET /elevator_request/{sim_id}), a full read of the simulation and a time range.
+With the (simulation_id, ...) indexes, or with partitioning, latencies stay flat as the table grows;
+without them they grow linearly with the table.
+
+    python benchmarks/db_read_latency.py --steps 5 --simulations-per-step 20 --rows-per-simulation 10000
+
+The synthetic simulations are deleted at the end unless --keep is given.
+"""
+from datetime import datetime
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from sqlalchemy import create_engine, text
+
+from db import normalize_url, POOL_OPTIONS
+import partitioning
+
+READS = {
+    "keyset_page": (
+        "SELECT * FROM elevator_requests WHERE simulation_id = :sim_id AND id > :after_id ORDER BY id LIMIT 1000"
+    ),
+    "full_simulation": "SELECT * FROM elevator_requests WHERE simulation_id = :sim_id ORDER BY id",
+    "time_range": (
+        "SELECT * FROM elevator_requests WHERE simulation_id = :sim_id "
+        "AND timestamp >= :start AND timestamp < :start + interval '10 minutes' ORDER BY timestamp"
+    ),
+}
+
+
+def create_simulations(connection, count: int, rows: int) -> list:
+    """
+    Inserts count simulations with rows requests each, generated server side.
+    """
+    ids = []
+    for _ in range(count):
+        sim_id = connection.execute(text(
+            "INSERT INTO simulations (wait_time, elevator_speed, expo_lambda, start_datetime, duration, "
+            "base_floor, base_floor_weight, floor_min, floor_max, random_seed) "
+            "VALUES (1, 1, 0.1, :start, :rows, 1, 5, 1, 10, 0) RETURNING id"
+        ), {"start": datetime(2025, 1, 1), "rows": rows}).scalar_one()
+        partitioning.create_partition(connection, sim_id)
+        connection.execute(text(
+            "INSERT INTO elevator_requests (simulation_id, current_floor, last_floor, time_idle, timestamp, "
+            "floor_demand_histogram, next_floor_requested) "
+            "SELECT :sim_id, 1 + i % 10, 1 + (i + 3) % 10, i % 7, :start + i * interval '1 second', "
+            "ARRAY[i % 3, i % 5, i % 7, 0, 0, 0, 0, 0, 0, 0], 1 + (i * 7) % 10 "
+            "FROM generate_series(1, :rows) AS i"
+        ), {"sim_id": sim_id, "start": datetime(2025, 1, 1), "rows": rows})
+        ids.append(sim_id)
+    return ids
+
+
+def time_read(connection, sql: str, params: dict, repeat: int) -> float:
+    """
+    Median latency in milliseconds of a read, rows included.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(text(sql), params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure single-simulation read latency as elevator_requests grows")
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--simulations-per-step", type=int, default=20)
+    parser.add_argument("--rows-per-simulation", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed executions per read")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic simulations")
+    args = parser.parse_args()
+
+    engine = create_engine(normalize_url(os.getenv("DATABASE_URL")), **POOL_OPTIONS)
+    created = []
+    results = []
+    try:
+        for step in range(1, args.steps + 1):
+            with engine.begin() as connection:
+                created += create_simulations(connection, args.simulations_per_step, args.rows_per_simulation)
+                connection.execute(text("ANALYZE elevator_requests"))
+
+            with engine.connect() as connection:
+                total = connection.execute(text("SELECT count(*) FROM elevator_requests")).scalar_one()
+                probe = created[len(created) // 2] # a simulation in the middle of the table
+                params = {"sim_id": probe, "after_id": 0, "start": datetime(2025, 1, 1, 1)}
+                latencies = {name: round(time_read(connection, sql, params, args.repeat), 3) for name, sql in READS.items()}
+
+            result = {"step": step, "table_rows": total, "latency_ms": latencies}
+            results.append(result)
+            print(json.dumps(result))
+
+        with engine.connect() as connection:
+            plan = connection.execute(text("EXPLAIN " + READS["keyset_page"]), {"sim_id": created[0], "after_id": 0})
+            print("\n".join(row[0] for row in plan))
+    finally:
+        if not args.keep:
+            with engine.begin() as connection:
+                for sim_id in created:
+                    partitioning.drop_requests(connection, sim_id)
+                    connection.execute(text("DELETE FROM simulations WHERE id = :sim_id"), {"sim_id": sim_id})
+
+    first, last = results[0]["latency_ms"], results[-1]["latency_ms"]
+    growth = results[-1]["table_rows"] / results[0]["table_rows"]
+    for name in READS:
+        print(f"{name}: {first[name]} ms -> {last[name]} ms while the table grew x{growth:.1f}")
+
+
+if __name__ == "__main__":
+    main()
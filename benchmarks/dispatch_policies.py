@@ -0,0 +1,98 @@
+"""
+Compares dispatch policies on the same demand: simulated service KPIs and simulator cost.
+
+For each demand level and policy, runs the simpy engine on shared seeds (so every policy serves
+exactly the same requests), or on a recorded trace (see traces.py), and reports mean and p95 wait, delivered trips per hour, idle fraction
+of the cars, and the wall time of the run.
+
+    python benchmarks/dispatch_policies.py --floors 20 --elevators 4 --lambdas 0.05 0.2 0.5 --duration 7200
+    python benchmarks/dispatch_policies.py --json results.json
+    python benchmarks/dispatch_policies.py --floors 20 --trace office_day.trace
+"""
+from datetime import datetime
+import argparse
+import json
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "simulation"))
+
+from simulation import Simulation
+from sinks import NullSink
+from policies import POLICIES
+
+KPIS = ("mean_wait", "p95_wait", "trips_per_hour", "idle_fraction")
+
+
+def run_policy(policy: str, args, lambda_: float, seed: int) -> dict:
+    """
+    KPIs and wall time of one run.
+    """
+    sim = Simulation(
+        sim_time=args.duration,
+        floors=tuple(range(1, args.floors + 1)),
+        speed_floors_per_sec=args.speed,
+        lambda_=lambda_,
+        base_floor=1,
+        start_datetime=datetime(2025, 1, 1),
+        seed=seed,
+        sink=NullSink(),
+        idle_mode="event",
+        sampling="numpy",
+        elevators=args.elevators,
+        policy=policy,
+        demand_trace=args.trace,
+    )
+    sim.run()
+    return {**sim.kpis(), "wall_seconds": sim.metrics.wall_time}
+
+
+def mean_of(results: list, key: str):
+    values = [result[key] for result in results if result[key] is not None]
+    return statistics.mean(values) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dispatch policies: simulated KPIs and simulator wall time")
+    parser.add_argument("--floors", type=int, default=20)
+    parser.add_argument("--elevators", type=int, default=4)
+    parser.add_argument("--speed", type=float, default=1.0, help="floors per second")
+    parser.add_argument("--lambdas", type=float, nargs="+", default=[0.05, 0.2, 0.5], help="requests per second")
+    parser.add_argument("--duration", type=float, default=3600, help="simulated seconds")
+    parser.add_argument("--seeds", type=int, default=3, help="runs per policy and demand level, averaged")
+    parser.add_argument("--policies", nargs="+", default=["fifo", *POLICIES])
+    parser.add_argument("--trace", help="replay the requests of this trace file, once per policy, instead of sampling demand")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    # A trace is the same demand whatever the seed, it is run once
+    levels = [(os.path.basename(args.trace), args.lambdas[0])] if args.trace else [(lambda_, lambda_) for lambda_ in args.lambdas]
+    seeds = 1 if args.trace else args.seeds
+
+    rows = []
+    for label, lambda_ in levels:
+        for policy in args.policies:
+            results = [run_policy(policy, args, lambda_, seed) for seed in range(seeds)]
+            row = {"lambda": label, "policy": policy}
+            row.update({key: mean_of(results, key) for key in KPIS + ("wall_seconds",)})
+            row["sim_seconds_per_wall_second"] = args.duration / row["wall_seconds"]
+            rows.append(row)
+
+    header = f"{'lambda':>7} {'policy':>8} {'mean wait':>10} {'p95 wait':>9} {'trips/h':>9} {'idle':>6} {'wall s':>8} {'sim/wall':>9}"
+    print(header)
+    for row in rows:
+        mean_wait = "-" if row["mean_wait"] is None else f"{row['mean_wait']:.1f}"
+        p95_wait = "-" if row["p95_wait"] is None else f"{row['p95_wait']:.1f}"
+        print(
+            f"{row['lambda']:>7} {row['policy']:>8} {mean_wait:>10} {p95_wait:>9} {row['trips_per_hour']:>9.0f} "
+            f"{row['idle_fraction']:>6.2f} {row['wall_seconds']:>8.3f} {row['sim_seconds_per_wall_second']:>9.0f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Simulator benchmark suite.
+
+Measures throughput (higher is better) of:
+- Simulation.run: simpy events per second and simulated seconds per wall second, across floors, lambda and duration
+- Engines: simulated seconds per wall second of the simpy and numpy engines on the same demand, and the numpy speedup
+- Elevator.save_snapshot: snapshots built per second, with a long demand history (and memory held per snapshot)
+- DemandGenerator sampling: requests drawn per second, pure Python, NumPy batches and a daily demand profile
+- API ingestion: rows per second through POST /elevator_requests/bulk and POST /elevator_request,
+  against a local SQLite database standing in for Postgres (API overhead, not database tuning)
+
+Results are written as JSON. With --compare, the run fails (exit code 1) when a throughput
+dropped by more than --threshold relative to a previous results file:
+
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --output current.json --compare baseline.json --threshold 0.2
+"""
+from datetime import datetime
+from itertools import product
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "simulation"))
+
+from simulation import Simulation
+from profiles import DemandProfile
+from sinks import NullSink
+
+# Metrics compared between runs, all of them throughputs
+THROUGHPUT_METRICS = ("events_per_sec", "sim_seconds_per_wall_second", "snapshots_per_sec", "samples_per_sec", "rows_per_sec", "speedup")
+
+FULL = {
+    "simulation": {"floors": [5, 20, 60], "lambda_": [0.05, 0.5], "duration": [3600, 14400], "idle_mode": ["poll", "event"]},
+    "engine": {"floors": [10, 60], "lambda_": [0.05, 0.5], "duration": [86400]},
+    "snapshot": {"floors": [5, 60], "history": 100000, "count": 20000},
+    "sampling": {"sampling": ["python", "numpy", "profile"], "count": 200000},
+    "ingestion": {"rows": 20000, "batch_size": 500, "single_rows": 1000},
+}
+QUICK = {
+    "simulation": {"floors": [5, 20], "lambda_": [0.1], "duration": [600], "idle_mode": ["poll", "event"]},
+    "engine": {"floors": [10], "lambda_": [0.05], "duration": [86400]},
+    "snapshot": {"floors": [5], "history": 5000, "count": 1000},
+    "sampling": {"sampling": ["python", "numpy", "profile"], "count": 10000},
+    "ingestion": {"rows": 1000, "batch_size": 500, "single_rows": 100},
+}
+
+
+def make_simulation(floors: int, lambda_: float, duration: float, seed: int = 7, **kwargs) -> Simulation:
+    return Simulation(
+        sim_time=duration,
+        floors=tuple(range(1, floors + 1)),
+        speed_floors_per_sec=1.0,
+        lambda_=lambda_,
+        base_floor=1,
+        start_datetime=datetime(2025, 1, 1),
+        seed=seed,
+        sink=NullSink(),
+        **kwargs,
+    )
+
+
+def best_of(repeat: int, function):
+    """
+    Runs function repeat times, returns the result of the fastest run and its wall time.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        wall = time.perf_counter() - start
+        if best is None or wall < best[1]:
+            best = (result, wall)
+    return best
+
+
+def bench_simulation(floors: int, lambda_: float, duration: float, idle_mode: str, repeat: int) -> dict:
+    """
+    Events processed by the simpy environment per wall second, and simulated seconds per wall second.
+    """
+    def run():
+        sim = make_simulation(floors, lambda_, duration, idle_mode=idle_mode)
+        sim.run()
+        return sim.metrics.events_processed
+
+    events, wall = best_of(repeat, run)
+    return {
+        "events": events,
+        "wall_seconds": wall,
+        "events_per_sec": events / wall,
+        "sim_seconds_per_wall_second": duration / wall,
+    }
+
+
+def bench_engine(floors: int, lambda_: float, duration: float, repeat: int) -> dict:
+    """
+    Simulated seconds per wall second of both engines on the same demand (event idle mode, NumPy sampling),
+    keyed by engine, with the speedup of the numpy engine.
+    """
+    results = {}
+    for engine in ("simpy", "numpy"):
+        def run():
+            sim = make_simulation(floors, lambda_, duration, idle_mode="event", sampling="numpy", engine=engine)
+            sim.run()
+            return sim.metrics.snapshots_posted
+
+        snapshots, wall = best_of(repeat, run)
+        results[engine] = {"snapshots": snapshots, "wall_seconds": wall, "sim_seconds_per_wall_second": duration / wall}
+    results["numpy"]["speedup"] = results["simpy"]["wall_seconds"] / results["numpy"]["wall_seconds"]
+    return results
+
+
+def bench_snapshot(floors: int, history: int, count: int, repeat: int) -> dict:
+    """
+    Cost of Elevator.save_snapshot once history requests were counted by the features.
+    """
+    sim = make_simulation(floors, 0.1, 0)
+    elevator = sim.elevator
+    generator = sim.demand_generator
+    for i in range(history):
+        origin, _ = generator.generate_origin_destination()
+        elevator.features.add_request(origin, i * 0.5)
+    sim.env.run(until=history * 0.5)
+    elevator.idle_start_time = sim.env.now
+
+    def run():
+        for _ in range(count):
+            elevator.save_snapshot()
+
+    _, wall = best_of(repeat, run)
+
+    # Memory held by snapshots kept alive, as while they wait in a sink buffer
+    tracemalloc.start()
+    kept = []
+    for _ in range(count):
+        elevator.save_snapshot()
+        kept.append(elevator.last_snapshot)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {"wall_seconds": wall, "snapshots_per_sec": count / wall, "bytes_per_snapshot": held / count}
+
+
+def bench_sampling(sampling: str, count: int, repeat: int) -> dict:
+    """
+    Cost of drawing requests (interarrival time and origin/destination) in DemandGenerator.
+    "profile" draws from the example office day, a time-varying rate with per-period OD weights.
+    """
+    def run():
+        if sampling == "profile":
+            profile = DemandProfile.load(os.path.join(ROOT, "simulation", "demand_profiles", "office_day.json"))
+            generator = make_simulation(10, 0.1, 0, demand_profile=profile).demand_generator
+        else:
+            generator = make_simulation(10, 0.1, 0, sampling=sampling).demand_generator
+        for _ in range(count):
+            generator.generate_interarrival_time()
+            generator.generate_origin_destination()
+
+    _, wall = best_of(repeat, run)
+    return {"wall_seconds": wall, "samples_per_sec": count / wall}
+
+
+def ingestion_client(directory: str):
+    """
+    API test client on a SQLite database standing in for Postgres.
+    Integer arrays are stored as JSON text, which is all SQLite needs to take the inserts.
+    """
+    import sqlite3
+    from sqlalchemy.dialects.postgresql import ARRAY
+    from sqlalchemy.ext.compiler import compiles
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'ingestion.db')}"
+    sys.path.insert(0, os.path.join(ROOT, "app"))
+
+    @compiles(ARRAY, "sqlite")
+    def compile_array(element, compiler, **kwargs):
+        return "JSON"
+
+    sqlite3.register_adapter(list, json.dumps)
+    sqlite3.register_converter("JSON", json.loads)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    import db
+    import models
+    import main
+
+    # Same sessions as the API, on a connection that decodes the JSON columns back into lists
+    db.engine = create_engine(os.environ["DATABASE_URL"], connect_args={"detect_types": sqlite3.PARSE_DECLTYPES})
+    db.SessionLocal.configure(bind=db.engine)
+    models.Base.metadata.create_all(db.engine)
+    client = TestClient(main.app)
+    simulation = client.post("/simulation", json={
+        "wait_time": 1.0, "elevator_speed": 1.0, "expo_lambda": 0.1, "start_datetime": "2025-01-01T00:00:00",
+        "duration": 3600, "base_floor": 1, "base_floor_weight": 3, "floor_min": 1, "floor_max": 10, "random_seed": 0,
+    }).json()
+    return client, simulation["id"]
+
+
+def ingestion_row(simulation_id: int, i: int) -> dict:
+    return {
+        "simulation_id": simulation_id,
+        "current_floor": 1,
+        "last_floor": 1 + i % 10,
+        "time_idle": 1.5,
+        "timestamp": "2025-01-01T00:00:00",
+        "floor_demand_histogram": [i % 7, 3, 0, 1, 2, 5, 8, 1, 0, 4],
+        "hot_floor_last_30s": 1,
+        "requests_entropy": 2.5,
+        "mean_requested_floor": 4.2,
+        "distance_to_center_of_mass": 3.2,
+        "next_floor_requested": 1 + i % 9,
+    }
+
+
+def bench_ingestion(rows: int, batch_size: int, single_rows: int, repeat: int) -> dict:
+    """
+    Rows per second accepted by the bulk and single row ingestion endpoints.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        client, simulation_id = ingestion_client(directory)
+        batches = [[ingestion_row(simulation_id, i) for i in range(start, min(start + batch_size, rows))] for start in range(0, rows, batch_size)]
+        singles = [ingestion_row(simulation_id, i) for i in range(single_rows)]
+
+        def run_bulk():
+            for batch in batches:
+                client.post("/elevator_requests/bulk", json=batch).raise_for_status()
+
+        def run_single():
+            for row in singles:
+                client.post("/elevator_request", json=row).raise_for_status()
+
+        _, bulk_wall = best_of(repeat, run_bulk)
+        _, single_wall = best_of(repeat, run_single)
+        client.close()
+
+    return {
+        f"ingestion/bulk/batch_size={batch_size}": {"wall_seconds": bulk_wall, "rows_per_sec": rows / bulk_wall},
+        "ingestion/single": {"wall_seconds": single_wall, "rows_per_sec": single_rows / single_wall},
+    }
+
+
+def run_suite(config: dict, repeat: int = 3, api: bool = True) -> dict:
+    """
+    Runs every case of a config (FULL or QUICK), returns results keyed by case name.
+    """
+    results = {}
+
+    grid = config["simulation"]
+    for floors, lambda_, duration, idle_mode in product(grid["floors"], grid["lambda_"], grid["duration"], grid["idle_mode"]):
+        name = f"simulation/floors={floors}/lambda={lambda_}/duration={duration}/idle_mode={idle_mode}"
+        results[name] = bench_simulation(floors, lambda_, duration, idle_mode, repeat)
+
+    grid = config["engine"]
+    for floors, lambda_, duration in product(grid["floors"], grid["lambda_"], grid["duration"]):
+        for engine, metrics in bench_engine(floors, lambda_, duration, repeat).items():
+            results[f"engine/floors={floors}/lambda={lambda_}/duration={duration}/engine={engine}"] = metrics
+
+    snapshot = config["snapshot"]
+    for floors in snapshot["floors"]:
+        results[f"snapshot/floors={floors}"] = bench_snapshot(floors, snapshot["history"], snapshot["count"], repeat)
+
+    sampling = config["sampling"]
+    for kind in sampling["sampling"]:
+        results[f"sampling/{kind}"] = bench_sampling(kind, sampling["count"], repeat)
+
+    if api:
+        ingestion = config["ingestion"]
+        results.update(bench_ingestion(ingestion["rows"], ingestion["batch_size"], ingestion["single_rows"], repeat))
+
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    Throughput metrics of cases present in both results that dropped by more than threshold (a fraction).
+    Returns (case, metric, baseline value, current value, relative change) tuples.
+    """
+    regressions = []
+    for case, metrics in current.items():
+        for metric in THROUGHPUT_METRICS:
+            if metric not in metrics or metric not in baseline.get(case, {}):
+                continue
+            before, after = baseline[case][metric], metrics[metric]
+            change = (after - before) / before
+            if change < -threshold:
+                regressions.append((case, metric, before, after, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulator benchmark suite")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--compare", help="previous results file, fail on throughput regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="tolerated throughput drop, as a fraction")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the fastest one is kept")
+    parser.add_argument("--quick", action="store_true", help="small sizes, for smoke runs")
+    parser.add_argument("--no-api", action="store_true", help="skip the API ingestion cases")
+    args = parser.parse_args()
+
+    results = run_suite(QUICK if args.quick else FULL, repeat=args.repeat, api=not args.no_api)
+    for case, metrics in results.items():
+        throughputs = ", ".join(f"{metric}={metrics[metric]:,.1f}" for metric in THROUGHPUT_METRICS if metric in metrics)
+        print(f"{case}: {throughputs}")
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "meta": {
+                "created": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "quick": args.quick,
+                "repeat": args.repeat,
+            },
+            "results": results,
+        }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for case, metric, before, after, change in regressions:
+            print(f"REGRESSION {case} {metric}: {before:,.0f} -> {after:,.0f} ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No throughput regression beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Initial schema: simulations and elevator_requests, as defined in app/models.py before migrations
+
+Databases created by the API's former startup create_all already hold these tables, with the same
+columns and indexes, so each table is only created when missing and those databases upgrade in place.
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-07-04
+"""
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def existing_tables() -> set:
+    """
+    Tables already in the database, none when emitting SQL offline (alembic upgrade --sql).
+    """
+    if context.is_offline_mode():
+        return set()
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    existing = existing_tables()
+
+    if "simulations" not in existing:
+        create_simulations()
+    if "elevator_requests" not in existing:
+        create_elevator_requests()
+
+
+def create_simulations():
+    op.create_table(
+        "simulations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("wait_time", sa.Float(), nullable=False),
+        sa.Column("elevator_speed", sa.Float(), nullable=False),
+        sa.Column("expo_lambda", sa.Float(), nullable=False),
+        sa.Column("start_datetime", sa.DateTime(), nullable=False),
+        sa.Column("duration", sa.Integer(), nullable=False),
+        sa.Column("base_floor", sa.Integer(), nullable=True),
+        sa.Column("base_floor_weight", sa.Float(), nullable=True),
+        sa.Column("floor_min", sa.Integer(), nullable=False),
+        sa.Column("floor_max", sa.Integer(), nullable=False),
+        sa.Column("random_seed", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_simulations_id", "simulations", ["id"])
+
+
+def create_elevator_requests():
+    op.create_table(
+        "elevator_requests",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("current_floor", sa.Integer(), nullable=False),
+        sa.Column("last_floor", sa.Integer(), nullable=False),
+        sa.Column("time_idle", sa.Float(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column("floor_demand_histogram", postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column("hot_floor_last_30s", sa.Integer(), nullable=True),
+        sa.Column("requests_entropy", sa.Float(), nullable=True),
+        sa.Column("mean_requested_floor", sa.Float(), nullable=True),
+        sa.Column("distance_to_center_of_mass", sa.Float(), nullable=True),
+        sa.Column("next_floor_requested", sa.Integer(), nullable=True),
+        sa.Column("simulation_id", sa.Integer(), sa.ForeignKey("simulations.id"), nullable=False),
+    )
+    op.create_index("ix_elevator_requests_id", "elevator_requests", ["id"])
+
+
+def downgrade():
+    op.drop_index("ix_elevator_requests_id", table_name="elevator_requests")
+    op.drop_table("elevator_requests")
+    op.drop_index("ix_simulations_id", table_name="simulations")
+    op.drop_table("simulations")
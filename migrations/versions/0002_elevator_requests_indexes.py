@@ -0,0 +1,35 @@
+"""Index elevator_requests by simulation: (simulation_id, id) and (simulation_id, timestamp)
+
+Reads of one simulation (GET /elevator_request/{sim_id}, keyset pages, streaming, export)
+become index range scans instead of full table scans.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-07-10
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY so a live table keeps accepting inserts while indexes build
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_elevator_requests_simulation_id_id", "elevator_requests", ["simulation_id", "id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_elevator_requests_simulation_id_timestamp", "elevator_requests", ["simulation_id", "timestamp"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_elevator_requests_simulation_id_timestamp", table_name="elevator_requests", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_elevator_requests_simulation_id_id", table_name="elevator_requests", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,103 @@
+"""Optional LIST partitioning of elevator_requests by simulation_id
+
+Only applied when ELEVATOR_REQUESTS_PARTITIONING=list is set while migrating, and the API must run
+with the same setting so it creates a partition per new simulation (see app/partitioning.py).
+Every simulation gets its own partition, so dropping a simulation's requests is a DROP TABLE
+instead of a DELETE over the whole table. Rows of simulations without a partition land in a default one.
+
+The primary key becomes (simulation_id, id), as Postgres requires the partition key in it,
+so it also serves the keyset reads that the (simulation_id, id) index served.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-07-10
+"""
+from alembic import op
+import os
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+COLUMNS = """
+    current_floor INTEGER NOT NULL,
+    last_floor INTEGER NOT NULL,
+    time_idle FLOAT NOT NULL,
+    timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    floor_demand_histogram INTEGER[] NOT NULL,
+    hot_floor_last_30s INTEGER,
+    requests_entropy FLOAT,
+    mean_requested_floor FLOAT,
+    distance_to_center_of_mass FLOAT,
+    next_floor_requested INTEGER,
+    simulation_id INTEGER NOT NULL REFERENCES simulations (id)
+"""
+
+COLUMN_NAMES = """
+    id, current_floor, last_floor, time_idle, timestamp, floor_demand_histogram, hot_floor_last_30s,
+    requests_entropy, mean_requested_floor, distance_to_center_of_mass, next_floor_requested, simulation_id
+"""
+
+
+def enabled() -> bool:
+    return os.getenv("ELEVATOR_REQUESTS_PARTITIONING", "none") == "list"
+
+
+def upgrade():
+    if not enabled():
+        return
+
+    op.execute("ALTER TABLE elevator_requests RENAME TO elevator_requests_unpartitioned")
+    op.execute("ALTER INDEX ix_elevator_requests_simulation_id_id RENAME TO ix_elevator_requests_unpartitioned_simulation_id_id")
+    op.execute("ALTER INDEX ix_elevator_requests_simulation_id_timestamp RENAME TO ix_elevator_requests_unpartitioned_simulation_id_timestamp")
+    op.execute("ALTER INDEX ix_elevator_requests_id RENAME TO ix_elevator_requests_unpartitioned_id")
+    op.execute("ALTER SEQUENCE elevator_requests_id_seq OWNED BY NONE") # keep ids, the old table is dropped
+
+    op.execute(f"""
+        CREATE TABLE elevator_requests (
+            id INTEGER NOT NULL DEFAULT nextval('elevator_requests_id_seq'),
+            {COLUMNS},
+            PRIMARY KEY (simulation_id, id)
+        ) PARTITION BY LIST (simulation_id)
+    """)
+    op.execute("ALTER SEQUENCE elevator_requests_id_seq OWNED BY elevator_requests.id")
+    op.execute("CREATE INDEX ix_elevator_requests_simulation_id_timestamp ON elevator_requests (simulation_id, timestamp)")
+    op.execute("CREATE TABLE elevator_requests_default PARTITION OF elevator_requests DEFAULT")
+    op.execute("""
+        DO $$
+        DECLARE sim RECORD;
+        BEGIN
+            FOR sim IN SELECT id FROM simulations LOOP
+                EXECUTE 'CREATE TABLE elevator_requests_sim_' || sim.id
+                    || ' PARTITION OF elevator_requests FOR VALUES IN (' || sim.id || ')';
+            END LOOP;
+        END $$
+    """)
+
+    op.execute(f"INSERT INTO elevator_requests ({COLUMN_NAMES}) SELECT {COLUMN_NAMES} FROM elevator_requests_unpartitioned")
+    op.execute("DROP TABLE elevator_requests_unpartitioned")
+
+
+def downgrade():
+    if not enabled():
+        return
+
+    op.execute("ALTER TABLE elevator_requests RENAME TO elevator_requests_partitioned")
+    op.execute("ALTER INDEX ix_elevator_requests_simulation_id_timestamp RENAME TO ix_elevator_requests_partitioned_simulation_id_timestamp")
+    op.execute("ALTER SEQUENCE elevator_requests_id_seq OWNED BY NONE")
+
+    op.execute(f"""
+        CREATE TABLE elevator_requests (
+            id INTEGER NOT NULL DEFAULT nextval('elevator_requests_id_seq') PRIMARY KEY,
+            {COLUMNS}
+        )
+    """)
+    op.execute("ALTER SEQUENCE elevator_requests_id_seq OWNED BY elevator_requests.id")
+    op.execute(f"INSERT INTO elevator_requests ({COLUMN_NAMES}) SELECT {COLUMN_NAMES} FROM elevator_requests_partitioned")
+    op.execute("DROP TABLE elevator_requests_partitioned") # drops every partition
+
+    op.execute("CREATE INDEX ix_elevator_requests_id ON elevator_requests (id)")
+    op.execute("CREATE INDEX ix_elevator_requests_simulation_id_id ON elevator_requests (simulation_id, id)")
+    op.execute("CREATE INDEX ix_elevator_requests_simulation_id_timestamp ON elevator_requests (simulation_id, timestamp)")
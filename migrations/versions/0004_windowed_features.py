@@ -0,0 +1,28 @@
+"""Add windowed demand features to elevator_requests
+
+requests_entropy_last_30s and request_rate_last_30s, computed by the simulator with
+hot_floor_last_30s over a sliding 30 seconds window.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-07-12
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable columns without default, no table rewrite (also propagated to partitions)
+    op.add_column("elevator_requests", sa.Column("requests_entropy_last_30s", sa.Float(), nullable=True))
+    op.add_column("elevator_requests", sa.Column("request_rate_last_30s", sa.Float(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("elevator_requests", "request_rate_last_30s")
+    op.drop_column("elevator_requests", "requests_entropy_last_30s")
@@ -0,0 +1,27 @@
+"""Elevator banks: bank size of each simulation and car of each request
+
+Existing rows come from single elevator simulations, hence the server defaults.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-07-14
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Constant defaults are stored in the catalog, no table rewrite
+    op.add_column("simulations", sa.Column("elevators", sa.Integer(), nullable=False, server_default="1"))
+    op.add_column("elevator_requests", sa.Column("elevator_id", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade():
+    op.drop_column("elevator_requests", "elevator_id")
+    op.drop_column("simulations", "elevators")
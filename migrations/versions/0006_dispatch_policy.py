@@ -0,0 +1,23 @@
+"""Record the dispatch policy of each simulation
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-07-15
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing simulations served their requests in FIFO order
+    op.add_column("simulations", sa.Column("dispatch_policy", sa.String(), nullable=False, server_default="fifo"))
+
+
+def downgrade():
+    op.drop_column("simulations", "dispatch_policy")
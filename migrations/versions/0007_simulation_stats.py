@@ -0,0 +1,41 @@
+"""Summary table of the requests of each simulation, served by GET /simulation/{id}/stats
+
+Summaries are rebuilt on read after an ingestion bumped their version (see app/stats.py), so the table
+starts empty and needs no backfill.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-07-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "simulation_stats",
+        sa.Column("simulation_id", sa.Integer(), sa.ForeignKey("simulations.id"), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("refreshed_version", sa.Integer(), nullable=True),
+        sa.Column("row_count", sa.Integer(), nullable=True),
+        sa.Column("labeled_count", sa.Integer(), nullable=True),
+        sa.Column("time_idle_mean", sa.Float(), nullable=True),
+        sa.Column("time_idle_min", sa.Float(), nullable=True),
+        sa.Column("time_idle_max", sa.Float(), nullable=True),
+        sa.Column("first_timestamp", sa.DateTime(), nullable=True),
+        sa.Column("last_timestamp", sa.DateTime(), nullable=True),
+        sa.Column("label_distribution", sa.JSON(), nullable=True),
+        sa.Column("floor_demand_totals", postgresql.ARRAY(sa.Integer()), nullable=True),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table("simulation_stats")
@@ -0,0 +1,46 @@
+"""Indexes of filtered queries: request timestamps and labels across simulations, simulation parameters
+
+GET /elevator_requests/query filters by time range or label without a simulation, and by parameter
+ranges of simulations joined to their requests (through the simulation_id indexes of 0002).
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-07-19
+"""
+from alembic import op
+import os
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def requests_concurrently() -> bool:
+    return os.getenv("ELEVATOR_REQUESTS_PARTITIONING", "none") != "list"
+
+
+def upgrade():
+    # CONCURRENTLY so a live table keeps accepting inserts while indexes build
+    concurrently = requests_concurrently()
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_elevator_requests_timestamp", "elevator_requests", ["timestamp"],
+            postgresql_concurrently=concurrently, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_elevator_requests_next_floor_requested", "elevator_requests", ["next_floor_requested"],
+            postgresql_concurrently=concurrently, if_not_exists=True,
+        )
+        op.create_index("ix_simulations_expo_lambda", "simulations", ["expo_lambda"], postgresql_concurrently=True, if_not_exists=True)
+        op.create_index("ix_simulations_floor_max", "simulations", ["floor_max"], postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    concurrently = requests_concurrently()
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_simulations_floor_max", table_name="simulations", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_simulations_expo_lambda", table_name="simulations", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_elevator_requests_next_floor_requested", table_name="elevator_requests", postgresql_concurrently=concurrently, if_exists=True)
+        op.drop_index("ix_elevator_requests_timestamp", table_name="elevator_requests", postgresql_concurrently=concurrently, if_exists=True)
@@ -0,0 +1,43 @@
+"""Indexes of the remaining filters of GET /elevator_requests/query: current floor and idle time range
+
+Every filter of the query is now served by an index: simulations and their parameters (0002, 0008),
+timestamps and labels (0008), current floor and time_idle bounds (here). With the table partitioned
+by simulation each partition gets its own index, scoped queries probe only their partitions' indexes.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2025-07-20
+"""
+from alembic import op
+import os
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def requests_concurrently() -> bool:
+    return os.getenv("ELEVATOR_REQUESTS_PARTITIONING", "none") != "list"
+
+
+def upgrade():
+    # CONCURRENTLY so a live table keeps accepting inserts while indexes build
+    concurrently = requests_concurrently()
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_elevator_requests_current_floor", "elevator_requests", ["current_floor"],
+            postgresql_concurrently=concurrently, if_not_exists=True,
+        )
+        op.create_index(
+            "ix_elevator_requests_time_idle", "elevator_requests", ["time_idle"],
+            postgresql_concurrently=concurrently, if_not_exists=True,
+        )
+
+
+def downgrade():
+    concurrently = requests_concurrently()
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_elevator_requests_time_idle", table_name="elevator_requests", postgresql_concurrently=concurrently, if_exists=True)
+        op.drop_index("ix_elevator_requests_current_floor", table_name="elevator_requests", postgresql_concurrently=concurrently, if_exists=True)
@@ -0,0 +1,313 @@
+from typing import List
+import requests
+import threading
+import queue
+import json
+import time
+import sys
+import os
+
+from snapshots import as_row
+from instrumentation import EventLogger, latency_summary
+from params import (
+    BATCH_MAX_SIZE,
+    BATCH_MAX_INTERVAL,
+    HTTP_POOL_SIZE,
+    HTTP_TIMEOUT,
+    UPLOAD_MAX_RETRIES,
+    UPLOAD_BACKOFF,
+    UPLOAD_QUEUE_SIZE,
+    SPOOL_PATH,
+)
+
+_STOP = object() # sentinel that tells the worker thread to drain and exit
+
+# Upload problems, as JSON lines through logging like the simulation events (--log-level, configure_logging)
+events = EventLogger("WARNING", logger_name="elevator_sim.uploader")
+
+
+class ApiError(Exception):
+    """
+    Raised when the backend answers with a non-200 status.
+    """
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def transient(self) -> bool:
+        """
+        True when posting again later can succeed: server errors, timeouts and rate limits.
+        Other client errors reject the payload itself, whenever it is sent.
+        """
+        return self.status_code is None or self.status_code >= 500 or self.status_code in (408, 429)
+
+
+class ApiClient:
+    def __init__(self, base_url: str, pool_size: int = HTTP_POOL_SIZE, timeout: float = HTTP_TIMEOUT):
+        """
+        Thin wrapper over a pooled keep-alive session to the backend.
+
+        Args:
+            base_url: Backend root URL, e.g. http://localhost:8000
+            pool_size: Max connections kept alive in the pool
+            timeout: Seconds before a request is considered failed
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, path: str, payload):
+        """
+        Posts a JSON payload and returns the decoded response.
+        """
+        response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+        if response.status_code != 200:
+            raise ApiError(f"Failed to post to {path}: {response.status_code} {response.text}", response.status_code)
+        return response.json()
+
+
+class BackgroundUploader:
+    def __init__(
+        self,
+        client: ApiClient,
+        path: str = "/elevator_requests/bulk",
+        spool_path: str = SPOOL_PATH,
+        max_size: int = BATCH_MAX_SIZE,
+        max_interval: float = BATCH_MAX_INTERVAL,
+        max_retries: int = UPLOAD_MAX_RETRIES,
+        backoff: float = UPLOAD_BACKOFF,
+        queue_size: int = UPLOAD_QUEUE_SIZE,
+    ):
+        """
+        Posts labeled snapshots in batches from a worker thread, so the simulation never waits on the network.
+        Batches that still fail after retrying on transport errors and server errors are appended to a local
+        spool file, which is replayed once the backend accepts posts again. Batches the backend rejects
+        (other 4xx) would be rejected again, they go to a dead letter file next to the spool instead.
+
+        Args:
+            client: Shared API client
+            path: Bulk ingestion endpoint
+            spool_path: Append-only JSONL file for snapshots that could not be posted,
+                rejected snapshots go to spool_path + ".rejected"
+            max_size: Number of queued snapshots that triggers a batch
+            max_interval: Max wall time (seconds) a snapshot can wait before its batch is sent
+            max_retries: Retries per batch before spooling it
+            backoff: Base delay (seconds) of the exponential backoff between retries
+            queue_size: Snapshots waiting in memory, while the backend is slow more are spooled right away
+        """
+        self.client = client
+        self.path = path
+        self.spool_path = spool_path
+        self.dead_letter_path = f"{spool_path}.rejected"
+        self.max_size = max_size
+        self.max_interval = max_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.next_attempt_time = 0.0 # while the backend is down, batches go straight to the spool
+        self.spool_lock = threading.Lock() # the simulation thread spools when the queue is full
+
+        # Stats
+        self.posted = 0
+        self.spooled = 0
+        self.rejected = 0
+        self.posts = 0 # HTTP round trips, failed ones included
+        self.post_seconds = 0.0
+        self.post_max_seconds = 0.0
+
+    def stats(self) -> dict:
+        """
+        Snapshots posted, spooled and rejected, and latency of the HTTP posts, since the uploader was created.
+        """
+        return {
+            "posted": self.posted,
+            "spooled": self.spooled,
+            "rejected": self.rejected,
+            "post_latency": latency_summary(self.posts, self.post_seconds, self.post_max_seconds),
+        }
+
+    def start(self):
+        """
+        Starts the worker thread.
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.work, name="snapshot-uploader", daemon=True)
+            self.thread.start()
+
+    def add(self, snapshot):
+        """
+        Queues a snapshot (a Snapshot record or a row dict) for upload, never blocks.
+        Records stay compact while queued, their rows are built when their batch is sent.
+        When the queue is full the snapshot is spooled, memory stays bounded however slow the backend is.
+        """
+        try:
+            self.queue.put_nowait(snapshot)
+        except queue.Full:
+            self.spool([as_row(snapshot)])
+
+    def close(self):
+        """
+        Sends everything still queued, tries to replay the spool and stops the worker.
+        """
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.thread = None
+
+    def work(self):
+        """
+        Worker loop: groups queued snapshots into batches by size or time.
+        """
+        batch: List[dict] = []
+        deadline = None
+
+        while True:
+            timeout = None if not batch else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self.send(batch)
+                if os.path.exists(self.spool_path) and time.monotonic() >= self.next_attempt_time:
+                    self.replay_spool()
+                return
+
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.max_interval
+                batch.append(item)
+
+            if batch and (len(batch) >= self.max_size or time.monotonic() >= deadline):
+                self.send(batch)
+                batch = []
+
+    def send(self, batch: List[dict]):
+        """
+        Posts a batch with retries, spooling it if the backend keeps failing.
+        """
+        if not batch:
+            return
+        batch = [as_row(snapshot) for snapshot in batch]
+
+        if time.monotonic() < self.next_attempt_time:
+            self.spool(batch)
+            return
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.post(batch)
+                break
+            except ApiError as e:
+                if not e.transient:
+                    self.reject(batch, e)
+                    return
+                error = e
+            except requests.RequestException as e:
+                error = e
+            if attempt == self.max_retries:
+                events.warning("upload_failed", spooled=len(batch), spool_path=self.spool_path, error=str(error))
+                self.spool(batch)
+                self.next_attempt_time = time.monotonic() + self.backoff * 2 ** self.max_retries
+                return
+            time.sleep(self.backoff * 2 ** attempt)
+
+        self.posted += len(batch)
+
+        # Backend is healthy again, catch up with whatever was spooled
+        if os.path.exists(self.spool_path):
+            self.replay_spool()
+
+    def post(self, batch: List[dict]):
+        """
+        Posts a batch of rows, timing the round trip.
+        """
+        start = time.perf_counter()
+        try:
+            self.client.post(self.path, batch)
+        finally:
+            seconds = time.perf_counter() - start
+            self.posts += 1
+            self.post_seconds += seconds
+            if seconds > self.post_max_seconds:
+                self.post_max_seconds = seconds
+
+    def spool(self, batch: List[dict]):
+        """
+        Appends a batch to the spool file, one snapshot per line.
+        """
+        with self.spool_lock, open(self.spool_path, "a") as f:
+            f.write("".join(json.dumps(snapshot) + "\n" for snapshot in batch))
+            self.spooled += len(batch)
+
+    def reject(self, batch: List[dict], error: ApiError):
+        """
+        Appends a batch the backend refused to the dead letter file, it is never retried.
+        """
+        events.warning("upload_rejected", rejected=len(batch), dead_letter_path=self.dead_letter_path, error=str(error))
+        with open(self.dead_letter_path, "a") as f:
+            f.write("".join(json.dumps(snapshot) + "\n" for snapshot in batch))
+        self.rejected += len(batch)
+
+    def replay_spool(self) -> int:
+        """
+        Posts spooled snapshots in batches, rejected batches go to the dead letter file.
+        Whatever could not be posted yet is kept in the spool, the file is removed once empty.
+        Snapshots spooled while replaying are kept after the remaining ones.
+        Returns the number of snapshots replayed.
+        """
+        with self.spool_lock:
+            if not os.path.exists(self.spool_path):
+                return 0
+            with open(self.spool_path) as f:
+                lines = f.read()
+                offset = f.tell()
+        rows = [json.loads(line) for line in lines.splitlines() if line.strip()]
+
+        replayed = handled = 0
+        try:
+            for i in range(0, len(rows), self.max_size):
+                batch = rows[i:i + self.max_size]
+                try:
+                    self.post(batch)
+                    replayed += len(batch)
+                except ApiError as e:
+                    if e.transient:
+                        raise
+                    self.reject(batch, e)
+                handled = i + len(batch)
+        except (ApiError, requests.RequestException) as e:
+            events.warning("spool_replay_interrupted", replayed=replayed, spool_path=self.spool_path, error=str(e))
+            self.next_attempt_time = time.monotonic() + self.backoff * 2 ** self.max_retries
+
+        with self.spool_lock:
+            with open(self.spool_path) as f:
+                f.seek(offset)
+                appended = f.read()
+            remaining = "".join(json.dumps(row) + "\n" for row in rows[handled:]) + appended
+            if remaining:
+                tmp_path = f"{self.spool_path}.tmp"
+                with open(tmp_path, "w") as f:
+                    f.write(remaining)
+                os.replace(tmp_path, self.spool_path)
+            else:
+                os.remove(self.spool_path)
+
+        self.posted += replayed
+        return replayed
+
+
+if __name__ == "__main__":
+    # Replay a spool left behind by an earlier run: python api_client.py [spool_path]
+    client = ApiClient(os.getenv("API_BASE_URL", "http://localhost:8000"))
+    uploader = BackgroundUploader(client, spool_path=sys.argv[1] if len(sys.argv) > 1 else SPOOL_PATH)
+    print(f"[SYS] Replayed {uploader.replay_spool()} snapshots")
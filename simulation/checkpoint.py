@@ -0,0 +1,83 @@
+import os
+import pickle
+
+CHECKPOINT_VERSION = 1
+
+# Elevator attributes that make up the state of a car resting between requests
+ELEVATOR_STATE = ("current_floor", "last_floor", "idle_start_time", "idle_time", "direction")
+
+
+def can_checkpoint(simulation) -> bool:
+    """
+    True when the state of the simulation can be captured: every car is asleep waiting for a task
+    (event idle mode), so no process is halfway through a move or a hold, and the only pending
+    event is the request being processed by the demand generator.
+    """
+    return all(elevator.is_waiting() and not elevator.wake_up.triggered for elevator in simulation.elevators)
+
+
+def capture(simulation) -> dict:
+    """
+    State of a simulation at a request arrival, before the request is drawn.
+    Generators can not be pickled, so processes are not saved: they are rebuilt in the same
+    waiting state on resume, and the demand generator starts by processing the arrival at now.
+    """
+    generator = simulation.demand_generator
+    return {
+        "version": CHECKPOINT_VERSION,
+        "params": simulation.params,
+        "now": simulation.env.now,
+        "simulation_id": simulation.simulation_id,
+        "next_checkpoint": simulation.next_checkpoint,
+        "elevators": [{name: getattr(elevator, name) for name in ELEVATOR_STATE} for elevator in simulation.elevators],
+        "features": simulation.elevator.features,
+        "trips": simulation.trips,
+        "metrics": simulation.metrics,
+        "rng": generator.rng.getstate(),
+        "sampler": generator.sampler,
+        "sink": simulation.sink.checkpoint(),
+    }
+
+
+def restore(simulation, state: dict):
+    """
+    Loads a captured state into a simulation built with the same params, starting at state["now"].
+    """
+    simulation.simulation_id = state["simulation_id"]
+    simulation.events.fields["simulation_id"] = state["simulation_id"]
+    simulation.next_checkpoint = state["next_checkpoint"]
+    simulation.trips = state["trips"]
+    simulation.metrics = state["metrics"]
+
+    features = state["features"]
+    for elevator, elevator_state in zip(simulation.elevators, state["elevators"]):
+        for name, value in elevator_state.items():
+            setattr(elevator, name, value)
+        elevator.features = features
+        elevator.request_histogram = features.stats.histogram
+        simulation.dispatcher.update(elevator)
+
+    generator = simulation.demand_generator
+    generator.rng.setstate(state["rng"])
+    generator.sampler = state["sampler"]
+    generator.next_arrival = state["now"]
+
+    simulation.sink.restore(state["sink"])
+
+
+def save_checkpoint(simulation, path: str):
+    """
+    Writes the state of a simulation, atomically so a crash never leaves a partial checkpoint.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(capture(simulation), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> dict:
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version: {state.get('version')}")
+    return state
@@ -3,22 +3,45 @@ import simpy
 import random
 
 from params import BASE_FLOOR_WEIGHT
+from sampling import DemandSampler
+from dispatcher import Dispatcher
 
 class DemandGenerator:
-    def __init__(self, env: simpy.Environment, floors: tuple[int], elevator, lambda_: float):
+    def __init__(
+        self,
+        env: simpy.Environment,
+        floors: tuple[int],
+        elevator,
+        lambda_: float,
+        rng: random.Random = None,
+        base_floor_weight: float = BASE_FLOOR_WEIGHT,
+        sampler: DemandSampler = None,
+        dispatcher: Dispatcher = None,
+    ):
         """
         Generates elevator demand at random intervals.
 
         Args:
             env: SimPy environment
             floors: Valid floor numbers
-            elevator: Reference to the Elevator instance
+            elevator: Reference to the Elevator instance, the first car of the bank
             lambda_: Mean arrival interval (Exponential distribution)
+            rng: Random stream owned by the simulation, a fresh unseeded one if not given
+            base_floor_weight: How many times the base floor is more likely to be requested
+            sampler: Batched NumPy sampler, replaces the pure Python sampling from rng when given
+            dispatcher: Assigns requests to the cars of the bank, a bank of elevator alone if not given
         """
         self.env = env
         self.floors = floors
         self.elevator = elevator
         self.lambda_ = lambda_
+        self.rng = rng or random.Random()
+        self.base_floor_weight = base_floor_weight
+        self.sampler = sampler
+        self.dispatcher = dispatcher or Dispatcher([elevator])
+        self.next_arrival = None # time of the first request when resuming from a checkpoint, drawn otherwise
+        self.on_arrival = None # called with the time of each request before it is drawn (checkpoints)
+        self.recorder = None # TraceWriter the requests are recorded to, when recording a trace
 
         # Start the generator process
         self.process = env.process(self.run())
@@ -27,13 +50,17 @@ class DemandGenerator:
         """
         Samples the next interarrival time from an exponential distribution.
         """
-        return random.expovariate(self.lambda_)
+        if self.sampler is not None:
+            return self.sampler.interarrival_time()
+        return self.rng.expovariate(self.lambda_)
 
     def generate_origin_destination(self) -> Tuple[int, int]:
         """
         Selects origin and destination floors from a distribution.
         Ensures origin != destination.
         """
+        if self.sampler is not None:
+            return self.sampler.origin_destination()
         origin = self.weighted_floor_choice()
         destination = self.weighted_floor_choice(exclude=origin)
         return origin, destination
@@ -45,8 +72,8 @@ class DemandGenerator:
         This mimics a uniform distribution with a peak.
         """
         valid_floors = [floor for floor in self.floors if floor != exclude]
-        weights = [BASE_FLOOR_WEIGHT if floor == self.elevator.base_floor else 1 for floor in valid_floors]
-        return random.choices(valid_floors, weights=weights, k=1)[0]
+        weights = [self.base_floor_weight if floor == self.elevator.base_floor else 1 for floor in valid_floors]
+        return self.rng.choices(valid_floors, weights=weights, k=1)[0]
 
     def run(self):
         """
@@ -54,21 +81,36 @@ class DemandGenerator:
         """
         while True:
             # Wait until next demand
-            interarrival_time = self.generate_interarrival_time()
-            yield self.env.timeout(interarrival_time)
+            if self.next_arrival is None:
+                interarrival_time = self.generate_interarrival_time()
+                yield self.env.timeout(interarrival_time)
+            else:
+                yield self.env.timeout(self.next_arrival - self.env.now)
+                self.next_arrival = None
+
+            if self.on_arrival is not None:
+                self.on_arrival(self.env.now)
 
             # Generate a random request
             origin, destination = self.generate_origin_destination()
-            self.elevator.request_histogram[origin] += 1
+            if self.recorder is not None:
+                self.recorder.write(self.env.now, origin, destination)
+
+            # A sleeping elevator (event mode) builds its snapshot lazily, before this request is counted
+            elevators = self.dispatcher.elevators
+            for elevator in elevators:
+                if elevator.is_waiting():
+                    elevator.save_snapshot()
+            self.elevator.features.add_request(origin, self.env.now) # shared by the bank
 
-            # We have label for the snapshot (next request), update, store and clean
-            if self.elevator.last_snapshot:
-                self.elevator.last_snapshot["next_floor_requested"] = origin
-                self.elevator.post_snapshot()
-                self.elevator.last_snapshot = None
+            # We have label for the snapshots (next request), update, store and clean
+            for elevator in elevators:
+                if elevator.last_snapshot:
+                    elevator.last_snapshot.next_floor_requested = origin
+                    elevator.post_snapshot()
+                    elevator.last_snapshot = None
 
 
-            # Elevator gets a task to go to origin then to destination
-            print(f"[{self.env.now:.1f}] Request: from {origin} to {destination}")
-            self.elevator.add_task(origin)
-            self.elevator.add_task(destination)
\ No newline at end of file
+            # A car gets a task to go to origin then to destination
+            elevator = self.dispatcher.assign(origin, destination)
+            self.elevator.events.info("request", origin=origin, destination=destination, elevator_id=elevator.elevator_id)
\ No newline at end of file
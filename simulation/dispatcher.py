@@ -0,0 +1,142 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Set
+import heapq
+
+from params import DISPATCH_SLACK
+from policies import UP, DOWN
+
+
+class FloorIndex:
+    def __init__(self):
+        """
+        Cars grouped by floor, occupied floors are kept sorted
+        so the nearest car to a floor is found by bisection instead of scanning the cars.
+        """
+        self.cars: Dict[int, Set[int]] = {} # floor -> car ids
+        self.floors: List[int] = [] # sorted floors holding at least one car
+        self.floor_of: Dict[int, int] = {} # car id -> floor
+
+    def __len__(self) -> int:
+        return len(self.floor_of)
+
+    def add(self, car_id: int, floor: int):
+        if floor not in self.cars:
+            self.cars[floor] = set()
+            insort(self.floors, floor)
+        self.cars[floor].add(car_id)
+        self.floor_of[car_id] = floor
+
+    def remove(self, car_id: int):
+        """
+        Removes a car, if indexed.
+        """
+        floor = self.floor_of.pop(car_id, None)
+        if floor is None:
+            return
+        cars = self.cars[floor]
+        cars.discard(car_id)
+        if not cars:
+            del self.cars[floor]
+            del self.floors[bisect_left(self.floors, floor)]
+
+    def nearest(self, floor: int, side: int = None):
+        """
+        Car on the closest floor to floor, the lowest floor and then the lowest id on ties.
+        side=DOWN only looks at floors <= floor, side=UP at floors >= floor.
+        None when no car qualifies.
+        """
+        below = bisect_right(self.floors, floor) - 1 # last floor <= floor
+        above = bisect_left(self.floors, floor) # first floor >= floor
+        candidates = []
+        if side != UP and below >= 0:
+            candidates.append(self.floors[below])
+        if side != DOWN and above < len(self.floors):
+            candidates.append(self.floors[above])
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda f: (abs(f - floor), f))
+        return min(self.cars[best])
+
+
+class Dispatcher:
+    def __init__(self, elevators: list, slack: int = DISPATCH_SLACK):
+        """
+        Assigns each request of the shared demand stream to one car of the bank.
+
+        Cars are indexed by state so an assignment costs O(log) instead of a scan of every car:
+        - idle cars (no pending tasks) by floor, the nearest one to the origin takes the request
+        - busy cars by the floor and direction where their pending work ends (Elevator.tail), a car
+          ending below an up request (above a down request) keeps going the same way to pick it up
+        - busy cars in a heap by pending tasks, the least loaded one is the fallback
+
+        Cars report their changes through update(), called when they take a task or come to rest.
+
+        Args:
+            elevators: Cars of the bank, their elevator_id is their position in the list
+            slack: How many more pending tasks than the least loaded car a car heading
+                the same way can have and still be preferred
+        """
+        self.elevators = elevators
+        self.slack = slack
+
+        self.idle = FloorIndex()
+        self.tails = {UP: FloorIndex(), DOWN: FloorIndex()}
+        self.loads = [] # (pending tasks, car id), stale entries are skipped when popped
+
+        for elevator in elevators:
+            elevator.dispatcher = self
+            self.update(elevator)
+
+    def assign(self, origin: int, destination: int):
+        """
+        Queues a request on the chosen car, returns the car.
+        """
+        elevator = self.elevators[0] if len(self.elevators) == 1 else self.choose(origin, destination)
+        elevator.add_request(origin, destination)
+        self.update(elevator)
+        return elevator
+
+    def choose(self, origin: int, destination: int):
+        if len(self.idle):
+            return self.elevators[self.idle.nearest(origin)]
+
+        least_loaded = self.least_loaded()
+        direction = UP if destination > origin else DOWN
+        car_id = self.tails[direction].nearest(origin, side=DOWN if direction == UP else UP)
+        if car_id is not None and self.elevators[car_id].pending_tasks() <= least_loaded.pending_tasks() + self.slack:
+            return self.elevators[car_id]
+        return least_loaded
+
+    def least_loaded(self):
+        """
+        Busy car with the fewest pending tasks, the lowest id on ties.
+        """
+        while True:
+            load, car_id = self.loads[0]
+            elevator = self.elevators[car_id]
+            if elevator.pending_tasks() == load:
+                return elevator
+            heapq.heappop(self.loads) # stale
+
+    def update(self, elevator):
+        """
+        Re-indexes a car after it got or finished a task, or came to rest.
+        """
+        car_id = elevator.elevator_id
+        self.idle.remove(car_id)
+        for tails in self.tails.values():
+            tails.remove(car_id)
+
+        load = elevator.pending_tasks()
+        if load == 0:
+            self.idle.add(car_id, elevator.current_floor)
+            return
+
+        floor, direction = elevator.tail()
+        self.tails[direction].add(car_id, floor)
+
+        heapq.heappush(self.loads, (load, car_id))
+        if len(self.loads) > 8 * len(self.elevators):
+            # Too many stale entries, rebuild from the busy cars
+            self.loads = [(e.pending_tasks(), e.elevator_id) for e in self.elevators if e.pending_tasks()]
+            heapq.heapify(self.loads)
@@ -1,15 +1,26 @@
-from datetime import timedelta
 from collections import deque
-import requests
-import simpy
 import math
-import os
+import simpy
 
-from params import DEFAULT_WAIT_TIME, DEFAULT_CHECK_TIME
+from params import DEFAULT_WAIT_TIME, DEFAULT_CHECK_TIME, DEFAULT_IDLE_MODE, DEFAULT_POLICY
+from features import FeatureEngine
+from policies import POLICIES, Request, SortedFloors, UP, DOWN
+from snapshots import Snapshot
 
 
 class Elevator:
-    def __init__(self, env: simpy.Environment, floors: tuple[int], speed_floors_per_sec: float, base_floor: int, simulation):
+    def __init__(
+        self,
+        env: simpy.Environment,
+        floors: tuple[int],
+        speed_floors_per_sec: float,
+        base_floor: int,
+        simulation,
+        idle_mode: str = DEFAULT_IDLE_MODE,
+        elevator_id: int = 0,
+        features: FeatureEngine = None,
+        policy: str = DEFAULT_POLICY,
+    ):
         """
         Elevator agent, takes requests and moves across floors and stores data of interest.
 
@@ -19,34 +30,141 @@ class Elevator:
             speed_floors_per_sec: Constant speed of elevator in floors per second
             base_floor: floor at street level, starting point
             simulation: parent simulation object
+            idle_mode: "poll" checks for tasks every DEFAULT_CHECK_TIME while idle,
+                "event" sleeps until a task is added and builds the snapshot only when it gets its label
+            elevator_id: Position of the car in its bank
+            features: Demand features shared by the cars of a bank, a fresh engine if not given
+            policy: "fifo" serves the task queue in order, or the name of a Policy (scan, look, nearest)
+                that picks the next stop among pending stops, decided again at each stop and new request
         """
+        if idle_mode not in ("poll", "event"):
+            raise ValueError(f"Invalid idle mode: {idle_mode}")
+        if policy != "fifo" and policy not in POLICIES:
+            raise ValueError(f"Invalid policy: {policy}")
+
         self.env = env
         self.floors = floors
         self.speed = speed_floors_per_sec
         self.base_floor = base_floor if base_floor in self.floors else None
         self.simulation = simulation
+        self.idle_mode = idle_mode
+        self.elevator_id = elevator_id
+        self.dispatcher = None # set by the Dispatcher of the bank
+        self.events = simulation.events # structured event log, quiet by default
 
         # Data structures
         self.last_snapshot = None # stores data of interest
         self.task_queue = deque()
+        self.task_requests = deque() # (request, is pickup) of each queued task, None for bare tasks
+        self.current_task = None # floor of the task being served
+        self.policy = POLICIES[policy](floors) if policy != "fifo" else None
+        self.stops = SortedFloors() # pending stops, with a policy
+        self.waiting = {} # floor -> requests waiting there
+        self.riding = {} # floor -> requests riding to it
+        self.open_requests = 0 # requested but not delivered yet
+        self.direction = UP
         self.moving = False
+        self.passing = False # at a floor the car only passes (not a stop), with a policy
+        self.wake_up = None # event an idle elevator waits on, in event mode
+        self.replan = None # event a car travelling with a policy waits on, besides its arrival
 
         # Stats
         self.current_floor = base_floor
-        self.last_floor = None
+        self.last_floor = base_floor # no move yet, the floor it started from (the backend requires one)
         self.idle_start_time = None
-        self.request_histogram = {f: 0 for f in self.floors}
+        self.idle_time = 0.0 # accumulated over finished idle periods
+        self.features = features or FeatureEngine(self.floors) # updated by the demand generator on each request
+        self.request_histogram = self.features.stats.histogram
 
         # Start the elevator process
         self.process = env.process(self.run())
 
-    def add_task(self, target_floor: int):
+    def add_task(self, target_floor: int, request: Request = None, pickup: bool = False):
         """
         Enqueue a request to move to a specific floor.
         """
         if target_floor not in self.floors:
             raise ValueError(f"Invalid floor: {target_floor}")
         self.task_queue.append(target_floor)
+        self.task_requests.append((request, pickup) if request is not None else None)
+        self.notify()
+
+    def add_request(self, origin: int, destination: int):
+        """
+        Takes a passenger trip: two queued tasks in FIFO, a hall call at origin with a policy.
+        """
+        request = Request(origin, destination, self.env.now)
+        if self.policy is None:
+            self.add_task(origin, request, pickup=True)
+            self.add_task(destination, request)
+            return
+
+        if origin not in self.floors or destination not in self.floors:
+            raise ValueError(f"Invalid request: from {origin} to {destination}")
+        self.waiting.setdefault(origin, []).append(request)
+        self.stops.add(origin)
+        self.open_requests += 1
+        self.notify()
+
+    def notify(self):
+        """
+        Wakes up a sleeping elevator (event mode), or makes a travelling one decide again at its next floor.
+        """
+        if self.wake_up is not None and not self.wake_up.triggered:
+            self.wake_up.succeed()
+        if self.replan is not None and not self.replan.triggered:
+            self.replan.succeed()
+
+    def has_work(self) -> bool:
+        return bool(self.task_queue) if self.policy is None else bool(self.stops)
+
+    def pending_tasks(self) -> int:
+        """
+        Queued tasks plus the one being served, or undelivered requests with a policy.
+        """
+        if self.policy is not None:
+            return self.open_requests
+        return len(self.task_queue) + (self.current_task is not None)
+
+    def tail(self):
+        """
+        Floor and direction where the pending work ends, None without pending work.
+        """
+        if self.policy is not None:
+            if not self.stops:
+                return None
+            return (self.stops.highest() if self.direction == UP else self.stops.lowest()), self.direction
+
+        queue = self.task_queue
+        last = queue[-1] if queue else self.current_task
+        if last is None:
+            return None
+        if len(queue) > 1:
+            previous = queue[-2]
+        elif queue and self.current_task is not None:
+            previous = self.current_task
+        else:
+            previous = self.current_floor
+        return last, (UP if last >= previous else DOWN)
+
+    def end_idle(self):
+        if self.idle_start_time is not None:
+            self.idle_time += self.env.now - self.idle_start_time
+            self.idle_start_time = None
+
+    def idle_time_until(self, until: float) -> float:
+        """
+        Total time spent idle at the resting floor, counting an idle period still open at until.
+        """
+        if self.idle_start_time is None:
+            return self.idle_time
+        return self.idle_time + until - self.idle_start_time
+
+    def is_waiting(self) -> bool:
+        """
+        True while the elevator is vacant and asleep waiting for a task (event mode).
+        """
+        return self.wake_up is not None
 
     def hold(self, duration: float):
         """
@@ -68,31 +186,99 @@ class Elevator:
 
         # Move event
         self.moving = True
-        print(f"[{self.env.now:.1f}] Elevator starting move from {self.current_floor} to {target_floor}")
+        self.events.debug("move_start", elevator_id=self.elevator_id, origin=self.current_floor, target=target_floor)
         yield self.env.timeout(travel_time)
 
         self.current_floor = target_floor
         self.moving = False
-        print(f"[{self.env.now:.1f}] Elevator arrived at floor {self.current_floor}")
+        self.passing = False
+        self.events.debug("move_end", elevator_id=self.elevator_id, floor=self.current_floor)
+
+    def travel(self, target_floor: int):
+        """
+        Moves towards target_floor in one timeout, with a policy. A request made on the way (notify) cuts
+        the trip short at the next floor the car reaches, where the policy decides again, so calls made
+        on the way are still served. Floors the car only passes are not stops: last_floor keeps the floor
+        of the previous stop.
+        """
+        start = self.current_floor
+        departure = self.env.now
+        step = 1 if target_floor > start else -1
+        travel_time = abs(target_floor - start) / self.speed
+        if not self.passing:
+            self.last_floor = start
+
+        self.moving = True
+        self.events.debug("move_start", elevator_id=self.elevator_id, origin=start, target=target_floor)
+        self.replan = self.env.event()
+        arrival = self.env.timeout(travel_time)
+        yield arrival | self.replan
+        self.replan = None
+
+        if self.env.now < departure + travel_time:
+            # Floors already covered, a car exactly at a floor is there
+            covered = (self.env.now - departure) * self.speed
+            if abs(covered - round(covered)) < 1e-9:
+                covered = round(covered)
+            next_floor = start + step * max(1, math.ceil(covered))
+            if next_floor != target_floor:
+                yield self.env.timeout(abs(next_floor - start) / self.speed - (self.env.now - departure))
+                target_floor = next_floor
+            else:
+                yield arrival
+
+        self.current_floor = target_floor
+        self.moving = False
+        self.passing = target_floor not in self.stops
+        self.events.debug("move_end", elevator_id=self.elevator_id, floor=self.current_floor)
 
     def run(self):
         """
-        Elevator main loop: process queued tasks in FIFO order.
+        Elevator main loop: process queued tasks in FIFO order, or pending stops as the policy decides.
         """
         while True:
             if self.task_queue:
 
               # Get next task
               next_floor = self.task_queue.popleft()
-              self.idle_start_time = None
-              print(f"[{self.env.now:.1f}] Elevator processing request to floor {next_floor}")
+              task_request = self.task_requests.popleft()
+              self.current_task = next_floor
+              self.end_idle()
+              self.events.debug("task_start", elevator_id=self.elevator_id, floor=next_floor)
 
               # Move if necesary
               if next_floor == self.current_floor and not self.moving:
-                print(f"[{self.env.now:.1f}] Elevator is already at floor {next_floor}")
+                self.events.debug("task_at_floor", elevator_id=self.elevator_id, floor=next_floor)
+                self.record_trip(task_request)
               else:
                 yield self.env.process(self.move_to(next_floor))
+                self.record_trip(task_request)
                 yield self.env.process(self.hold(DEFAULT_WAIT_TIME)) # hold briefly after arrival
+
+              self.current_task = None
+              if self.dispatcher is not None:
+                self.dispatcher.update(self)
+            elif self.stops:
+              self.end_idle()
+
+              if self.current_floor in self.stops:
+                # Doors open: passengers get off and on, then hold briefly
+                self.serve_stop()
+                if self.dispatcher is not None:
+                  self.dispatcher.update(self)
+                yield from self.hold(DEFAULT_WAIT_TIME)
+              else:
+                # Head to the policy's target, or to the first pending stop on the way there
+                target, self.direction = self.policy.next_target(self.stops, self.current_floor, self.direction)
+                if target > self.current_floor:
+                  on_the_way = self.stops.above(self.current_floor)
+                  if on_the_way is not None and on_the_way < target:
+                    target = on_the_way
+                else:
+                  on_the_way = self.stops.below(self.current_floor)
+                  if on_the_way is not None and on_the_way > target:
+                    target = on_the_way
+                yield from self.travel(target)
             else:
 
               # No tasks, execute resting policy:
@@ -104,12 +290,27 @@ class Elevator:
               next_floor = self.base_floor
 
               if self.current_floor != next_floor:
-                print(f"[{self.env.now:.1f}] Elevator vacant, going to floor {next_floor}")
+                self.events.debug("resting", elevator_id=self.elevator_id, floor=next_floor)
                 yield self.env.process(self.move_to(next_floor))
+                if self.dispatcher is not None and not self.has_work():
+                  self.dispatcher.update(self) # resting floor
 
               # 3. Use next floor prediction from a model
               # WIP
 
+              if self.idle_mode == "event":
+                if self.has_work():
+                  continue  # tasks arrived while going to the resting floor
+
+                # Sleep until add_task wakes us up, the demand generator builds
+                # the snapshot when the next request (its label) arrives
+                if self.idle_start_time is None:
+                  self.idle_start_time = self.env.now
+                self.wake_up = self.env.event()
+                yield self.wake_up
+                self.wake_up = None
+                continue
+
               if self.idle_start_time is None:
                 self.idle_start_time = self.env.now
               
@@ -119,89 +320,65 @@ class Elevator:
 
               yield self.env.timeout(DEFAULT_CHECK_TIME)
 
-    def compute_mean_floor(self, histogram: dict):
-        """
-        Calculates the weighted mean floor based on cumulative demand histogram.
-        Gives a notion of the location of a hot spot.
-        """
-        total = sum(histogram.values())
-        if total == 0:
-            return None
-
-        weighted_sum = sum(floor * count for floor, count in histogram.items())
-        return weighted_sum / total
-    
-
-    def compute_center_of_mass_distance(self, current_floor: int):
+    def record_trip(self, task_request):
         """
-        Computes the absolute distance between the current floor and demand center of mass.
-        Gives a notion of the distance to a hot spot.
+        Records the pickup or drop off of a FIFO task made for a request, on arrival at its floor.
         """
-        mean = self.compute_mean_floor(self.request_histogram)
-        if mean is None:
-            return None
-
-        return abs(current_floor - mean)
-    
-    def compute_entropy(self, histogram: dict):
+        if task_request is None:
+            return
+        request, pickup = task_request
+        if pickup:
+            self.simulation.trips.picked_up(request, self.env.now)
+        else:
+            self.simulation.trips.dropped_off(request, self.env.now)
+
+    def serve_stop(self):
         """
-        Calculates the entropy of the cumulative floor demand histogram.
-        Captures how predictable or chaotic the demand has been: 
-        low entropy, requests come from few floors; 
-        high entropy, requests evenly spread out.
-        Gives a notion of the distribution we are dealing with and its predictability.
-
-        Note: 0 ≤ entropy ≤ log2(floors)
+        Drops off the passengers riding to the current floor and picks up those waiting there.
         """
-        total = sum(histogram.values())
-        if total == 0:
-            return None
-
-        entropy = 0.0
-        for count in histogram.values():
-            if count > 0:
-                p = count / total
-                entropy -= p * math.log2(p)
-
-        return round(entropy, 3)
-
+        floor = self.current_floor
+        self.stops.discard(floor)
+        self.passing = False
+        self.events.debug("stop", elevator_id=self.elevator_id, floor=floor)
+
+        for request in self.riding.pop(floor, ()):
+            self.open_requests -= 1
+            self.simulation.trips.dropped_off(request, self.env.now)
+        for request in self.waiting.pop(floor, ()):
+            self.simulation.trips.picked_up(request, self.env.now)
+            self.riding.setdefault(request.destination, []).append(request)
+            self.stops.add(request.destination)
 
     def save_snapshot(self):
         """
         Captures elevator state when idle and relevant features.
-        Stores the data with expected backend format, but in memory to add label later.
-        """
-        timestamp = self.simulation.start_datetime + timedelta(seconds=self.env.now)
-
-        # Features to compute
-        histogram = [self.request_histogram[f] for f in self.floors]
-        entropy = self.compute_entropy(self.request_histogram)
-        #hot_floor = self.get_hot_floor_last_30s() # TODO
-        mean_floor = self.compute_mean_floor(self.request_histogram)
-        center_of_mass_distance = self.compute_center_of_mass_distance(self.current_floor)
-
-        # Create dict as expected by backend
-        self.last_snapshot = {
-            "simulation_id": self.simulation.simulation_id,
-            "current_floor": self.current_floor,
-            "last_floor": self.last_floor,
-            "time_idle": round(self.env.now - self.idle_start_time, 3),
-            "timestamp": timestamp.isoformat(),
-            "floor_demand_histogram": histogram,
-            #"hot_floor_last_30s": hot_floor, # TODO
-            "requests_entropy": entropy,
-            "mean_requested_floor": mean_floor,
-            "distance_to_center_of_mass": center_of_mass_distance,
-            "next_floor_requested": None
-        }
+        Kept in memory as a compact record to add label later, the sink turns it into the backend format.
+        """
+        # Features are kept up to date incrementally so reading them is O(1) (windows expire up to now),
+        # the time stays numeric until the sink builds the timestamp
+        now = self.env.now
+        self.last_snapshot = Snapshot(
+            simulation_id=self.simulation.simulation_id,
+            elevator_id=self.elevator_id,
+            current_floor=self.current_floor,
+            last_floor=self.last_floor,
+            time_idle=round(now - self.idle_start_time, 3),
+            sim_time=now,
+            start_datetime=self.simulation.start_datetime,
+            names=self.features.names,
+            features=self.features.values(self, now),
+        )
+        self.simulation.metrics.snapshots_built += 1
 
     def post_snapshot(self):
         """
-        Stores the completed snapshot in the backend database.
+        Stores the completed snapshot through the simulation sink,
+        by default the backend database (posted in bulk from a background thread).
 
-        Example snapshot:
+        Example snapshot (as_dict()):
         {
         'simulation_id': 13,
+        'elevator_id': 0,
         'current_floor': 1, 
         'last_floor': 2, 
         'time_idle': 52.0, 
@@ -210,18 +387,21 @@ class Elevator:
         'requests_entropy': 1.922, 
         'mean_requested_floor': 2.2, 
         'distance_to_center_of_mass': 1.20, 
+        'hot_floor_last_30s': 1, 
+        'requests_entropy_last_30s': 0.918, 
+        'request_rate_last_30s': 0.1, 
         'next_floor_requested': 3
         }
         """
         if not self.last_snapshot:
             raise ValueError("No snapshot to store!")
 
-        api_url = os.getenv("API_BASE_URL", "http://localhost:8000")
-        endpoint = f"{api_url}/elevator_request"
-        response = requests.post(endpoint, json=self.last_snapshot)
-
-        if response.status_code != 200:
-            raise Exception(f"Failed to post elevator request: {response.status_code} {response.text}")
-        print(f"[SYS] Snapshot posted! {self.last_snapshot}")
+        self.simulation.metrics.timed_post(self.simulation.sink, self.last_snapshot)
+        self.events.info(
+            "snapshot_posted",
+            elevator_id=self.elevator_id,
+            current_floor=self.current_floor,
+            next_floor_requested=self.last_snapshot.next_floor_requested,
+        )
 
 
@@ -0,0 +1,333 @@
+from typing import List
+import math
+
+import numpy as np
+
+from features import FEATURE_REGISTRY
+from params import DEFAULT_WAIT_TIME, SAMPLER_BATCH_SIZE
+from snapshots import SnapshotBatch
+from traces import TraceSampler
+
+# Features the fast engine knows how to compute in bulk
+FAST_FEATURES = (
+    "floor_demand_histogram", "requests_entropy", "mean_requested_floor", "distance_to_center_of_mass",
+    "hot_floor_last_30s", "requests_entropy_last_30s", "request_rate_last_30s",
+)
+
+WINDOWED_FEATURES = tuple(name for name in FAST_FEATURES if FEATURE_REGISTRY[name].window is not None)
+
+SNAPSHOT_BATCH_SIZE = 8192 # snapshots built and written at once
+MAX_SERVE_PASSES = 50 # passes over the request states before serving them one by one
+
+# States of a request when it arrives
+BUSY, RETURNING, IDLE = 0, 1, 2
+
+
+class FastEngine:
+    def __init__(self, simulation):
+        """
+        Array-based alternative to the simpy engine for the FIFO single elevator with Poisson or replayed demand.
+
+        Requests are drawn in batches from the simulation's DemandSampler (or read from its trace), the elevator is advanced
+        with array recurrences over arrivals (no events, no generators), and snapshot features are
+        built with cumulative array operations and written in batches. Every floating point operation
+        on times is done in the same order as in the simpy engine with the event idle mode, so both
+        produce the same snapshots for the same seed (see tests/test_fast_engine.py).
+
+        Args:
+            simulation: Simulation to run, built with sampling="numpy" and idle_mode="event"
+        """
+        unsupported = [name for name in FEATURE_REGISTRY if name not in FAST_FEATURES]
+        if unsupported:
+            raise ValueError(f"Features not supported by the numpy engine: {unsupported}")
+        if len(simulation.elevators) != 1 or simulation.policy != "fifo":
+            raise ValueError("The numpy engine only simulates a single FIFO elevator")
+        if simulation.elevator.base_floor is None:
+            raise ValueError("The numpy engine needs a valid base floor")
+
+        self.simulation = simulation
+        self.sampler = simulation.demand_generator.sampler
+        self.floors = simulation.elevator.floors
+        self.speed = simulation.elevator.speed
+        self.base_floor = simulation.elevator.base_floor
+
+    def draw_requests(self, until: float):
+        """
+        Draws every request arriving before until.
+        Arrival times are accumulated one by one from 0, as simpy does, or read as they are from a trace.
+        """
+        if isinstance(self.sampler, TraceSampler):
+            return self.sampler.requests_before(until)
+
+        chunks = []
+        last_time = 0.0
+        while True:
+            gaps = self.sampler.interarrival_times(SAMPLER_BATCH_SIZE)
+            times = np.cumsum(np.concatenate(([last_time], gaps)))[1:]
+            chunks.append(times[times < until])
+            if times[-1] >= until:
+                break
+            last_time = times[-1]
+
+        arrivals = np.concatenate(chunks)
+        origins, destinations = self.sampler.origin_destinations(len(arrivals))
+        return arrivals, origins, destinations
+
+    def serve(self, arrivals: np.ndarray, origins: np.ndarray, destinations: np.ndarray):
+        """
+        Advances the elevator over the requests in FIFO order.
+        Returns, for each request that found the elevator idle: its index, time idle and last floor.
+
+        A request finds the elevator busy (it starts when the previous one is done, from its destination),
+        going back to its resting floor (it starts once there) or idle (it starts on arrival, from the resting floor).
+        Given these states, done times are running sums of travel and wait times restarted at each idle
+        request, added in the same order as the simpy engine (segmented_cumsum). States are first settled
+        on a max-plus closed form of the recurrence (cheap, but with sums in another order), then recomputed
+        from the exact done times until they agree, usually at once.
+        """
+        speed = self.speed
+        base = self.base_floor
+        wait = DEFAULT_WAIT_TIME
+        n = len(arrivals)
+        if n == 0:
+            return np.empty(0, dtype=np.int64), [], []
+
+        # Origins and destinations always differ, so every request ends with a move to its destination
+        previous = np.concatenate(([base], destinations[:-1])) # where a busy elevator takes the request from
+        back = np.where(previous != base, np.abs(previous - base) / speed, 0.0) # return to rest before the request
+        busy_moves = origins != previous
+        fresh_moves = origins != base
+        busy_travel = np.abs(origins - previous) / speed
+        fresh_travel = np.abs(origins - base) / speed
+        ride = np.abs(destinations - origins) / speed
+
+        def done_times(state):
+            busy = state == BUSY
+            slots = np.empty((n, 5))
+            present = np.ones((n, 5), dtype=bool)
+            slots[:, 0] = np.where(state == IDLE, arrivals, back) # start time, or return added to the previous done time
+            present[:, 0] = ~busy
+            slots[:, 1] = np.where(busy, busy_travel, fresh_travel)
+            slots[:, 2] = wait
+            present[:, 1] = present[:, 2] = np.where(busy, busy_moves, fresh_moves)
+            slots[:, 3] = ride
+            slots[:, 4] = wait
+            starts = np.zeros((n, 5), dtype=bool)
+            starts[:, 0] = state == IDLE
+            sums = segmented_cumsum(slots[present], starts[present])
+            return sums[np.cumsum(present.sum(axis=1)) - 1]
+
+        def approximate_done_times(state):
+            # D[i] = max(A[i] + fresh service, D[i - 1] + service after D[i - 1]), only the latter when busy
+            busy = state == BUSY
+            continued = np.cumsum(np.where(busy, busy_service, back + fresh_service))
+            return continued + np.maximum.accumulate(np.where(busy, -np.inf, arrivals + fresh_service) - continued)
+
+        def states(done):
+            done_before = np.concatenate(([0.0], done[:-1]))
+            rested = done_before + back
+            return np.where(arrivals < done_before, BUSY, np.where(arrivals < rested, RETURNING, IDLE)), rested
+
+        busy_service = busy_moves * (busy_travel + wait) + ride + wait
+        fresh_service = fresh_moves * (fresh_travel + wait) + ride + wait
+        # First guess: D[i] = max(A[i] + fresh service, D[i - 1] + busy service)
+        continued = np.cumsum(busy_service)
+        state, _ = states(continued + np.maximum.accumulate(arrivals + fresh_service - continued))
+        for _ in range(MAX_SERVE_PASSES):
+            new_state, _ = states(approximate_done_times(state))
+            if np.array_equal(new_state, state):
+                break
+            state = new_state
+        for _ in range(MAX_SERVE_PASSES):
+            new_state, rested = states(done_times(state))
+            if np.array_equal(new_state, state):
+                break
+            state = new_state
+        else:
+            return self.serve_sequential(arrivals.tolist(), origins.tolist(), destinations.tolist())
+
+        idle_indices = np.flatnonzero(state == IDLE)
+        idle_times = round_like_python(arrivals[idle_indices] - rested[idle_indices])
+        # The last move before going idle is the return to rest, or the ride of the previous request
+        before = idle_indices[idle_indices > 0] - 1
+        last_floors = np.where(destinations[before] != base, destinations[before], origins[before])
+        idle_last_floors = ([base] if idle_indices[0] == 0 else []) + last_floors.tolist()
+        return idle_indices, idle_times, idle_last_floors
+
+    def serve_sequential(self, arrivals: List[float], origins: List[int], destinations: List[int]):
+        """
+        serve() request by request, for the rare runs where its states do not settle.
+        """
+        speed = self.speed
+        base = self.base_floor
+        wait = DEFAULT_WAIT_TIME
+
+        done_time = 0.0 # when all tasks received so far are done
+        position = base
+        last_floor = base # no move yet, as in Elevator
+
+        idle_indices, idle_times, idle_last_floors = [], [], []
+        for i, (arrival, origin, destination) in enumerate(zip(arrivals, origins, destinations)):
+            if arrival < done_time:
+                # Busy, the request is queued behind the previous ones
+                now = done_time
+            else:
+                # The queue emptied at done_time, the elevator went back to its resting floor
+                if position != base:
+                    last_floor = position
+                    done_time = done_time + abs(position - base) / speed
+                    position = base
+
+                if arrival < done_time:
+                    now = done_time # arrived while going to rest
+                else:
+                    idle_indices.append(i)
+                    idle_times.append(round(arrival - done_time, 3))
+                    idle_last_floors.append(last_floor)
+                    now = arrival
+
+            for target in (origin, destination):
+                if target != position:
+                    last_floor = position
+                    now = now + abs(target - position) / speed
+                    now = now + wait
+                    position = target
+            done_time = now
+
+        return np.asarray(idle_indices, dtype=np.int64), idle_times, idle_last_floors
+
+    def run(self, until: float):
+        """
+        Simulates until the given time and writes labeled snapshots to the simulation sink.
+        """
+        arrivals, origins, destinations = self.draw_requests(until)
+        recorder = self.simulation.demand_generator.recorder
+        if recorder is not None:
+            recorder.write_many(arrivals, origins, destinations)
+        idle_indices, idle_times, idle_last_floors = self.serve(arrivals, origins, destinations)
+        self.write_snapshots(arrivals, origins, idle_indices, idle_times, idle_last_floors)
+
+    def write_snapshots(self, arrivals, origins, idle_indices, idle_times, idle_last_floors):
+        """
+        Builds the snapshot of every idle request from the demand before it, as columns,
+        and hands them to the sink in batches of SNAPSHOT_BATCH_SIZE.
+
+        Demand counts per floor before a request (cumulative or in a window) are read from
+        the sorted positions of the requests of each floor. Windows hold the earlier requests arrived
+        after now - seconds, as SlidingWindow.expire leaves them. Running sums (entropy terms) are
+        accumulated request by request as in DemandStats, windowed entropies are recomputed from the
+        window counts and agree with SlidingWindow to the rounding of the feature.
+        """
+        if not len(idle_indices):
+            return
+        sim = self.simulation
+        base = self.base_floor
+        floors = np.sort(np.asarray(self.floors))
+        counted = int(idle_indices[-1]) # requests before the last snapshot, the others are never counted
+        origin_idx = np.searchsorted(floors, origins[:counted]).astype(np.min_scalar_type(len(floors))) # small ints sort by radix
+
+        # Requests of each floor, by position, and how many requests of its floor came before each one
+        by_floor = np.argsort(origin_idx, kind="stable")
+        bounds = np.searchsorted(origin_idx[by_floor], np.arange(len(floors) + 1))
+        positions = [by_floor[bounds[f]:bounds[f + 1]] for f in range(len(floors))]
+        previous_counts = np.empty(counted, dtype=np.int64)
+        previous_counts[by_floor] = np.arange(counted) - np.repeat(bounds[:-1], np.diff(bounds))
+
+        def counts_before(indices):
+            return np.stack([np.searchsorted(floor_positions, indices) for floor_positions in positions], axis=1)
+
+        # Entropy terms accumulated request by request, with the same values as DemandStats
+        c_log_c = np.asarray([count * math.log2(count) if count else 0.0 for count in range(previous_counts.max(initial=0) + 2)])
+        sum_c_log_c = np.cumsum(np.concatenate(([0.0], c_log_c[previous_counts + 1] - c_log_c[previous_counts]))) # before each request
+        weighted_sums = np.cumsum(np.concatenate(([0], origins[:counted])))
+
+        for start in range(0, len(idle_indices), SNAPSHOT_BATCH_SIZE):
+            indices = idle_indices[start:start + SNAPSHOT_BATCH_SIZE]
+            histograms = counts_before(indices)
+
+            # Features of the cumulative demand, null before the first request
+            first = indices == 0
+            i = np.maximum(indices, 1)
+            entropy = np.asarray([math.log2(count) for count in i.tolist()]) - sum_c_log_c[indices] / i
+            mean = weighted_sums[indices] / i
+            features = {
+                "floor_demand_histogram": histograms,
+                "requests_entropy": np.ma.masked_array(round_like_python(np.where(entropy > 0.0, entropy, 0.0)), first),
+                "mean_requested_floor": np.ma.masked_array(mean, first),
+                "distance_to_center_of_mass": np.ma.masked_array(np.abs(base - mean), first),
+            }
+            for seconds in sorted({FEATURE_REGISTRY[name].window for name in WINDOWED_FEATURES}):
+                window = histograms - counts_before(np.searchsorted(arrivals, arrivals[indices] - seconds, side="right"))
+                features.update(windowed_values(window, floors, seconds))
+
+            batch = SnapshotBatch(
+                simulation_id=sim.simulation_id,
+                elevator_id=0,
+                start_datetime=sim.start_datetime,
+                names=FAST_FEATURES,
+                sim_times=arrivals[indices],
+                current_floor=np.full(len(indices), base),
+                last_floor=idle_last_floors[start:start + SNAPSHOT_BATCH_SIZE],
+                time_idle=idle_times[start:start + SNAPSHOT_BATCH_SIZE],
+                next_floor_requested=origins[indices],
+                features=[features[name] for name in FAST_FEATURES],
+            )
+            sim.metrics.snapshots_built += len(batch)
+            sim.metrics.timed_post_batch(sim.sink, batch)
+
+
+def windowed_values(window: np.ndarray, floors: np.ndarray, seconds: float) -> dict:
+    """
+    Values of the windowed features of a window length, from the window counts (one row per snapshot).
+    """
+    totals = window.sum(axis=1)
+    c_log_c = np.asarray([count * math.log2(count) if count else 0.0 for count in range(window.max(initial=0) + 1)])
+    log2 = np.asarray([math.log2(count) if count else 0.0 for count in range(totals.max(initial=0) + 1)])
+    empty = totals == 0 # null hot floor and entropy
+    entropies = log2[totals] - c_log_c[window].sum(axis=1) / np.maximum(totals, 1)
+
+    values = {}
+    for name in WINDOWED_FEATURES:
+        if FEATURE_REGISTRY[name].window != seconds:
+            continue
+        if name == "hot_floor_last_30s":
+            values[name] = np.ma.masked_array(floors[np.argmax(window, axis=1)], empty) # first maximum, the lowest floor on ties
+        elif name == "requests_entropy_last_30s":
+            values[name] = np.ma.masked_array(round_like_python(np.where(entropies > 0.0, entropies, 0.0)), empty)
+        elif name == "request_rate_last_30s":
+            values[name] = totals / seconds
+    return values
+
+
+def round_like_python(values: np.ndarray, digits: int = 3) -> np.ndarray:
+    """
+    round(value, digits) of each value. NumPy rounds the scaled values, which gives the same floats
+    except close to half way, where scaling can round the other way: those are rounded by Python.
+    """
+    scale = 10.0 ** digits
+    scaled = values * scale
+    rounded = np.rint(scaled) / scale
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    rounded[near_half] = [round(value, digits) for value in values[near_half].tolist()]
+    return rounded
+
+
+def segmented_cumsum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Running sums of values restarted at each start (the first value must be one), added one by one
+    in order as a Python loop would. Segments are laid out as rows of a zero padded 2D array,
+    grouped by length so padding at most doubles the work, and summed along the rows.
+    """
+    segment_starts = np.flatnonzero(starts)
+    lengths = np.diff(np.append(segment_starts, len(values)))
+    sums = np.empty_like(values)
+    groups = np.ceil(np.log2(lengths)).astype(np.int64)
+    for group in np.unique(groups):
+        segments = np.flatnonzero(groups == group)
+        width = lengths[segments].max()
+        columns = np.arange(width)
+        inside = columns < lengths[segments, None]
+        positions = segment_starts[segments, None] + columns
+        rows = np.where(inside, values[np.where(inside, positions, 0)], 0.0)
+        sums[positions[inside]] = np.cumsum(rows, axis=1)[inside]
+    return sums
@@ -0,0 +1,314 @@
+from collections import defaultdict, deque
+from typing import Dict, List, Type
+import math
+
+
+def c_log_c(count: int) -> float:
+    return count * math.log2(count) if count else 0.0
+
+
+class SlidingWindow:
+    def __init__(self, floors: tuple[int], seconds: float):
+        """
+        Per-floor request counts over the last seconds of simulated time.
+        Requests are kept in a timestamped deque and expired as time advances, each one is
+        added and expired once, so keeping the window up to date is amortized O(1) per request.
+        Floors are also grouped by count to read the hot floor without scanning the histogram.
+
+        Args:
+            floors: Valid floor numbers
+            seconds: Window length, a request at time t counts while now - seconds < t
+        """
+        self.floors = floors
+        self.seconds = seconds
+        self.requests = deque() # (time, floor), oldest first
+        self.counts = {f: 0 for f in floors}
+        self.floors_by_count = defaultdict(set, {0: set(floors)})
+        self.max_count = 0
+        self.total = 0
+        self.sum_c_log_c = 0.0
+
+    def add(self, floor: int, now: float):
+        """
+        Counts a request from floor at time now.
+        """
+        self.expire(now)
+        self.requests.append((now, floor))
+        self.change(floor, 1)
+
+    def expire(self, now: float):
+        """
+        Drops the requests that left the window at time now.
+        """
+        start = now - self.seconds
+        while self.requests and self.requests[0][0] <= start:
+            _, floor = self.requests.popleft()
+            self.change(floor, -1)
+
+    def change(self, floor: int, delta: int):
+        count = self.counts[floor]
+        new_count = count + delta
+        self.counts[floor] = new_count
+        self.floors_by_count[count].discard(floor)
+        self.floors_by_count[new_count].add(floor)
+        if new_count > self.max_count:
+            self.max_count = new_count
+        elif count == self.max_count and not self.floors_by_count[count]:
+            self.max_count = new_count
+
+        self.total += delta
+        if self.total == 0:
+            self.sum_c_log_c = 0.0 # empty window, drop accumulated rounding error
+        else:
+            self.sum_c_log_c += c_log_c(new_count) - c_log_c(count)
+
+    def hot_floor(self):
+        """
+        Most requested floor in the window, the lowest one on ties. None without requests.
+        """
+        if self.total == 0:
+            return None
+        return min(self.floors_by_count[self.max_count])
+
+    def entropy(self):
+        """
+        Entropy of the windowed histogram, None without requests.
+        """
+        if self.total == 0:
+            return None
+        return max(0.0, math.log2(self.total) - self.sum_c_log_c / self.total)
+
+    def rate(self) -> float:
+        """
+        Requests per second in the window.
+        """
+        return self.total / self.seconds
+
+
+class DemandStats:
+    def __init__(self, floors: tuple[int]):
+        """
+        Running aggregates of the cumulative floor demand histogram, and sliding windows over recent demand.
+        Updated in O(1) (amortized for windows) per request, so features read from them in O(1) per snapshot.
+
+        Args:
+            floors: Valid floor numbers
+        """
+        self.floors = floors
+        self.histogram = {f: 0 for f in floors}
+        self.total = 0 # sum of counts
+        self.weighted_sum = 0 # sum of floor * count
+        self.sum_c_log_c = 0.0 # sum of count * log2(count)
+        self.windows: Dict[float, SlidingWindow] = {} # by length in seconds
+
+    def add(self, floor: int, now: float = None):
+        """
+        Counts a request from floor, at time now for the windows.
+        """
+        count = self.histogram[floor]
+        self.sum_c_log_c += (count + 1) * math.log2(count + 1) - (count * math.log2(count) if count else 0.0)
+        self.histogram[floor] = count + 1
+        self.total += 1
+        self.weighted_sum += floor
+        if now is not None:
+            for window in self.windows.values():
+                window.add(floor, now)
+
+    def window(self, seconds: float) -> SlidingWindow:
+        """
+        Window of the given length, shared by every feature that uses it.
+        Created empty, so it should be requested before the first request is counted.
+        """
+        if seconds not in self.windows:
+            self.windows[seconds] = SlidingWindow(self.floors, seconds)
+        return self.windows[seconds]
+
+    def advance(self, now: float):
+        """
+        Expires the windows up to time now.
+        """
+        for window in self.windows.values():
+            window.expire(now)
+
+    def mean_floor(self):
+        """
+        Weighted mean floor of the demand, None without requests.
+        """
+        if self.total == 0:
+            return None
+        return self.weighted_sum / self.total
+
+    def entropy(self):
+        """
+        Entropy of the demand histogram, H = log2(N) - sum(c * log2(c)) / N.
+        None without requests.
+        """
+        if self.total == 0:
+            return None
+        return max(0.0, math.log2(self.total) - self.sum_c_log_c / self.total)
+
+
+class Feature:
+    """
+    Snapshot feature with an incremental update rule.
+    update() runs on every request and value() on every snapshot, both should be O(1).
+    Subclasses registered with @register_feature are computed by default,
+    name is the snapshot (and ElevatorRequest) field they fill.
+    Features over recent demand set window to its length in seconds and read stats.window(window).
+    """
+    name = None
+    window = None
+
+    def __init__(self, floors: tuple[int]):
+        self.floors = floors
+
+    def update(self, stats: DemandStats, floor: int, now: float):
+        """
+        Called after stats counted a request from floor at simulated time now.
+        """
+
+    def value(self, stats: DemandStats, elevator):
+        raise NotImplementedError
+
+
+FEATURE_REGISTRY: Dict[str, Type[Feature]] = {}
+
+
+def register_feature(feature_class: Type[Feature]) -> Type[Feature]:
+    """
+    Class decorator that adds a feature to the registry.
+    """
+    FEATURE_REGISTRY[feature_class.name] = feature_class
+    return feature_class
+
+
+@register_feature
+class FloorDemandHistogram(Feature):
+    """
+    Cumulative requests per floor, in floor order.
+    """
+    name = "floor_demand_histogram"
+
+    def value(self, stats, elevator):
+        return [stats.histogram[f] for f in self.floors]
+
+
+@register_feature
+class RequestsEntropy(Feature):
+    """
+    Captures how predictable or chaotic the demand has been:
+    low entropy, requests come from few floors;
+    high entropy, requests evenly spread out.
+
+    Note: 0 ≤ entropy ≤ log2(floors)
+    """
+    name = "requests_entropy"
+
+    def value(self, stats, elevator):
+        entropy = stats.entropy()
+        return None if entropy is None else round(entropy, 3)
+
+
+@register_feature
+class MeanRequestedFloor(Feature):
+    """
+    Weighted mean floor of the demand, gives a notion of the location of a hot spot.
+    """
+    name = "mean_requested_floor"
+
+    def value(self, stats, elevator):
+        return stats.mean_floor()
+
+
+@register_feature
+class DistanceToCenterOfMass(Feature):
+    """
+    Absolute distance between the current floor and the demand center of mass,
+    gives a notion of the distance to a hot spot.
+    """
+    name = "distance_to_center_of_mass"
+
+    def value(self, stats, elevator):
+        mean = stats.mean_floor()
+        if mean is None:
+            return None
+        return abs(elevator.current_floor - mean)
+
+
+@register_feature
+class HotFloorLast30s(Feature):
+    """
+    Most requested floor in the last 30 seconds, the lowest one on ties.
+    """
+    name = "hot_floor_last_30s"
+    window = 30.0
+
+    def value(self, stats, elevator):
+        return stats.window(self.window).hot_floor()
+
+
+@register_feature
+class RequestsEntropyLast30s(Feature):
+    """
+    Entropy of the demand of the last 30 seconds, see RequestsEntropy.
+    """
+    name = "requests_entropy_last_30s"
+    window = 30.0
+
+    def value(self, stats, elevator):
+        entropy = stats.window(self.window).entropy()
+        return None if entropy is None else round(entropy, 3)
+
+
+@register_feature
+class RequestRateLast30s(Feature):
+    """
+    Requests per second in the last 30 seconds, short term intensity of the demand.
+    """
+    name = "request_rate_last_30s"
+    window = 30.0
+
+    def value(self, stats, elevator):
+        return stats.window(self.window).rate()
+
+
+class FeatureEngine:
+    def __init__(self, floors: tuple[int], features: List[str] = None):
+        """
+        Keeps the demand stats and the incremental state of every feature.
+
+        Args:
+            floors: Valid floor numbers
+            features: Names of the registered features to compute, all of them by default
+        """
+        self.stats = DemandStats(floors)
+        names = features if features is not None else list(FEATURE_REGISTRY)
+        self.features = [FEATURE_REGISTRY[name](floors) for name in names]
+        self.names = tuple(feature.name for feature in self.features) # layout of values(), shared by snapshots
+        for feature in self.features:
+            if feature.window is not None:
+                self.stats.window(feature.window)
+
+    def add_request(self, floor: int, now: float):
+        """
+        Updates the stats and every feature with a request from floor.
+        """
+        self.stats.add(floor, now)
+        for feature in self.features:
+            feature.update(self.stats, floor, now)
+
+    def compute(self, elevator, now: float = None) -> dict:
+        """
+        Current value of every feature, keyed by name.
+        Windows are expired up to now, or left as of the last request.
+        """
+        return dict(zip(self.names, self.values(elevator, now)))
+
+    def values(self, elevator, now: float = None) -> tuple:
+        """
+        Current value of every feature, in the order of names.
+        """
+        if now is not None:
+            self.stats.advance(now)
+        stats = self.stats
+        return tuple([feature.value(stats, elevator) for feature in self.features])
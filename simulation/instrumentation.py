@@ -0,0 +1,131 @@
+import cProfile
+import json
+import logging
+import time
+
+LEVELS = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "WARNING": logging.WARNING}
+
+
+class EventLogger:
+    def __init__(self, level: str = None, env=None, logger_name: str = "elevator_sim.events"):
+        """
+        Leveled, structured log of simulation events, disabled by default.
+        Each event is a name and fields, emitted as one JSON line through the logging module
+        with its simulated time. Calls below the level return before building anything,
+        so a disabled logger costs one comparison per event.
+
+        Args:
+            level: "DEBUG" (every movement), "INFO" (requests, snapshots) or "WARNING", None disables it
+            env: SimPy environment the simulated time is read from
+            logger_name: logging logger the events are emitted to
+        """
+        if level is not None and level not in LEVELS:
+            raise ValueError(f"Invalid log level: {level}")
+        self.level = LEVELS[level] if level is not None else logging.CRITICAL + 1
+        self.env = env
+        self.logger = logging.getLogger(logger_name)
+        self.fields = {} # added to every event, e.g. simulation_id
+
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def log(self, level: int, event: str, **fields):
+        if level < self.level:
+            return
+        record = {"sim_time": self.env.now if self.env is not None else None, "event": event, **self.fields, **fields}
+        self.logger.log(level, json.dumps(record, default=str))
+
+    def debug(self, event: str, **fields):
+        if logging.DEBUG >= self.level:
+            self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields):
+        if logging.INFO >= self.level:
+            self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields):
+        if logging.WARNING >= self.level:
+            self.log(logging.WARNING, event, **fields)
+
+
+def configure_logging(level: str = None):
+    """
+    Sends event logs to stderr as bare JSON lines, for command line runs. Does nothing when level is None.
+    """
+    if level is not None:
+        logging.basicConfig(level=LEVELS[level], format="%(message)s")
+
+
+def latency_summary(count: int, total: float, max_seconds: float) -> dict:
+    return {"count": count, "sum": total, "mean": total / count if count else None, "max": max_seconds}
+
+
+class SimulationMetrics:
+    def __init__(self):
+        """
+        Runtime counters of a simulation: events processed by the engine, snapshots built and posted,
+        latency of handing snapshots to the sink, and how fast simulated time advanced.
+        The hand-off is all the simulation waits for: the HTTP sink only queues snapshots,
+        its uploader times the actual HTTP round trips (BackgroundUploader.stats).
+        """
+        self.events_processed = 0
+        self.snapshots_built = 0
+        self.snapshots_posted = 0
+        self.handoff_calls = 0
+        self.handoff_seconds = 0.0
+        self.handoff_max_seconds = 0.0
+        self.sim_time = 0.0
+        self.wall_time = 0.0
+
+    def timed_post(self, sink, snapshot: dict):
+        """
+        Writes a snapshot to the sink, timing the hand-off.
+        """
+        start = time.perf_counter()
+        sink.write_snapshot(snapshot)
+        self.observe_handoff(time.perf_counter() - start)
+        self.snapshots_posted += 1
+
+    def timed_post_batch(self, sink, batch):
+        """
+        Writes a SnapshotBatch to the sink, timing the hand-off once for the whole batch.
+        """
+        start = time.perf_counter()
+        sink.write_batch(batch)
+        self.observe_handoff(time.perf_counter() - start)
+        self.snapshots_posted += len(batch)
+
+    def observe_handoff(self, seconds: float):
+        self.handoff_calls += 1
+        self.handoff_seconds += seconds
+        if seconds > self.handoff_max_seconds:
+            self.handoff_max_seconds = seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "events_processed": self.events_processed,
+            "snapshots_built": self.snapshots_built,
+            "snapshots_posted": self.snapshots_posted,
+            "handoff_latency": latency_summary(self.handoff_calls, self.handoff_seconds, self.handoff_max_seconds),
+            "sim_time": self.sim_time,
+            "wall_time": self.wall_time,
+            "sim_wall_ratio": self.sim_time / self.wall_time if self.wall_time else None,
+        }
+
+
+class Profiler:
+    def __init__(self, path: str):
+        """
+        Profiling hook around the engine run: cProfile stats are written to path,
+        readable with python -m pstats or snakeviz.
+        """
+        self.path = path
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.disable()
+        self.profile.dump_stats(self.path)
@@ -0,0 +1,32 @@
+import math
+
+
+class TripStats:
+    def __init__(self):
+        """
+        Service KPIs of a run: how long picked up passengers waited and how many trips were delivered.
+        Filled by the elevators of the simpy engine.
+        """
+        self.waits = []
+        self.delivered = 0
+
+    def picked_up(self, request, now: float):
+        self.waits.append(now - request.time)
+
+    def dropped_off(self, request, now: float):
+        self.delivered += 1
+
+    def summary(self, elevators: list, until: float) -> dict:
+        """
+        KPIs over a run of until seconds:
+        mean and 95th percentile wait (seconds), delivered trips per hour, fraction of car time spent idle.
+        """
+        waits = sorted(self.waits)
+        idle_time = sum(elevator.idle_time_until(until) for elevator in elevators)
+        return {
+            "picked_up": len(waits),
+            "mean_wait": sum(waits) / len(waits) if waits else None,
+            "p95_wait": waits[math.ceil(0.95 * len(waits)) - 1] if waits else None, # nearest rank
+            "trips_per_hour": self.delivered * 3600 / until,
+            "idle_fraction": idle_time / (until * len(elevators)),
+        }
@@ -7,4 +7,22 @@ FLOORS = tuple(range(1, 6)) # floors 1 to 5
 SIMULATION_DURATION = 100 # in seconds
 DEFAULT_BASE_FLOOR = 1 # starting floor, "street level"
 BASE_FLOOR_WEIGHT = 3 # how many times base floor is more likely to be requested
-DEFAULT_CHECK_TIME = 0.5 # every how many seconds the elevator checks for new tasks
\ No newline at end of file
+DEFAULT_CHECK_TIME = 0.5 # every how many seconds the elevator checks for new tasks
+DEFAULT_IDLE_MODE = "poll" # "poll" checks every DEFAULT_CHECK_TIME, "event" sleeps until a task arrives
+BATCH_MAX_SIZE = 500 # how many snapshots are buffered before posting them in bulk
+BATCH_MAX_INTERVAL = 5.0 # max wall seconds a snapshot waits in the buffer before being posted
+HTTP_POOL_SIZE = 4 # keep-alive connections shared by the simulation's API client
+HTTP_TIMEOUT = 10.0 # seconds before a request to the API is considered failed
+UPLOAD_MAX_RETRIES = 3 # retries of a failed batch before spooling it to disk
+UPLOAD_BACKOFF = 0.5 # base delay in seconds of the exponential backoff between retries
+SPOOL_PATH = "snapshot_spool.jsonl" # local append-only file for snapshots the API did not accept
+UPLOAD_QUEUE_SIZE = 10 * BATCH_MAX_SIZE # snapshots waiting for upload in memory, more go straight to the spool
+ROW_GROUP_SIZE = 65536 # snapshots per row group written by columnar sinks
+DEFAULT_SAMPLING = "python" # "python" samples each request with random, "numpy" in precomputed batches
+DEFAULT_ENGINE = "simpy" # "simpy" event by event, "numpy" array based fast path (FIFO single elevator only)
+SAMPLER_BATCH_SIZE = 4096 # requests drawn at once by the numpy demand sampler
+DEFAULT_ELEVATORS = 1 # cars in the bank, sharing one demand stream
+DEFAULT_POLICY = "fifo" # order cars serve their requests in: "fifo", "scan", "look" or "nearest"
+DISPATCH_SLACK = 2 # extra pending tasks a car heading the same way can have and still take a request
+DEFAULT_LOG_LEVEL = None # structured event log level: None (quiet), "DEBUG", "INFO" or "WARNING"
+DEFAULT_CHECKPOINT_INTERVAL = 3600 # simulated seconds between checkpoints, when checkpointing
@@ -0,0 +1,138 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Tuple, Type
+
+UP, DOWN = 1, -1
+
+
+class Request:
+    __slots__ = ("origin", "destination", "time")
+
+    def __init__(self, origin: int, destination: int, time: float):
+        """
+        A passenger trip, time is when it was requested.
+        """
+        self.origin = origin
+        self.destination = destination
+        self.time = time
+
+
+class SortedFloors:
+    def __init__(self):
+        """
+        Pending stops of a car: a set for membership and a sorted list
+        to find the next stop above or below a floor by bisection.
+        """
+        self.floors: List[int] = []
+        self.members = set()
+
+    def __len__(self) -> int:
+        return len(self.floors)
+
+    def __contains__(self, floor: int) -> bool:
+        return floor in self.members
+
+    def add(self, floor: int):
+        if floor not in self.members:
+            self.members.add(floor)
+            insort(self.floors, floor)
+
+    def discard(self, floor: int):
+        if floor in self.members:
+            self.members.discard(floor)
+            del self.floors[bisect_left(self.floors, floor)]
+
+    def above(self, floor: int):
+        """
+        Closest stop strictly above floor, None if there is none.
+        """
+        i = bisect_right(self.floors, floor)
+        return self.floors[i] if i < len(self.floors) else None
+
+    def below(self, floor: int):
+        """
+        Closest stop strictly below floor, None if there is none.
+        """
+        i = bisect_left(self.floors, floor)
+        return self.floors[i - 1] if i > 0 else None
+
+    def lowest(self):
+        return self.floors[0] if self.floors else None
+
+    def highest(self):
+        return self.floors[-1] if self.floors else None
+
+
+class Policy:
+    """
+    Chooses where a car heads next among its pending stops.
+    The car travels to the target, or to the first pending stop on the way, and calls next_target() again
+    at every stop and at the next floor it reaches after a new call, so targets can change as calls come in.
+    Subclasses registered with @register_policy can be selected by name.
+    """
+    name = None
+
+    def __init__(self, floors: tuple[int]):
+        self.floors = floors
+        self.bottom = min(floors)
+        self.top = max(floors)
+
+    def next_target(self, stops: SortedFloors, floor: int, direction: int) -> Tuple[int, int]:
+        """
+        Floor to head to and the direction of travel, given non empty stops that do not include floor.
+        """
+        raise NotImplementedError
+
+
+POLICIES: Dict[str, Type[Policy]] = {}
+
+
+def register_policy(policy_class: Type[Policy]) -> Type[Policy]:
+    """
+    Class decorator that adds a policy to the registry.
+    """
+    POLICIES[policy_class.name] = policy_class
+    return policy_class
+
+
+@register_policy
+class Scan(Policy):
+    """
+    Sweeps the whole shaft, from end to end, serving stops on the way.
+    """
+    name = "scan"
+
+    def next_target(self, stops, floor, direction):
+        end = self.top if direction == UP else self.bottom
+        if floor == end:
+            direction = -direction
+            end = self.top if direction == UP else self.bottom
+        return end, direction
+
+
+@register_policy
+class Look(Policy):
+    """
+    Like SCAN, but reverses as soon as there are no more stops ahead.
+    """
+    name = "look"
+
+    def next_target(self, stops, floor, direction):
+        ahead = stops.above(floor) if direction == UP else stops.below(floor)
+        if ahead is None:
+            direction = -direction
+            ahead = stops.above(floor) if direction == UP else stops.below(floor)
+        return ahead, direction
+
+
+@register_policy
+class NearestRequest(Policy):
+    """
+    Heads to the closest pending stop (shortest seek time first), keeping its direction on ties.
+    """
+    name = "nearest"
+
+    def next_target(self, stops, floor, direction):
+        above, below = stops.above(floor), stops.below(floor)
+        if below is None or (above is not None and (above - floor, direction != UP) < (floor - below, direction != DOWN)):
+            return above, UP
+        return below, DOWN
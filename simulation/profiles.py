@@ -0,0 +1,273 @@
+from typing import List, Sequence, Tuple
+import json
+
+import numpy as np
+
+from params import BASE_FLOOR_WEIGHT, SAMPLER_BATCH_SIZE
+from sampling import AliasTable, alias_lookup
+
+
+class DemandProfile:
+    def __init__(
+        self,
+        times: Sequence[float],
+        rates: Sequence[float],
+        interpolation: str = "constant",
+        period: float = None,
+        od: List[Tuple[float, dict]] = None,
+    ):
+        """
+        Time-varying demand: arrival rate over the day and origin/destination distribution per period.
+
+        The rate is a piecewise function of simulated time with knots at times (the first one at 0),
+        it defines a non-homogeneous Poisson process sampled by inverting its cumulative intensity,
+        which is piecewise linear (constant rates) or piecewise quadratic (linear rates) and so is
+        inverted exactly, segment by segment.
+
+        Args:
+            times: Knots in seconds from the start of the run, increasing, the first one at 0
+            rates: Requests per second at each knot
+            interpolation: "constant" holds each rate until the next knot, "linear" interpolates
+                between knots (a linear spline). The last rate holds until the end of the period
+            period: The profile repeats every period seconds (86400 for a daily profile),
+                without it the last rate holds forever
+            od: Origin/destination distribution of each period, (start in seconds, spec) by increasing start,
+                where spec is {"matrix": rows of weights from each origin to each destination, in floor order}
+                or {"origin_weights": {floor: weight}, "destination_weights": {floor: weight}} (missing floors
+                weigh 1, the destination is drawn among the other floors). Each period lasts until the next one,
+                time before the first one uses the default distribution (base floor spike)
+        """
+        if interpolation not in ("constant", "linear"):
+            raise ValueError(f"Invalid interpolation: {interpolation}")
+        times = np.asarray(times, dtype=float)
+        rates = np.asarray(rates, dtype=float)
+        if len(times) == 0 or len(times) != len(rates) or times[0] != 0 or np.any(np.diff(times) <= 0):
+            raise ValueError("Rate knots need increasing times starting at 0, one rate each")
+        if np.any(rates < 0):
+            raise ValueError("Rates can not be negative")
+        if period is not None and period <= times[-1]:
+            raise ValueError("The period must end after the last knot")
+        starts = [start for start, _ in od or []]
+        if starts != sorted(starts) or any(start < 0 or (period is not None and start >= period) for start in starts):
+            raise ValueError("OD periods need increasing starts within the period")
+
+        self.times = times
+        self.rates = rates
+        self.interpolation = interpolation
+        self.period = period
+        self.od = od or []
+
+        # Segments [start, end) with rate start_rate + slope * (t - start)
+        self.ends = np.append(times[1:], period if period is not None else np.inf)
+        self.start_rates = rates
+        if interpolation == "linear":
+            self.slopes = np.append(np.diff(rates) / np.diff(times), 0.0)
+        else:
+            self.slopes = np.zeros(len(times))
+
+        # Cumulative intensity at the start of each segment
+        lengths = self.ends - times
+        if period is None:
+            # The open-ended last segment (flat, slope 0) holds inf requests, none if its rate is 0
+            lengths[-1] = 0.0
+        areas = self.start_rates * lengths + self.slopes * lengths ** 2 / 2
+        if period is None and rates[-1] > 0:
+            areas[-1] = np.inf
+        self.cumulative_at_knots = np.concatenate(([0.0], np.cumsum(areas[:-1])))
+        self.total = float(self.cumulative_at_knots[-1] + areas[-1]) # over a period, inf without one unless the last rate is 0
+        if self.total == 0:
+            raise ValueError("The profile has no demand")
+
+    @classmethod
+    def from_config(cls, config: dict) -> "DemandProfile":
+        """
+        Profile from a config dict, e.g.
+        {
+            "period": 86400,
+            "rate": {"interpolation": "linear", "times": [0, 25200, 30600, 43200], "values": [0.005, 0.3, 0.05, 0.2]},
+            "od": [{"start": 25200, "origin_weights": {"1": 20}}, {"start": 61200, "destination_weights": {"1": 20}}]
+        }
+        """
+        rate = config["rate"]
+        od = []
+        for spec in config.get("od", []):
+            spec = dict(spec)
+            start = spec.pop("start")
+            for key in ("origin_weights", "destination_weights"):
+                if key in spec:
+                    spec[key] = {int(floor): weight for floor, weight in spec[key].items()}
+            od.append((start, spec))
+        return cls(
+            times=rate["times"],
+            rates=rate["values"],
+            interpolation=rate.get("interpolation", "constant"),
+            period=config.get("period"),
+            od=od,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "DemandProfile":
+        """
+        Profile from a JSON config file, see from_config.
+        """
+        with open(path) as f:
+            return cls.from_config(json.load(f))
+
+    def mean_rate(self) -> float:
+        """
+        Average requests per second over a period, the last rate without one.
+        """
+        if self.period is None:
+            return float(self.rates[-1])
+        return self.total / self.period
+
+    def cumulative(self, t: np.ndarray) -> np.ndarray:
+        """
+        Expected number of requests in [0, t).
+        """
+        t = np.asarray(t, dtype=float)
+        cycles = 0.0
+        if self.period is not None:
+            cycles, t = np.divmod(t, self.period)
+        i = np.searchsorted(self.times, t, side="right") - 1
+        tau = t - self.times[i]
+        within = self.start_rates[i] * tau + self.slopes[i] * tau ** 2 / 2
+        return cycles * (self.total if self.period is not None else 0.0) + self.cumulative_at_knots[i] + within
+
+    def invert(self, targets: np.ndarray) -> np.ndarray:
+        """
+        Times at which the cumulative intensity reaches targets, inf when it never does.
+        Solves start_rate * tau + slope * tau^2 / 2 = delta within the segment of each target,
+        in the form that stays stable for zero slopes: tau = 2 delta / (start_rate + sqrt(start_rate^2 + 2 slope delta)).
+        """
+        targets = np.asarray(targets, dtype=float)
+        cycles = np.zeros_like(targets)
+        if self.period is not None:
+            cycles, targets = np.divmod(targets, self.total)
+
+        i = np.searchsorted(self.cumulative_at_knots, targets, side="right") - 1
+        delta = targets - self.cumulative_at_knots[i]
+        a, b = self.start_rates[i], self.slopes[i]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            denominator = a + np.sqrt(np.maximum(a * a + 2 * b * delta, 0.0))
+            tau = np.where(delta > 0, 2 * delta / denominator, 0.0)
+        times = self.times[i] + np.minimum(tau, self.ends[i] - self.times[i])
+        if self.period is not None:
+            times = cycles * self.period + times
+        return times
+
+    def od_tables(self, floors: tuple[int], base_floor: int, base_floor_weight: float):
+        """
+        Stacked alias tables over (origin, destination) pairs, one row per period, and the start of each period.
+        Pair k is origin floors[k // n] to destination floors[k % n].
+        """
+        n = len(floors)
+        default = {"origin_weights": {base_floor: base_floor_weight}, "destination_weights": {base_floor: base_floor_weight}}
+        periods = list(self.od)
+        if not periods or periods[0][0] > 0:
+            periods.insert(0, (0.0, default))
+
+        tables = [AliasTable(np.arange(n * n), od_matrix(spec, floors).ravel()) for _, spec in periods]
+        starts = np.asarray([start for start, _ in periods], dtype=float)
+        return starts, np.stack([table.prob for table in tables]), np.stack([table.alias for table in tables])
+
+
+def od_matrix(spec: dict, floors: tuple[int]) -> np.ndarray:
+    """
+    Probability of each (origin, destination) pair of a period spec (see DemandProfile), zero on the diagonal.
+    """
+    n = len(floors)
+    if "matrix" in spec:
+        matrix = np.asarray(spec["matrix"], dtype=float)
+        if matrix.shape != (n, n) or np.any(matrix < 0):
+            raise ValueError(f"An OD matrix needs {n}x{n} non negative weights")
+        matrix = matrix * (1 - np.eye(n))
+    else:
+        origin = np.asarray([spec.get("origin_weights", {}).get(floor, 1) for floor in floors], dtype=float)
+        destination = np.asarray([spec.get("destination_weights", {}).get(floor, 1) for floor in floors], dtype=float)
+        # Origin by its weight, then destination by its weight among the other floors
+        others = destination.sum() - destination
+        matrix = origin[:, None] / origin.sum() * destination[None, :] / others[:, None] * (1 - np.eye(n))
+    if matrix.sum() == 0:
+        raise ValueError("An OD matrix needs at least one trip between different floors")
+    return matrix / matrix.sum()
+
+
+class ProfileSampler:
+    def __init__(
+        self,
+        profile: DemandProfile,
+        floors: tuple[int],
+        base_floor: int,
+        seed: int,
+        base_floor_weight: float = BASE_FLOOR_WEIGHT,
+        batch_size: int = SAMPLER_BATCH_SIZE,
+    ):
+        """
+        Draws requests of a DemandProfile in NumPy batches, same interface as DemandSampler.
+
+        Arrival times invert the cumulative intensity at the running sum of unit exponentials,
+        so a batch costs one searchsorted over the knots and no rejections, whatever the shape of the profile.
+        Each origin/destination pair comes from the OD table of the period of its arrival,
+        origin_destination() returns the pair of the last interarrival_time() drawn.
+
+        Args:
+            profile: Demand profile, times are seconds from the start of the run
+            floors: Valid floor numbers
+            base_floor: Floor with a higher chance of being requested, in periods without an OD spec
+            seed: Random seed
+            base_floor_weight: How many times the base floor is more likely to be requested, in periods without an OD spec
+            batch_size: Number of requests drawn per refill
+        """
+        self.profile = profile
+        self.floors = np.asarray(floors)
+        self.batch_size = batch_size
+
+        arrival_seed, floor_seed = np.random.SeedSequence(seed).spawn(2)
+        self.arrival_rng = np.random.Generator(np.random.PCG64(arrival_seed))
+        self.floor_rng = np.random.Generator(np.random.PCG64(floor_seed))
+        self.od_starts, self.od_prob, self.od_alias = profile.od_tables(floors, base_floor, base_floor_weight)
+
+        self.last_time = 0.0 # arrival time of the last request drawn
+        self.last_target = 0.0 # cumulative intensity at that time
+        self.interarrivals = []
+        self.pairs = []
+        self.pos = 0
+
+    def draw(self, n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Next n arrival times, origins and destinations.
+        """
+        targets = self.last_target + np.cumsum(self.arrival_rng.standard_exponential(n))
+        times = self.profile.invert(targets)
+        self.last_target = float(targets[-1])
+
+        in_period = times if self.profile.period is None else np.mod(times, self.profile.period)
+        rows = np.searchsorted(self.od_starts, in_period, side="right") - 1
+        pairs = alias_lookup(self.floor_rng.random(n), self.od_prob, self.od_alias, rows)
+        n_floors = len(self.floors)
+        return times, self.floors[pairs // n_floors], self.floors[pairs % n_floors]
+
+    def interarrival_time(self) -> float:
+        """
+        Time to the next request, from the current batch.
+        """
+        if self.pos == len(self.interarrivals):
+            times, origins, destinations = self.draw(self.batch_size)
+            # Past the end of an open-ended profile whose last rate is 0 arrivals are at inf, so are their gaps
+            previous = np.concatenate(([self.last_time], times[:-1]))
+            finite = np.isfinite(times)
+            interarrivals = np.full(len(times), np.inf)
+            interarrivals[finite] = times[finite] - previous[finite]
+            self.interarrivals = interarrivals.tolist()
+            self.pairs = list(zip(origins.tolist(), destinations.tolist()))
+            self.last_time = float(times[-1])
+            self.pos = 0
+        self.pos += 1
+        return self.interarrivals[self.pos - 1]
+
+    def origin_destination(self) -> Tuple[int, int]:
+        """
+        Origin/destination pair of the request of the last interarrival time.
+        """
+        return self.pairs[self.pos - 1]
@@ -0,0 +1,202 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import product
+from typing import Dict, List
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+
+from simulation import Simulation
+from sinks import make_sink, spool_path
+from instrumentation import configure_logging
+from profiles import DemandProfile
+
+from params import (
+    SIMULATION_DURATION,
+    FLOORS, DEFAULT_SPEED,
+    DEFAULT_LAMBDA,
+    DEFAULT_BASE_FLOOR,
+    BASE_FLOOR_WEIGHT,
+    DEFAULT_IDLE_MODE,
+    DEFAULT_SAMPLING,
+    DEFAULT_ENGINE,
+    DEFAULT_ELEVATORS,
+    DEFAULT_POLICY,
+    DEFAULT_LOG_LEVEL,
+)
+
+# Parameters of a single run, any of them can be swept
+DEFAULT_RUN = {
+    "floors": len(FLOORS), # building has floors 1..n
+    "speed": DEFAULT_SPEED,
+    "lambda_": DEFAULT_LAMBDA,
+    "base_floor": DEFAULT_BASE_FLOOR,
+    "base_floor_weight": BASE_FLOOR_WEIGHT,
+    "duration": SIMULATION_DURATION,
+    "idle_mode": DEFAULT_IDLE_MODE,
+    "sampling": DEFAULT_SAMPLING,
+    "engine": DEFAULT_ENGINE,
+    "elevators": DEFAULT_ELEVATORS,
+    "policy": DEFAULT_POLICY,
+    "profile": None, # path to a demand profile config (see profiles.py), replaces lambda_
+    "trace": None, # path to a trace file replayed by every run (see traces.py), replaces lambda_
+}
+
+
+def expand_grid(grid: Dict[str, list]) -> List[dict]:
+    """
+    Cartesian product of a parameter grid, e.g. {"floors": [5, 10], "lambda_": [0.1, 0.5]} gives 4 runs.
+    """
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in product(*(grid[key] for key in keys))]
+
+
+def spawn_seeds(base_seed: int, n: int) -> List[int]:
+    """
+    Derives n independent seeds from a base seed, fit for the INTEGER random_seed column.
+    """
+    return [int(child.generate_state(1)[0]) & 0x7FFFFFFF for child in np.random.SeedSequence(base_seed).spawn(n)]
+
+
+def build_runs(config: dict) -> List[dict]:
+    """
+    Builds the full list of runs of a sweep config.
+
+    Config keys (all optional):
+        grid: dict of parameter lists, expanded as a cartesian product
+        runs: explicit list of parameter dicts, added after the grid
+        seeds_per_run: how many seeds each run without an explicit "seed" is repeated with
+        base_seed: seed from which those per-run seeds are spawned
+    """
+    runs = expand_grid(config["grid"]) if config.get("grid") else []
+    runs += config.get("runs", [])
+    if not runs:
+        runs = [{}]
+
+    seeds_per_run = config.get("seeds_per_run", 1)
+    unseeded = sum(seeds_per_run for run in runs if "seed" not in run)
+    seeds = iter(spawn_seeds(config.get("base_seed", 0), unseeded))
+
+    full_runs = []
+    for run in runs:
+        run = {**DEFAULT_RUN, **run}
+        if "seed" in run:
+            full_runs.append(run)
+        else:
+            full_runs.extend({**run, "seed": next(seeds)} for _ in range(seeds_per_run))
+    return full_runs
+
+
+def run_chunk(
+    chunk_index: int,
+    runs: List[dict],
+    sink_kind: str,
+    output: str,
+    start_datetime: datetime,
+    log_level: str = DEFAULT_LOG_LEVEL,
+) -> List[int]:
+    """
+    Runs a chunk of simulations in the current process, sharing one sink.
+    Sinks write (and the HTTP sink spools) to their own part directory, so workers never share a file.
+    Returns the simulation IDs.
+    """
+    configure_logging(log_level) # once per worker process
+    directory = os.path.join(output, f"part-{chunk_index:05d}") if output else None
+    sink_kwargs = {}
+    if sink_kind == "http" and directory is None:
+        # Replaying a spool rewrites it, without a part directory each worker process spools to a file of its own
+        root, ext = os.path.splitext(spool_path())
+        sink_kwargs["spool_path"] = f"{root}-{os.getpid()}{ext}"
+    simulation_ids = []
+
+    with make_sink(sink_kind, directory, **sink_kwargs) as sink:
+        for run in runs:
+            sim = Simulation(
+                sim_time=run["duration"],
+                floors=tuple(range(1, run["floors"] + 1)),
+                speed_floors_per_sec=run["speed"],
+                lambda_=run["lambda_"],
+                base_floor=run["base_floor"],
+                start_datetime=start_datetime,
+                seed=run["seed"],
+                sink=sink,
+                base_floor_weight=run["base_floor_weight"],
+                idle_mode=run["idle_mode"],
+                sampling=run["sampling"],
+                engine=run["engine"],
+                elevators=run["elevators"],
+                policy=run["policy"],
+                log_level=log_level,
+                demand_profile=DemandProfile.load(run["profile"]) if run["profile"] else None,
+                demand_trace=run["trace"],
+            )
+            sim.simulation_id = run.get("id") # file sinks keep it, the API assigns its own
+            sim.post_metadata()
+            sim.run()
+            simulation_ids.append(sim.simulation_id)
+
+    return simulation_ids
+
+
+def run_sweep(
+    runs: List[dict],
+    workers: int = None,
+    sink_kind: str = "http",
+    output: str = None,
+    start_datetime: datetime = None,
+    chunk_size: int = None,
+    log_level: str = DEFAULT_LOG_LEVEL,
+) -> List[int]:
+    """
+    Runs every simulation of a sweep on a process pool.
+
+    Args:
+        runs: Run parameters, as returned by build_runs
+        workers: Number of processes, all cores by default, 1 runs in this process
+        sink_kind: http, jsonl, parquet or arrow
+        output: Output directory for file sinks
+        start_datetime: Real datetime of simulated time zero, shared by all runs
+        chunk_size: Runs per task, each task opens one sink
+        log_level: Level of the structured event log of every run, quiet if None
+
+    Returns the simulation IDs, in the order of runs.
+    """
+    workers = workers or os.cpu_count()
+    start_datetime = start_datetime or datetime.now()
+    chunk_size = chunk_size or max(1, math.ceil(len(runs) / (workers * 4)))
+
+    # Unique IDs across parts when sinks assign them locally
+    runs = [{"id": i + 1, **run} for i, run in enumerate(runs)]
+    chunks = [runs[i:i + chunk_size] for i in range(0, len(runs), chunk_size)]
+
+    if workers == 1:
+        results = [run_chunk(i, chunk, sink_kind, output, start_datetime, log_level) for i, chunk in enumerate(chunks)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_chunk, i, chunk, sink_kind, output, start_datetime, log_level) for i, chunk in enumerate(chunks)]
+            results = [future.result() for future in futures]
+
+    return [simulation_id for chunk_ids in results for simulation_id in chunk_ids]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs a parameter sweep of elevator simulations")
+    parser.add_argument("--config", help="JSON sweep config (grid, runs, seeds_per_run, base_seed)")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, all cores by default")
+    parser.add_argument("--sink", default=os.getenv("SIMULATION_SINK", "http"), choices=["http", "null", "jsonl", "parquet", "arrow"])
+    parser.add_argument("--output", default=os.getenv("SIMULATION_OUTPUT"), help="output directory for file sinks")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING"], default=DEFAULT_LOG_LEVEL, help="structured event log, quiet by default")
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+
+    runs = build_runs(config)
+    print(f"[SYS] Sweep started with {len(runs)} simulations")
+    simulation_ids = run_sweep(runs, workers=args.workers, sink_kind=args.sink, output=args.output, log_level=args.log_level)
+    print(f"[SYS] Sweep ended, simulation IDs: {simulation_ids}")
@@ -0,0 +1,144 @@
+from typing import Sequence, Tuple
+import numpy as np
+
+from params import SAMPLER_BATCH_SIZE
+
+
+class AliasTable:
+    def __init__(self, values: Sequence[int], weights: Sequence[float]):
+        """
+        Walker/Vose alias table, samples a weighted discrete distribution in O(1).
+
+        Args:
+            values: Outcomes
+            weights: Relative (unnormalized) weight of each outcome
+        """
+        n = len(values)
+        probs = np.asarray(weights, dtype=float) * n / np.sum(weights)
+
+        self.values = np.asarray(values)
+        self.prob = np.ones(n)
+        self.alias = np.arange(n)
+
+        small = [i for i in range(n) if probs[i] < 1.0]
+        large = [i for i in range(n) if probs[i] >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = probs[s]
+            self.alias[s] = l
+            probs[l] -= 1.0 - probs[s]
+            (small if probs[l] < 1.0 else large).append(l)
+        # Leftovers are 1 up to rounding error, they keep prob 1
+
+    def sample_index(self, u: np.ndarray) -> np.ndarray:
+        """
+        Maps uniforms in [0, 1) to outcome indices, one uniform per sample:
+        its integer part (scaled by n) picks the column and the fractional part the coin flip.
+        """
+        return alias_lookup(u, self.prob, self.alias)
+
+    def sample(self, u: np.ndarray) -> np.ndarray:
+        """
+        Maps uniforms in [0, 1) to outcomes.
+        """
+        return self.values[self.sample_index(u)]
+
+
+def alias_lookup(u: np.ndarray, prob: np.ndarray, alias: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+    """
+    Vectorized alias sampling, rows selects a table per sample when prob and alias are stacked 2D tables.
+    """
+    width = prob.shape[-1]
+    scaled = u * width
+    column = np.minimum(scaled.astype(np.int64), width - 1)
+    index = column if rows is None else (rows, column)
+    return np.where(scaled - column < prob[index], column, alias[index])
+
+
+class DemandSampler:
+    def __init__(
+        self,
+        floors: tuple[int],
+        lambda_: float,
+        base_floor: int,
+        base_floor_weight: float,
+        seed: int,
+        batch_size: int = SAMPLER_BATCH_SIZE,
+    ):
+        """
+        Draws interarrival times and origin/destination pairs in NumPy batches, refilled lazily.
+        Same distribution as DemandGenerator's pure Python sampling.
+
+        Interarrival times and floors come from two independent streams spawned from the seed,
+        and every pair consumes exactly two uniforms, so the sequence of requests only depends on
+        the seed, never on batch_size or on how draws are interleaved.
+
+        Args:
+            floors: Valid floor numbers
+            lambda_: Mean arrival rate (requests per second)
+            base_floor: Floor with a higher chance of being requested
+            base_floor_weight: How many times the base floor is more likely to be requested
+            seed: Random seed
+            batch_size: Number of samples drawn per refill
+        """
+        self.lambda_ = lambda_
+        self.batch_size = batch_size
+
+        arrival_seed, floor_seed = np.random.SeedSequence(seed).spawn(2)
+        self.arrival_rng = np.random.Generator(np.random.PCG64(arrival_seed))
+        self.floor_rng = np.random.Generator(np.random.PCG64(floor_seed))
+
+        weights = [base_floor_weight if floor == base_floor else 1 for floor in floors]
+        self.origin_table = AliasTable(floors, weights)
+
+        # One destination table per excluded origin, stacked to sample all origins at once
+        tables = [
+            AliasTable([f for f in floors if f != floor], [w for f, w in zip(floors, weights) if f != floor])
+            for floor in floors
+        ]
+        self.destination_values = np.stack([table.values for table in tables])
+        self.destination_prob = np.stack([table.prob for table in tables])
+        self.destination_alias = np.stack([table.alias for table in tables])
+
+        self.interarrivals = []
+        self.interarrival_pos = 0
+        self.pairs = []
+        self.pair_pos = 0
+
+    def interarrival_times(self, n: int) -> np.ndarray:
+        """
+        Draws n exponential interarrival times.
+        """
+        return self.arrival_rng.exponential(1.0 / self.lambda_, size=n)
+
+    def origin_destinations(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Draws n origin/destination pairs with origin != destination.
+        """
+        u = self.floor_rng.random((n, 2))
+        rows = self.origin_table.sample_index(u[:, 0])
+        columns = alias_lookup(u[:, 1], self.destination_prob, self.destination_alias, rows)
+        return self.origin_table.values[rows], self.destination_values[rows, columns]
+
+    def interarrival_time(self) -> float:
+        """
+        Next interarrival time, from the current batch.
+        """
+        if self.interarrival_pos == len(self.interarrivals):
+            self.interarrivals = self.interarrival_times(self.batch_size).tolist()
+            self.interarrival_pos = 0
+        value = self.interarrivals[self.interarrival_pos]
+        self.interarrival_pos += 1
+        return value
+
+    def origin_destination(self) -> Tuple[int, int]:
+        """
+        Next origin/destination pair, from the current batch.
+        """
+        if self.pair_pos == len(self.pairs):
+            origins, destinations = self.origin_destinations(self.batch_size)
+            self.pairs = list(zip(origins.tolist(), destinations.tolist()))
+            self.pair_pos = 0
+        pair = self.pairs[self.pair_pos]
+        self.pair_pos += 1
+        return pair
@@ -1,11 +1,21 @@
 from datetime import datetime, timedelta
+import argparse
 import simpy
 import random
-import os
-import requests
+import time
 
 from elevator import Elevator
 from demand_generator import DemandGenerator
+from dispatcher import Dispatcher
+from features import FeatureEngine
+from kpis import TripStats
+from fast_engine import FastEngine
+from instrumentation import EventLogger, SimulationMetrics, Profiler, configure_logging
+import checkpoint
+from sampling import DemandSampler
+from profiles import DemandProfile, ProfileSampler
+from traces import TraceSampler, TraceWriter
+from sinks import Sink, make_sink
 
 from params import (
     SIMULATION_DURATION,
@@ -14,6 +24,13 @@ from params import (
     DEFAULT_BASE_FLOOR,
     DEFAULT_WAIT_TIME, 
     BASE_FLOOR_WEIGHT,
+    DEFAULT_IDLE_MODE,
+    DEFAULT_SAMPLING,
+    DEFAULT_ENGINE,
+    DEFAULT_ELEVATORS,
+    DEFAULT_POLICY,
+    DEFAULT_LOG_LEVEL,
+    DEFAULT_CHECKPOINT_INTERVAL,
 )
 
 class Simulation:
@@ -25,7 +42,18 @@ class Simulation:
         lambda_: float,
         base_floor: int,
         start_datetime: datetime,
-        seed: int
+        seed: int,
+        sink: Sink = None,
+        base_floor_weight: float = BASE_FLOOR_WEIGHT,
+        idle_mode: str = DEFAULT_IDLE_MODE,
+        sampling: str = DEFAULT_SAMPLING,
+        engine: str = DEFAULT_ENGINE,
+        elevators: int = DEFAULT_ELEVATORS,
+        policy: str = DEFAULT_POLICY,
+        log_level: str = DEFAULT_LOG_LEVEL,
+        demand_profile: DemandProfile = None,
+        demand_trace: str = None,
+        initial_time: float = 0.0,
     ):
         """
         Main simulation controller.
@@ -36,68 +64,276 @@ class Simulation:
             speed_floors_per_sec: Elevator travel speed
             lambda_: Average time between user requests (Poisson process)
             base_floor: Starting floor
+            start_datetime: Real datetime of simulated time zero
+            seed: Random seed, for reproducibility
+            sink: Where metadata and snapshots are written, the backend API by default
+            base_floor_weight: How many times the base floor is more likely to be requested
+            idle_mode: How the idle elevator waits for tasks, "poll" or "event" (see Elevator)
+            sampling: "python" draws each request from random.Random,
+                "numpy" draws them in batches (see DemandSampler), both reproducible by seed
+            engine: "simpy" runs the discrete event simulation, "numpy" the array based FastEngine,
+                which needs sampling="numpy" and idle_mode="event" and gives the same snapshots
+            elevators: Number of cars in the bank, requests are assigned by a Dispatcher
+            policy: Order each car serves its requests in, "fifo" or a registered Policy (see policies.py)
+            log_level: Level of the structured event log (see EventLogger), None keeps the run quiet
+            demand_profile: Time-varying arrival rate and origin/destination distribution (see profiles.py),
+                replaces lambda_ and the base floor spike, always sampled in NumPy batches
+            demand_trace: Trace file whose requests are replayed instead of sampled (see traces.py),
+                streamed from disk. Replays are the same for every seed, engine and policy
+            initial_time: Simulated time the environment starts at, set when resuming from a checkpoint
         """
+        if sampling not in ("python", "numpy"):
+            raise ValueError(f"Invalid sampling: {sampling}")
+        if engine not in ("simpy", "numpy"):
+            raise ValueError(f"Invalid engine: {engine}")
+        if engine == "numpy" and (sampling != "numpy" and demand_trace is None or idle_mode != "event"):
+            raise ValueError("The numpy engine needs sampling=\"numpy\" (or a trace) and idle_mode=\"event\"")
+        if engine == "numpy" and (elevators, policy) != (1, "fifo"):
+            raise ValueError("The numpy engine only simulates a single FIFO elevator")
+        if engine == "numpy" and demand_profile is not None:
+            raise ValueError("The numpy engine only simulates constant rate demand")
+        if demand_profile is not None and demand_trace is not None:
+            raise ValueError("Demand comes from a profile or from a trace, not both")
+        if elevators < 1:
+            raise ValueError(f"Invalid number of elevators: {elevators}")
+        self.engine = engine
+
+        # Everything needed to build the same simulation again, kept in checkpoints
+        self.params = dict(
+            sim_time=sim_time,
+            floors=floors,
+            speed_floors_per_sec=speed_floors_per_sec,
+            lambda_=lambda_,
+            base_floor=base_floor,
+            start_datetime=start_datetime,
+            seed=seed,
+            base_floor_weight=base_floor_weight,
+            idle_mode=idle_mode,
+            sampling=sampling,
+            engine=engine,
+            elevators=elevators,
+            policy=policy,
+            demand_profile=demand_profile,
+            demand_trace=demand_trace,
+        )
+
         self.sim_time = sim_time
-        self.env = simpy.Environment()
+        self.env = simpy.Environment(initial_time)
         self.start_datetime = start_datetime
         self.simulation_id = None # is set by backend
+        self.sink = sink or make_sink("http")
+        self.policy = policy
+        self.trips = TripStats() # filled by the simpy engine
+        self.events = EventLogger(log_level, self.env)
+        self.metrics = SimulationMetrics()
+        self.checkpoint_path = None
+        self.checkpoint_interval = None
+        self.next_checkpoint = None # simulated time of the next checkpoint
 
-        # Set seed
+        # Set seed, each simulation owns its random stream so runs can share a process
         self.seed = seed
-        random.seed(seed)
+        self.rng = random.Random(seed)
 
-        # Initialize elevator and demand generator
-        self.elevator = Elevator(
-            env=self.env,
-            floors=floors,
-            speed_floors_per_sec=speed_floors_per_sec,
-            base_floor=base_floor,
-            simulation=self
-        )
+        # Initialize the elevator bank, its dispatcher and the demand generator
+        features = FeatureEngine(floors) # demand is shared by the bank
+        self.elevators = [
+            Elevator(
+                env=self.env,
+                floors=floors,
+                speed_floors_per_sec=speed_floors_per_sec,
+                base_floor=base_floor,
+                simulation=self,
+                idle_mode=idle_mode,
+                elevator_id=elevator_id,
+                features=features,
+                policy=policy,
+            )
+            for elevator_id in range(elevators)
+        ]
+        self.elevator = self.elevators[0]
+        self.dispatcher = Dispatcher(self.elevators)
+
+        self.demand_profile = demand_profile
+        if demand_trace is not None:
+            sampler = TraceSampler(demand_trace, floors)
+        elif demand_profile is not None:
+            sampler = ProfileSampler(
+                profile=demand_profile,
+                floors=floors,
+                base_floor=self.elevator.base_floor,
+                seed=seed,
+                base_floor_weight=base_floor_weight,
+            )
+        elif sampling == "numpy":
+            sampler = DemandSampler(
+                floors=floors,
+                lambda_=lambda_,
+                base_floor=self.elevator.base_floor,
+                base_floor_weight=base_floor_weight,
+                seed=seed,
+            )
+        else:
+            sampler = None
 
         self.demand_generator = DemandGenerator(
             env=self.env,
             floors=floors,
             elevator=self.elevator,
-            lambda_=lambda_
+            lambda_=lambda_,
+            rng=self.rng,
+            base_floor_weight=base_floor_weight,
+            sampler=sampler,
+            dispatcher=self.dispatcher,
         )
 
-    def run(self):
+    def run(
+        self,
+        profile: str = None,
+        checkpoint_path: str = None,
+        checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+        trace_path: str = None,
+    ):
         """
-        Runs the simulation.
+        Runs the simulation, snapshots are written to the sink as they get labeled.
+        The sink is flushed before returning, but not closed.
+
+        Args:
+            profile: Path where cProfile stats of the engine run are written, no profiling if not given
+            checkpoint_path: Where to save checkpoints of the run, see resume(), none if not given
+            checkpoint_interval: Simulated seconds between checkpoints. A checkpoint is taken at the first
+                request arrival past the interval that finds every car idle, so busy periods delay it
+            trace_path: Where to record the requests of the run as a trace file (see traces.py), none if not given.
+                Replaying it gives the same demand to other engines and policies
         """
-        self.env.run(until=self.sim_time)
+        if trace_path is not None and (checkpoint_path is not None or self.env.now > 0):
+            raise ValueError("Traces are recorded from uninterrupted runs, without checkpoints")
+        if checkpoint_path is not None:
+            if self.engine != "simpy" or self.elevator.idle_mode != "event":
+                raise ValueError("Checkpoints need the simpy engine with idle_mode=\"event\"")
+            if not self.sink.supports_checkpoints():
+                # Refused before running, e.g. posted snapshots can not be rolled back on resume
+                raise ValueError(f"{type(self.sink).__name__} does not support checkpoints")
+            self.checkpoint_path = checkpoint_path
+            self.checkpoint_interval = checkpoint_interval
+            if self.next_checkpoint is None:
+                self.next_checkpoint = self.env.now + checkpoint_interval
+            self.demand_generator.on_arrival = self.maybe_checkpoint
 
-    def post_metadata(self):
+        if trace_path is not None:
+            self.demand_generator.recorder = TraceWriter(trace_path)
+
+        start = time.perf_counter()
+        try:
+            if profile is not None:
+                with Profiler(profile):
+                    self.run_engine()
+            else:
+                self.run_engine()
+        finally:
+            if self.demand_generator.recorder is not None:
+                self.demand_generator.recorder.close()
+                self.demand_generator.recorder = None
+            self.sink.flush()
+            self.metrics.sim_time = self.env.now if self.engine == "simpy" else self.sim_time
+            self.metrics.wall_time = time.perf_counter() - start
+            self.events.info("simulation_finished", **self.metrics.as_dict(), sink=self.sink.stats())
+
+    def run_engine(self):
+        if self.engine == "numpy":
+            FastEngine(self).run(until=self.sim_time)
+            return
+
+        # Environment.run calls self.step() for every event, count them on the way
+        env = self.env
+        step = env.step
+        events = 0
+
+        def counting_step():
+            nonlocal events
+            events += 1
+            step()
+
+        env.step = counting_step
+        try:
+            env.run(until=self.sim_time)
+        finally:
+            env.step = step
+            self.metrics.events_processed += events
+
+    def maybe_checkpoint(self, now: float):
+        """
+        Saves a checkpoint at a request arrival once the interval elapsed, if every car is idle.
+        """
+        if now < self.next_checkpoint or not checkpoint.can_checkpoint(self):
+            return
+        self.next_checkpoint = now + self.checkpoint_interval
+        checkpoint.save_checkpoint(self, self.checkpoint_path)
+        self.events.info("checkpoint_saved", path=self.checkpoint_path)
+
+    @classmethod
+    def resume(cls, path: str, sink: Sink, log_level: str = DEFAULT_LOG_LEVEL) -> "Simulation":
+        """
+        Rebuilds a simulation from a checkpoint, ready to run() up to its sim_time.
+        The output is identical to the one of an uninterrupted run: the sink is rolled back
+        to what was written at the checkpoint (see Sink.restore), so it should be the same
+        destination (e.g. a JsonlSink on the same directory). Metadata is not written again.
+        """
+        state = checkpoint.load_checkpoint(path)
+        simulation = cls(**state["params"], sink=sink, log_level=log_level, initial_time=state["now"])
+        checkpoint.restore(simulation, state)
+        return simulation
+
+    def kpis(self) -> dict:
         """
-        Sends simulation metadata to the FastAPI backend.
-        Returns the simulation ID assigned by the API.
+        Service KPIs of the finished run (see TripStats.summary), simpy engine only.
         """
-        api_url = os.getenv("API_BASE_URL", "http://localhost:8000")
-        endpoint = f"{api_url}/simulation"
+        return self.trips.summary(self.elevators, self.sim_time)
 
+    def expo_lambda(self) -> float:
+        """
+        Mean arrival rate of the demand, for the metadata.
+        """
+        sampler = self.demand_generator.sampler
+        if isinstance(sampler, TraceSampler):
+            return sampler.mean_rate()
+        if self.demand_profile is not None:
+            return self.demand_profile.mean_rate()
+        return self.demand_generator.lambda_
+
+    def post_metadata(self):
+        """
+        Writes simulation metadata to the sink (the FastAPI backend by default).
+        Sets the simulation ID assigned by the sink.
+        """
         payload = {
+            "id": self.simulation_id,
             "wait_time": DEFAULT_WAIT_TIME,
             "elevator_speed": self.elevator.speed,
-            "expo_lambda": self.demand_generator.lambda_,
+            "expo_lambda": self.expo_lambda(),
             "start_datetime": self.start_datetime.isoformat(),
             "duration": int(self.sim_time),
             "base_floor": self.elevator.base_floor,
-            "base_floor_weight": BASE_FLOOR_WEIGHT,
+            "base_floor_weight": self.demand_generator.base_floor_weight,
             "floor_min": min(self.elevator.floors),
             "floor_max": max(self.elevator.floors),
             "random_seed": self.seed,
+            "elevators": len(self.elevators),
+            "dispatch_policy": self.policy,
         }
 
-        response = requests.post(endpoint, json=payload)
-        if response.status_code != 200:
-            raise Exception(f"Failed to post simulation metadata: {response.status_code} {response.text}")
-
-        sim_data = response.json()
-        print(f"Simulation metadata saved with ID: {sim_data['id']}")
-        self.simulation_id = sim_data["id"]
+        self.simulation_id = self.sink.write_metadata(payload)
+        self.events.fields["simulation_id"] = self.simulation_id
+        self.events.info("metadata_saved", **payload)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs a single elevator simulation")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING"], default=DEFAULT_LOG_LEVEL, help="structured event log, quiet by default")
+    parser.add_argument("--profile", help="write cProfile stats of the run to this path")
+    parser.add_argument("--trace", help="replay the requests of this trace file instead of sampling them")
+    parser.add_argument("--record-trace", help="record the requests of the run to this trace file")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
     sim = Simulation(
         sim_time=SIMULATION_DURATION,
         floors=FLOORS,
@@ -105,9 +341,13 @@ if __name__ == "__main__":
         lambda_=DEFAULT_LAMBDA,
         base_floor=DEFAULT_BASE_FLOOR,
         start_datetime=datetime.now(),
-        seed=31
+        seed=31,
+        log_level=args.log_level,
+        demand_trace=args.trace,
     )
     print("[SYS] Simulation started at:", sim.start_datetime)
     sim.post_metadata() # save metadata before starting
-    sim.run()
-    print("[SYS] Simulation ended at:", sim.start_datetime + timedelta(seconds=sim.sim_time))
\ No newline at end of file
+    sim.run(profile=args.profile, trace_path=args.record_trace)
+    sim.sink.close()
+    print("[SYS] Simulation ended at:", sim.start_datetime + timedelta(seconds=sim.sim_time))
+    print("[SYS] Metrics:", sim.metrics.as_dict())
\ No newline at end of file
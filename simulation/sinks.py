@@ -0,0 +1,432 @@
+from datetime import datetime
+from typing import Optional
+import json
+import os
+
+from api_client import ApiClient, BackgroundUploader
+from snapshots import Snapshot, SnapshotArray, SnapshotBatch, as_row, HISTOGRAM
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # columnar sinks are optional
+    pa = None
+    pq = None
+
+from params import ROW_GROUP_SIZE, SPOOL_PATH
+
+
+class Sink:
+    """
+    Destination of the data produced by a simulation: its metadata and the labeled snapshots.
+    Sinks can be shared by many simulations (e.g. a parameter sweep), so run() only flushes them,
+    whoever creates a sink is responsible for closing it.
+    """
+
+    def write_metadata(self, metadata: dict) -> int:
+        """
+        Stores simulation metadata, returns the simulation ID.
+        If metadata has an "id" it is kept when the sink allows it.
+        """
+        raise NotImplementedError
+
+    def write_snapshot(self, snapshot: Snapshot):
+        """
+        Stores a single labeled snapshot, a Snapshot record or a row dict in the backend format.
+        Records are kept as they are as long as possible, sinks build rows (and timestamps) when writing.
+        """
+        raise NotImplementedError
+
+    def write_batch(self, batch: SnapshotBatch):
+        """
+        Stores the snapshots of a batch, as built by the numpy engine.
+        One by one, unless the sink stores columns.
+        """
+        for snapshot in batch:
+            self.write_snapshot(snapshot)
+
+    def flush(self):
+        """
+        Makes everything written so far durable.
+        """
+
+    def stats(self) -> dict:
+        """
+        Counters of the sink since it was created, logged when a simulation finishes.
+        """
+        return {}
+
+    def supports_checkpoints(self) -> bool:
+        """
+        Whether the sink can take checkpoints, that is roll its output back with restore().
+        """
+        return type(self).checkpoint is not Sink.checkpoint
+
+    def checkpoint(self):
+        """
+        Flushes and returns the position of the output, for Sink.restore() when resuming a simulation.
+        """
+        raise ValueError(f"{type(self).__name__} does not support checkpoints")
+
+    def restore(self, offset):
+        """
+        Rolls the output back to a position returned by checkpoint(), dropping what was written after it.
+        """
+        raise ValueError(f"{type(self).__name__} does not support checkpoints")
+
+    def close(self):
+        """
+        Flushes and releases any resource held by the sink.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HttpSink(Sink):
+    def __init__(self, client: ApiClient, uploader: BackgroundUploader = None):
+        """
+        Sends data to the FastAPI backend, snapshots are uploaded in bulk from a background thread.
+
+        Args:
+            client: API client used for metadata and by the default uploader
+            uploader: Snapshot uploader, one over client is created if not given
+        """
+        self.client = client
+        self.uploader = uploader or BackgroundUploader(client)
+
+    def write_metadata(self, metadata: dict) -> int:
+        # IDs are always assigned by the backend
+        payload = {key: value for key, value in metadata.items() if key != "id"}
+        return self.client.post("/simulation", payload)["id"]
+
+    def write_snapshot(self, snapshot: Snapshot):
+        # Queued as a record, the uploader builds the rows of each batch
+        self.uploader.start()
+        self.uploader.add(snapshot)
+
+    def flush(self):
+        # Waits until everything queued is posted or spooled
+        self.uploader.close()
+
+    def stats(self) -> dict:
+        return self.uploader.stats()
+
+
+class LocalSink(Sink):
+    def __init__(self, first_id: int = 1):
+        """
+        Base for sinks that write files, simulation IDs are assigned locally.
+
+        Args:
+            first_id: ID given to the first simulation without an explicit one
+        """
+        self.next_id = first_id
+
+    def assign_id(self, metadata: dict) -> dict:
+        """
+        Returns metadata with its "id" set, taking the next local ID if needed.
+        """
+        if metadata.get("id") is None:
+            metadata = {**metadata, "id": self.next_id}
+        self.next_id = max(self.next_id, metadata["id"]) + 1
+        return metadata
+
+
+class JsonlSink(LocalSink):
+    def __init__(self, directory: str, first_id: int = 1):
+        """
+        Appends rows as JSON lines to simulations.jsonl and elevator_requests.jsonl.
+
+        Args:
+            directory: Output directory, created if missing
+            first_id: ID given to the first simulation without an explicit one
+        """
+        super().__init__(first_id)
+        os.makedirs(directory, exist_ok=True)
+        self.simulations_file = open(os.path.join(directory, "simulations.jsonl"), "a")
+        self.requests_file = open(os.path.join(directory, "elevator_requests.jsonl"), "a")
+
+    def write_metadata(self, metadata: dict) -> int:
+        metadata = self.assign_id(metadata)
+        self.simulations_file.write(json.dumps(metadata) + "\n")
+        return metadata["id"]
+
+    def write_snapshot(self, snapshot: Snapshot):
+        self.requests_file.write(json.dumps(as_row(snapshot)) + "\n")
+
+    def flush(self):
+        self.simulations_file.flush()
+        self.requests_file.flush()
+
+    def checkpoint(self):
+        # Byte offsets of both files, lines are only appended
+        self.flush()
+        return {"simulations": self.simulations_file.tell(), "requests": self.requests_file.tell(), "next_id": self.next_id}
+
+    def restore(self, offset):
+        self.flush()
+        self.simulations_file.truncate(offset["simulations"])
+        self.requests_file.truncate(offset["requests"])
+        self.next_id = offset["next_id"]
+
+    def close(self):
+        self.simulations_file.close()
+        self.requests_file.close()
+
+
+# Columnar schemas, mirror SimulationMetadata and ElevatorRequest in app/models.py.
+# Request IDs are assigned by the database, so they are not part of the files.
+if pa is not None:
+    SIMULATION_SCHEMA = pa.schema([
+        ("id", pa.int32()),
+        ("wait_time", pa.float64()),
+        ("elevator_speed", pa.float64()),
+        ("expo_lambda", pa.float64()),
+        ("start_datetime", pa.timestamp("us")),
+        ("duration", pa.int32()),
+        ("base_floor", pa.int32()),
+        ("base_floor_weight", pa.float64()),
+        ("floor_min", pa.int32()),
+        ("floor_max", pa.int32()),
+        ("random_seed", pa.int32()),
+        ("elevators", pa.int32()),
+        ("dispatch_policy", pa.string()),
+    ])
+
+    REQUEST_SCHEMA = pa.schema([
+        ("simulation_id", pa.int32()),
+        ("elevator_id", pa.int32()),
+        ("current_floor", pa.int32()),
+        ("last_floor", pa.int32()),
+        ("time_idle", pa.float64()),
+        ("timestamp", pa.timestamp("us")),
+        ("floor_demand_histogram", pa.list_(pa.int32())),
+        ("hot_floor_last_30s", pa.int32()),
+        ("requests_entropy", pa.float64()),
+        ("mean_requested_floor", pa.float64()),
+        ("distance_to_center_of_mass", pa.float64()),
+        ("requests_entropy_last_30s", pa.float64()),
+        ("request_rate_last_30s", pa.float64()),
+        ("next_floor_requested", pa.int32()),
+    ])
+
+    # Buffer dtype of each scalar column of REQUEST_SCHEMA
+    NUMPY_TYPES = {pa.int32(): "i4", pa.float64(): "f8", pa.timestamp("us"): "i8"}
+
+
+class ColumnarSink(LocalSink):
+    extension = None
+
+    def __init__(self, directory: str, row_group_size: int = ROW_GROUP_SIZE, first_id: int = 1):
+        """
+        Base for columnar sinks: rows are buffered and written in row groups.
+        Snapshots are copied into a preallocated SnapshotArray, a fixed size row each,
+        instead of being kept as Python objects until their row group is written.
+
+        Args:
+            directory: Output directory, created if missing
+            row_group_size: Number of snapshots per row group
+            first_id: ID given to the first simulation without an explicit one
+        """
+        if pa is None:
+            raise ImportError("pyarrow is required for columnar sinks, install it with: pip install pyarrow")
+
+        super().__init__(first_id)
+        os.makedirs(directory, exist_ok=True)
+        self.row_group_size = row_group_size
+
+        self.simulations = self.open_table(os.path.join(directory, f"simulations.{self.extension}"), SIMULATION_SCHEMA)
+        self.requests = self.open_table(os.path.join(directory, f"elevator_requests.{self.extension}"), REQUEST_SCHEMA)
+        self.snapshots = SnapshotArray(
+            [(field.name, NUMPY_TYPES[field.type]) for field in REQUEST_SCHEMA if field.name != HISTOGRAM],
+            width=0,
+            capacity=row_group_size,
+        )
+
+    def open_table(self, path: str, schema) -> dict:
+        """
+        Creates the writer and column buffers of one output table.
+        """
+        return {
+            "writer": self.open_writer(path, schema),
+            "schema": schema,
+            "columns": {name: [] for name in schema.names},
+            "rows": 0,
+        }
+
+    def open_writer(self, path: str, schema):
+        raise NotImplementedError
+
+    def append(self, table: dict, row: dict):
+        """
+        Buffers a row, writing a row group when the buffer is full.
+        """
+        for name, column in table["columns"].items():
+            column.append(row.get(name))
+        table["rows"] += 1
+        if table["rows"] >= self.row_group_size:
+            self.write_row_group(table)
+
+    def write_row_group(self, table: dict):
+        """
+        Writes buffered rows as one row group (record batch) and clears the buffers.
+        """
+        if not table["rows"]:
+            return
+        batch = pa.RecordBatch.from_pydict(table["columns"], schema=table["schema"])
+        table["writer"].write_batch(batch)
+        table["columns"] = {name: [] for name in table["schema"].names}
+        table["rows"] = 0
+
+    def write_metadata(self, metadata: dict) -> int:
+        metadata = self.assign_id(metadata)
+        row = {**metadata, "start_datetime": to_datetime(metadata["start_datetime"])}
+        self.append(self.simulations, row)
+        return metadata["id"]
+
+    def write_snapshot(self, snapshot: Snapshot):
+        if isinstance(snapshot, dict):
+            snapshot = Snapshot.from_dict(snapshot)
+        if not self.snapshots.fits(snapshot):
+            # Wider building than the buffer, write what it holds and make room
+            self.write_snapshots()
+            self.snapshots.widen(len(snapshot.get(HISTOGRAM)))
+        self.snapshots.append(snapshot)
+        if len(self.snapshots) >= self.row_group_size:
+            self.write_snapshots()
+
+    def write_batch(self, batch: SnapshotBatch):
+        # Columns are copied into the buffer whole, a row group at a time
+        histograms = batch.histograms()
+        if histograms.shape[1] > self.snapshots.width:
+            self.write_snapshots()
+            self.snapshots.widen(histograms.shape[1])
+        columns = {name: batch.column(name) for name, _ in self.snapshots.columns}
+        start = 0
+        while start < len(batch):
+            stop = min(len(batch), start + self.row_group_size - len(self.snapshots))
+            self.snapshots.extend(columns, histograms, start, stop)
+            start = stop
+            if len(self.snapshots) >= self.row_group_size:
+                self.write_snapshots()
+
+    def write_snapshots(self):
+        """
+        Writes the buffered snapshots as one row group, built from the buffer columns.
+        """
+        buffer = self.snapshots
+        if not len(buffer):
+            return
+        arrays = []
+        for field in REQUEST_SCHEMA:
+            if field.name == HISTOGRAM:
+                offsets, values = buffer.histograms()
+                arrays.append(pa.ListArray.from_arrays(pa.array(offsets), pa.array(values, type=field.type.value_type)))
+            else:
+                values, nulls = buffer.column(field.name)
+                arrays.append(pa.array(values, type=field.type, mask=nulls))
+        self.requests["writer"].write_batch(pa.RecordBatch.from_arrays(arrays, schema=REQUEST_SCHEMA))
+        buffer.clear()
+
+    def flush(self):
+        # Columnar files can only be appended whole row groups,
+        # so partial buffers are written on close
+        pass
+
+    def close(self):
+        self.write_snapshots()
+        for table in (self.simulations, self.requests):
+            self.write_row_group(table)
+            table["writer"].close()
+
+
+class ParquetSink(ColumnarSink):
+    """
+    Writes simulations.parquet and elevator_requests.parquet.
+    """
+    extension = "parquet"
+
+    def open_writer(self, path: str, schema):
+        return pq.ParquetWriter(path, schema)
+
+
+class ArrowSink(ColumnarSink):
+    """
+    Writes simulations.arrow and elevator_requests.arrow in Arrow IPC file format.
+    """
+    extension = "arrow"
+
+    def open_writer(self, path: str, schema):
+        return pa.ipc.new_file(path, schema)
+
+
+def to_datetime(value) -> Optional[datetime]:
+    """
+    Parses ISO timestamps coming from snapshots and metadata.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+class NullSink(LocalSink):
+    """
+    Discards everything, for benchmarks and dry runs.
+    """
+    def __init__(self, directory: str = None, first_id: int = 1):
+        super().__init__(first_id)
+
+    def write_metadata(self, metadata: dict) -> int:
+        return self.assign_id(metadata)["id"]
+
+    def write_snapshot(self, snapshot: Snapshot):
+        pass
+
+    def write_batch(self, batch: SnapshotBatch):
+        pass
+
+    def checkpoint(self):
+        return self.next_id
+
+    def restore(self, offset):
+        self.next_id = offset
+
+
+SINKS = {
+    "null": NullSink,
+    "jsonl": JsonlSink,
+    "parquet": ParquetSink,
+    "arrow": ArrowSink,
+}
+
+
+def spool_path(directory: str = None) -> str:
+    """
+    Spool file of an HTTP sink: SNAPSHOT_SPOOL_PATH, or a file of that name in directory.
+    """
+    path = os.getenv("SNAPSHOT_SPOOL_PATH", SPOOL_PATH)
+    if directory is None:
+        return path
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, os.path.basename(path))
+
+
+def make_sink(kind: str = "http", directory: str = None, **kwargs) -> Sink:
+    """
+    Builds a sink by name: http, null, jsonl, parquet or arrow.
+    File sinks need an output directory, the HTTP sink spools to its directory when given one.
+    """
+    if kind == "http":
+        client = ApiClient(os.getenv("API_BASE_URL", "http://localhost:8000"))
+        kwargs.setdefault("spool_path", spool_path(directory))
+        return HttpSink(client, BackgroundUploader(client, **kwargs))
+    if kind not in SINKS:
+        raise ValueError(f"Invalid sink: {kind}")
+    if directory is None and kind != "null":
+        raise ValueError(f"Sink {kind} needs an output directory")
+    return SINKS[kind](directory, **kwargs)
@@ -0,0 +1,317 @@
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+HISTOGRAM = "floor_demand_histogram"
+TIMESTAMP = "timestamp"
+
+
+class Snapshot:
+    """
+    Labeled state of an idle elevator, as stored in elevator_requests.
+
+    A slotted record instead of a dict: the time is kept as simulated seconds and only turned
+    into a datetime by the sinks (timestamp()), and feature values are a tuple shared in layout
+    by every snapshot of a FeatureEngine (names). as_dict() gives the row expected by the backend.
+    """
+    __slots__ = (
+        "simulation_id",
+        "elevator_id",
+        "current_floor",
+        "last_floor",
+        "time_idle",
+        "sim_time",
+        "start_datetime",
+        "names",
+        "features",
+        "next_floor_requested",
+    )
+
+    def __init__(
+        self,
+        simulation_id: int,
+        elevator_id: int,
+        current_floor: int,
+        last_floor: int,
+        time_idle: float,
+        sim_time: float,
+        start_datetime: datetime,
+        names: Tuple[str],
+        features: tuple,
+        next_floor_requested: int = None,
+    ):
+        self.simulation_id = simulation_id
+        self.elevator_id = elevator_id
+        self.current_floor = current_floor
+        self.last_floor = last_floor
+        self.time_idle = time_idle
+        self.sim_time = sim_time
+        self.start_datetime = start_datetime
+        self.names = names
+        self.features = features
+        self.next_floor_requested = next_floor_requested
+
+    @classmethod
+    def from_dict(cls, row: dict) -> "Snapshot":
+        """
+        Record of a backend row, e.g. read back from a JSONL file.
+        """
+        names = tuple(key for key in row if key not in ROW_FIELDS and key != TIMESTAMP)
+        return cls(
+            simulation_id=row.get("simulation_id"),
+            elevator_id=row.get("elevator_id", 0),
+            current_floor=row["current_floor"],
+            last_floor=row.get("last_floor"),
+            time_idle=row["time_idle"],
+            sim_time=0.0,
+            start_datetime=datetime.fromisoformat(row[TIMESTAMP]) if isinstance(row[TIMESTAMP], str) else row[TIMESTAMP],
+            names=names,
+            features=tuple(row[name] for name in names),
+            next_floor_requested=row.get("next_floor_requested"),
+        )
+
+    def timestamp(self) -> datetime:
+        return self.start_datetime + timedelta(seconds=self.sim_time)
+
+    def timestamp_us(self) -> int:
+        """
+        Microseconds since the epoch of timestamp(), as stored in columnar files.
+        """
+        return (self.timestamp() - EPOCH) // MICROSECOND
+
+    def get(self, name: str, default=None):
+        """
+        Value of a row field by name, the timestamp as a datetime.
+        """
+        if name == TIMESTAMP:
+            return self.timestamp()
+        if name in ROW_FIELDS:
+            return getattr(self, name)
+        if name in self.names:
+            return self.features[self.names.index(name)]
+        return default
+
+    def as_dict(self) -> dict:
+        """
+        Row in the backend format, with an ISO timestamp.
+        """
+        return {
+            "simulation_id": self.simulation_id,
+            "elevator_id": self.elevator_id,
+            "current_floor": self.current_floor,
+            "last_floor": self.last_floor,
+            "time_idle": self.time_idle,
+            "timestamp": self.timestamp().isoformat(),
+            **dict(zip(self.names, self.features)),
+            "next_floor_requested": self.next_floor_requested,
+        }
+
+    def __getitem__(self, name: str):
+        return self.as_dict()[name]
+
+    def __eq__(self, other):
+        if isinstance(other, (Snapshot, dict)):
+            return as_row(self) == as_row(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Snapshot({self.as_dict()})"
+
+
+# Row fields held by Snapshot attributes, the others are features
+ROW_FIELDS = ("simulation_id", "elevator_id", "current_floor", "last_floor", "time_idle", "next_floor_requested")
+
+
+def as_row(snapshot) -> dict:
+    """
+    Backend row of a Snapshot, dicts are already rows.
+    """
+    return snapshot.as_dict() if isinstance(snapshot, Snapshot) else snapshot
+
+
+class SnapshotBatch:
+    def __init__(
+        self,
+        simulation_id: int,
+        elevator_id: int,
+        start_datetime: datetime,
+        names: Tuple[str],
+        sim_times: np.ndarray,
+        current_floor,
+        last_floor,
+        time_idle,
+        next_floor_requested,
+        features: list,
+    ):
+        """
+        Snapshots of one elevator held as columns, as the numpy engine builds them.
+        Sinks take them with Sink.write_batch(): columnar sinks copy the columns at once,
+        the others get the Snapshot record of each row by iterating.
+
+        Args:
+            sim_times: Simulated time of each snapshot
+            current_floor, last_floor, time_idle, next_floor_requested: Columns of the row fields
+            features: Column of each feature of names, a NumPy array, a masked array or a list holding None for nulls,
+                histograms as a 2D array
+        """
+        self.simulation_id = simulation_id
+        self.elevator_id = elevator_id
+        self.start_datetime = start_datetime
+        self.names = names
+        self.sim_times = np.asarray(sim_times, dtype=float)
+        self.fields = {
+            "current_floor": current_floor,
+            "last_floor": last_floor,
+            "time_idle": time_idle,
+            "next_floor_requested": next_floor_requested,
+        }
+        self.features = features
+
+    def __len__(self) -> int:
+        return len(self.sim_times)
+
+    def __iter__(self):
+        """
+        Snapshot records of the rows, with Python values as built by Elevator.save_snapshot.
+        """
+        fields = {name: as_list(column) for name, column in self.fields.items()}
+        rows = zip(*[as_list(column) for column in self.features])
+        for k, (sim_time, features) in enumerate(zip(self.sim_times.tolist(), rows)):
+            yield Snapshot(
+                simulation_id=self.simulation_id,
+                elevator_id=self.elevator_id,
+                current_floor=fields["current_floor"][k],
+                last_floor=fields["last_floor"][k],
+                time_idle=fields["time_idle"][k],
+                sim_time=sim_time,
+                start_datetime=self.start_datetime,
+                names=self.names,
+                features=features,
+                next_floor_requested=fields["next_floor_requested"][k],
+            )
+
+    def column(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Values and null mask of a scalar column, the timestamp as microseconds since the epoch.
+        """
+        if name == TIMESTAMP:
+            column = [(self.start_datetime + timedelta(seconds=sim_time) - EPOCH) // MICROSECOND for sim_time in self.sim_times.tolist()]
+        elif name in ("simulation_id", "elevator_id"):
+            column = [getattr(self, name)] * len(self)
+        elif name in self.fields:
+            column = self.fields[name]
+        else:
+            column = self.features[self.names.index(name)]
+        if isinstance(column, np.ma.MaskedArray):
+            return column.filled(0), np.ma.getmaskarray(column)
+        if isinstance(column, np.ndarray):
+            return column, np.zeros(len(self), dtype=bool)
+        return np.asarray([0 if value is None else value for value in column]), np.asarray([value is None for value in column], dtype=bool)
+
+    def histograms(self) -> np.ndarray:
+        """
+        Histograms of the rows, a 2D array.
+        """
+        return np.asarray(self.features[self.names.index(HISTOGRAM)])
+
+
+def as_list(column) -> list:
+    return column.tolist() if isinstance(column, np.ndarray) else list(column)
+
+
+class SnapshotArray:
+    def __init__(self, columns: List[Tuple[str, str]], width: int, capacity: int):
+        """
+        Preallocated buffer of snapshots as a NumPy structured array, one fixed size row per snapshot.
+        The histogram is a fixed-width column (shorter histograms are zero padded, their length is kept),
+        the timestamp is int64 microseconds since the epoch and nulls are kept in a boolean mask.
+
+        Args:
+            columns: (name, NumPy dtype) of the scalar columns, e.g. ("time_idle", "f8"),
+                the timestamp column is always int64
+            width: Histogram width, the largest number of floors the buffer takes
+            capacity: Number of rows, the buffer is full once reached
+        """
+        self.columns = [(name, "i8" if name == TIMESTAMP else dtype) for name, dtype in columns]
+        self.capacity = capacity
+        self.width = 0
+        self.size = 0
+        self.data = None
+        self.widen(width)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def widen(self, width: int):
+        """
+        Reallocates the buffer for histograms of up to width floors, only while empty.
+        """
+        if self.size:
+            raise ValueError("Only an empty buffer can be widened")
+        self.width = width
+        self.data = np.zeros(self.capacity, dtype=[
+            *self.columns,
+            (HISTOGRAM, "i4", (width,)),
+            ("histogram_length", "i4"),
+            ("nulls", "?", (len(self.columns),)),
+        ])
+
+    def fits(self, snapshot: Snapshot) -> bool:
+        return len(snapshot.get(HISTOGRAM)) <= self.width
+
+    def append(self, snapshot: Snapshot):
+        """
+        Copies a snapshot into the next row, the buffer must not be full and the histogram must fit.
+        """
+        values = []
+        nulls = []
+        for name, _ in self.columns:
+            value = snapshot.timestamp_us() if name == TIMESTAMP else snapshot.get(name)
+            nulls.append(value is None)
+            values.append(0 if value is None else value)
+
+        histogram = snapshot.get(HISTOGRAM)
+        padded = list(histogram) + [0] * (self.width - len(histogram))
+        self.data[self.size] = (*values, padded, len(histogram), nulls)
+        self.size += 1
+
+    def extend(self, columns: dict, histograms: np.ndarray, start: int, stop: int):
+        """
+        Copies rows [start, stop) of a batch given as columns (SnapshotBatch.column of every scalar column)
+        and histograms into the next rows, they must fit.
+        """
+        rows = self.data[self.size:self.size + stop - start]
+        for index, (name, _) in enumerate(self.columns):
+            values, nulls = columns[name]
+            rows[name] = values[start:stop]
+            rows["nulls"][:, index] = nulls[start:stop]
+        rows[HISTOGRAM] = 0
+        rows[HISTOGRAM][:, :histograms.shape[1]] = histograms[start:stop]
+        rows["histogram_length"] = histograms.shape[1]
+        self.size += stop - start
+
+    def column(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Values and null mask of a scalar column, over the filled rows.
+        """
+        index = [column for column, _ in self.columns].index(name)
+        data = self.data[:self.size]
+        return data[name], data["nulls"][:, index]
+
+    def histograms(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        List offsets and flattened values of the histograms of the filled rows.
+        """
+        data = self.data[:self.size]
+        lengths = data["histogram_length"]
+        offsets = np.zeros(self.size + 1, dtype=np.int32)
+        np.cumsum(lengths, out=offsets[1:])
+        values = data[HISTOGRAM][np.arange(self.width) < lengths[:, None]]
+        return offsets, values
+
+    def clear(self):
+        self.size = 0
@@ -0,0 +1,226 @@
+from typing import Tuple
+import argparse
+import csv
+import math
+import os
+
+import numpy as np
+
+from params import SAMPLER_BATCH_SIZE
+
+# A trace file is a 16 bytes header followed by fixed size little endian records, by arrival time
+TRACE_MAGIC = b"ELVTRACE"
+TRACE_VERSION = 1
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("record_size", "<u4")])
+TRACE_DTYPE = np.dtype([("time", "<f8"), ("origin", "<i4"), ("destination", "<i4")])
+
+
+def trace_length(path: str) -> int:
+    """
+    Number of records of a trace file, checking its header.
+    """
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if len(header) != 1 or header["magic"][0] != TRACE_MAGIC:
+        raise ValueError(f"Not a trace file: {path}")
+    if header["version"][0] != TRACE_VERSION or header["record_size"][0] != TRACE_DTYPE.itemsize:
+        raise ValueError(f"Unsupported trace version: {header['version'][0]}")
+    length, remainder = divmod(os.path.getsize(path) - HEADER_DTYPE.itemsize, TRACE_DTYPE.itemsize)
+    if remainder:
+        raise ValueError(f"Truncated trace file: {path}")
+    return length
+
+
+def read_records(path: str, start: int, count: int) -> np.ndarray:
+    """
+    Copy of records [start, start + count) of a trace file, read through a memory map of just that window,
+    so reading a trace chunk by chunk keeps memory flat whatever its size.
+    """
+    if count <= 0:
+        return np.empty(0, dtype=TRACE_DTYPE)
+    window = np.memmap(path, dtype=TRACE_DTYPE, mode="r", offset=HEADER_DTYPE.itemsize + start * TRACE_DTYPE.itemsize, shape=(count,))
+    records = np.array(window)
+    del window # unmaps the window
+    return records
+
+
+class TraceWriter:
+    def __init__(self, path: str, buffer_size: int = SAMPLER_BATCH_SIZE):
+        """
+        Writes requests to a trace file, buffered in a record array.
+
+        Args:
+            path: Trace file, overwritten
+            buffer_size: Records buffered before they are written
+        """
+        self.path = path
+        self.file = open(path, "wb")
+        np.array([(TRACE_MAGIC, TRACE_VERSION, TRACE_DTYPE.itemsize)], dtype=HEADER_DTYPE).tofile(self.file)
+        self.buffer = np.empty(buffer_size, dtype=TRACE_DTYPE)
+        self.size = 0
+        self.records = 0
+        self.last_time = -math.inf
+
+    def write(self, time: float, origin: int, destination: int):
+        """
+        Appends one request, requests must come by arrival time.
+        """
+        if time < self.last_time:
+            raise ValueError("Trace records must be written by arrival time")
+        self.last_time = time
+        self.buffer[self.size] = (time, origin, destination)
+        self.size += 1
+        if self.size == len(self.buffer):
+            self.flush()
+
+    def write_many(self, times: np.ndarray, origins: np.ndarray, destinations: np.ndarray):
+        """
+        Appends requests given as arrays, by arrival time.
+        """
+        times = np.asarray(times, dtype=float)
+        if len(times) == 0:
+            return
+        if times[0] < self.last_time or np.any(np.diff(times) < 0):
+            raise ValueError("Trace records must be written by arrival time")
+        self.flush()
+        records = np.empty(len(times), dtype=TRACE_DTYPE)
+        records["time"], records["origin"], records["destination"] = times, origins, destinations
+        records.tofile(self.file)
+        self.records += len(records)
+        self.last_time = float(times[-1])
+
+    def flush(self):
+        self.buffer[:self.size].tofile(self.file)
+        self.records += self.size
+        self.size = 0
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceSampler:
+    def __init__(self, path: str, floors: tuple[int], batch_size: int = SAMPLER_BATCH_SIZE):
+        """
+        Replays the requests of a trace file, same interface as DemandSampler.
+
+        Records are streamed batch_size at a time through a memory map, so a trace of any size is
+        replayed with flat memory. Record times are seconds from the start of the run: interarrival
+        times are adjusted to the last bit so that simpy, which adds them up, arrives at exactly the
+        recorded times, and replaying a recorded run gives back its snapshots. After the last record
+        no request arrives anymore.
+
+        Args:
+            path: Trace file (see TraceWriter)
+            floors: Valid floor numbers, every request of the trace must be between them
+            batch_size: Records read at once
+        """
+        self.path = path
+        self.floors = np.asarray(floors)
+        self.batch_size = batch_size
+        self.length = trace_length(path)
+        self.read = 0 # records read so far
+
+        self.last_time = 0.0 # arrival time of the last request of the batches read
+        self.interarrivals = []
+        self.pairs = []
+        self.pos = 0
+
+    def read_batch(self, count: int) -> np.ndarray:
+        """
+        Next count records (fewer at the end of the trace), checked against the floors and time order.
+        """
+        records = read_records(self.path, self.read, min(count, self.length - self.read))
+        self.read += len(records)
+        times = records["time"]
+        if len(records) and (times[0] < self.last_time or np.any(np.diff(times) < 0)):
+            raise ValueError(f"Trace records are not by arrival time: {self.path}")
+        pairs = np.concatenate((records["origin"], records["destination"]))
+        if not np.all(np.isin(pairs, self.floors)) or np.any(records["origin"] == records["destination"]):
+            raise ValueError(f"Trace requests between invalid floors: {self.path}")
+        return records
+
+    def mean_rate(self) -> float:
+        """
+        Requests per second over the trace.
+        """
+        if self.length == 0:
+            return 0.0
+        last_time = float(read_records(self.path, self.length - 1, 1)["time"][0])
+        return self.length / last_time if last_time > 0 else 0.0
+
+    def interarrival_time(self) -> float:
+        """
+        Time to the next request of the trace, inf once it is over.
+        """
+        if self.pos == len(self.interarrivals):
+            records = self.read_batch(self.batch_size)
+            if not len(records):
+                return math.inf
+            times = records["time"]
+            self.interarrivals = exact_gaps(self.last_time, times).tolist()
+            self.pairs = list(zip(records["origin"].tolist(), records["destination"].tolist()))
+            self.last_time = float(times[-1])
+            self.pos = 0
+        self.pos += 1
+        return self.interarrivals[self.pos - 1]
+
+    def origin_destination(self) -> Tuple[int, int]:
+        """
+        Origin/destination pair of the request of the last interarrival time.
+        """
+        return self.pairs[self.pos - 1]
+
+    def requests_before(self, until: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Arrival times, origins and destinations of the remaining requests arriving before until, for the numpy engine.
+        """
+        chunks = []
+        while self.read < self.length:
+            records = self.read_batch(self.batch_size)
+            chunks.append(records[records["time"] < until])
+            self.last_time = float(records["time"][-1])
+            if self.last_time >= until:
+                break
+        records = np.concatenate(chunks) if chunks else np.empty(0, dtype=TRACE_DTYPE)
+        return records["time"].copy(), records["origin"].astype(np.int64), records["destination"].astype(np.int64)
+
+
+def exact_gaps(last_time: float, times: np.ndarray) -> np.ndarray:
+    """
+    Interarrival times that, added one by one from last_time, give exactly times.
+    Differences are off by an ulp now and then, they are nudged until the sum rounds to the recorded time.
+    """
+    previous = np.concatenate(([last_time], times[:-1]))
+    gaps = times - previous
+    while True:
+        sums = previous + gaps
+        off = sums != times
+        if not off.any():
+            return gaps
+        gaps[off] = np.nextafter(gaps[off], np.where(sums[off] < times[off], np.inf, -np.inf))
+
+
+def convert_csv(csv_path: str, trace_path: str, chunk_size: int = SAMPLER_BATCH_SIZE) -> int:
+    """
+    Converts a CSV log with time, origin and destination columns (seconds from the start, by time)
+    to a trace file, streaming it. Returns the number of records.
+    """
+    with open(csv_path, newline="") as f, TraceWriter(trace_path, buffer_size=chunk_size) as writer:
+        for row in csv.DictReader(f):
+            writer.write(float(row["time"]), int(row["origin"]), int(row["destination"]))
+        return writer.records + writer.size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converts a CSV request log (time, origin, destination) to a trace file")
+    parser.add_argument("csv", help="CSV log with a header row")
+    parser.add_argument("trace", help="trace file to write")
+    args = parser.parse_args()
+    print(f"[SYS] Wrote {convert_csv(args.csv, args.trace)} records to {args.trace}")
@@ -0,0 +1,8 @@
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Simulation modules import each other by name (as when run from simulation/)
+sys.path.insert(0, os.path.join(ROOT, "simulation"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
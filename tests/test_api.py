@@ -1,3 +1,7 @@
+import json
+
+import pytest
+
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -64,3 +68,319 @@ def test_get_requests_by_simulation():
     data = response.json()
     assert isinstance(data, list)
     assert any(req["id"] == request_id for req in data)
+
+
+def test_post_elevator_requests_bulk():
+    """
+    Test that the /elevator_requests/bulk endpoint stores many snapshots in one call.
+    Verifies the inserted count and that the rows are readable for the simulation.
+    """
+    payload = [
+        {
+            "simulation_id": simulation_id,
+            "current_floor": 1,
+            "last_floor": 2,
+            "time_idle": float(i),
+            "timestamp": f"2025-06-29T00:02:0{i}",
+            "floor_demand_histogram": [i, 0, 1, 0, 0],
+            "next_floor_requested": 4
+        }
+        for i in range(3)
+    ]
+    response = client.post("/elevator_requests/bulk", json=payload)
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 3
+
+    response = client.get(f"/elevator_request/{simulation_id}")
+    assert sum(req["next_floor_requested"] == 4 for req in response.json()) >= 3
+
+
+def test_get_requests_paginated():
+    """
+    Test keyset pagination of /elevator_request/{sim_id}: pages follow the id order without overlap.
+    """
+    all_ids = [req["id"] for req in client.get(f"/elevator_request/{simulation_id}").json()]
+    assert all_ids == sorted(all_ids)
+
+    first_page = client.get(f"/elevator_request/{simulation_id}", params={"limit": 2}).json()
+    assert [req["id"] for req in first_page] == all_ids[:2]
+
+    next_page = client.get(f"/elevator_request/{simulation_id}", params={"limit": 2, "after_id": first_page[-1]["id"]}).json()
+    assert [req["id"] for req in next_page] == all_ids[2:4]
+
+
+def test_stream_requests_ndjson():
+    """
+    Test that /elevator_request/{sim_id}/stream returns every row as one JSON object per line.
+    """
+    response = client.get(f"/elevator_request/{simulation_id}/stream")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    expected = client.get(f"/elevator_request/{simulation_id}").json()
+    assert [row["id"] for row in rows] == [req["id"] for req in expected]
+    assert rows[0]["timestamp"] == expected[0]["timestamp"]
+
+
+def test_export_arrow_and_parquet():
+    """
+    Test that /export returns the simulation requests as Arrow and Parquet,
+    with simulation parameters joined and the histogram expanded into fixed-width columns.
+    """
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    expected = client.get(f"/elevator_request/{simulation_id}").json()
+
+    response = client.get("/export", params={"simulation_ids": [simulation_id]})
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("id").to_pylist() == [req["id"] for req in expected]
+    assert table.column("expo_lambda").to_pylist()[0] == 0.1
+    assert [table.column(f"demand_floor_{k}")[0].as_py() for k in range(5)] == expected[0]["floor_demand_histogram"]
+
+    response = client.get("/export", params={"simulation_ids": [simulation_id], "format": "parquet"})
+    assert response.status_code == 200
+    assert pq.read_table(pa.BufferReader(response.content)).num_rows == len(expected)
+
+
+def test_async_ingestion_routes():
+    """
+    Test the async variants: create a simulation, bulk insert and read back with pagination.
+    """
+    response = client.post("/async/simulation", json={
+        "wait_time": 1.0,
+        "elevator_speed": 2.0,
+        "expo_lambda": 0.2,
+        "start_datetime": "2025-06-29T00:00:00",
+        "duration": 100,
+        "floor_min": 1,
+        "floor_max": 5,
+        "random_seed": 7
+    })
+    assert response.status_code == 200
+    async_sim_id = response.json()["id"]
+    assert client.get(f"/async/simulation/{async_sim_id}").json()["elevator_speed"] == 2.0
+
+    payload = [
+        {
+            "simulation_id": async_sim_id,
+            "current_floor": 1,
+            "last_floor": 3,
+            "time_idle": 1.5,
+            "timestamp": "2025-06-29T00:00:10",
+            "floor_demand_histogram": [1, 0, 0, 0, 0],
+            "next_floor_requested": floor
+        }
+        for floor in (2, 3, 4)
+    ]
+    response = client.post("/async/elevator_requests/bulk", json=payload)
+    assert response.json()["inserted"] == 3
+
+    page = client.get(f"/async/elevator_request/{async_sim_id}", params={"limit": 2}).json()
+    assert [req["next_floor_requested"] for req in page] == [2, 3]
+
+
+def test_post_elevator_request_write_behind(monkeypatch):
+    """
+    Test that with durable write-behind, concurrent single-row posts are acknowledged
+    after their batch is committed and are readable right away.
+    """
+    import write_behind
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.setattr(write_behind, "WRITE_BEHIND_MODE", "durable")
+    payload = {
+        "simulation_id": simulation_id,
+        "current_floor": 2,
+        "last_floor": 1,
+        "time_idle": 0.5,
+        "timestamp": "2025-06-29T00:03:00",
+        "floor_demand_histogram": [0, 1, 0, 0, 0],
+        "next_floor_requested": 5
+    }
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda _: client.post("/elevator_request", json=payload), range(16)))
+    write_behind.shutdown()
+
+    assert all(r.status_code == 200 and r.json() == {"status": "committed"} for r in responses)
+    rows = client.get(f"/elevator_request/{simulation_id}").json()
+    assert sum(req["next_floor_requested"] == 5 for req in rows) == 16
+
+
+def test_metrics_endpoint():
+    """
+    /metrics reports per route latency of the requests made so far and database statement latency.
+    """
+    client.get(f"/simulation/{simulation_id}")
+    data = client.get("/metrics").json()
+    route = data["requests"]["GET /simulation/{id}"]
+    assert route["count"] >= 1
+    assert sum(route["buckets"].values()) == route["count"]
+    assert data["db"]["count"] >= 1
+
+
+def test_simulation_stats():
+    """
+    Test that /simulation/{id}/stats summarizes the rows of a simulation, that the summary follows
+    new rows, and that /simulations/stats returns one summary per selected simulation.
+    """
+    rows = client.get(f"/elevator_request/{simulation_id}").json()
+    labeled = [req["next_floor_requested"] for req in rows if req["next_floor_requested"] is not None]
+
+    response = client.get(f"/simulation/{simulation_id}/stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["row_count"] == len(rows)
+    assert data["labeled_count"] == len(labeled)
+    assert data["time_idle_max"] == max(req["time_idle"] for req in rows)
+    assert {label["floor"]: label["count"] for label in data["label_distribution"]} == {
+        floor: labeled.count(floor) for floor in set(labeled)
+    }
+    assert abs(sum(label["share"] for label in data["label_distribution"]) - 1) < 1e-9
+    assert data["floor_demand_totals"] == rows[-1]["floor_demand_histogram"]
+
+    payload = {**{key: rows[0][key] for key in ("current_floor", "last_floor", "time_idle", "timestamp", "floor_demand_histogram")},
+               "simulation_id": simulation_id, "next_floor_requested": 2}
+    client.post("/elevator_requests/bulk", json=[payload])
+    assert client.get(f"/simulation/{simulation_id}/stats").json()["row_count"] == len(rows) + 1
+
+    summaries = client.get("/simulations/stats", params={"simulation_ids": [simulation_id]}).json()
+    assert [summary["simulation_id"] for summary in summaries] == [simulation_id]
+    assert client.get("/simulation/999999/stats").status_code == 404
+
+
+def test_stats_refresh_does_not_store_summaries_raced_by_ingestion(monkeypatch):
+    """
+    Test that a summary computed while an ingestion commits is served but not stored as current,
+    so the next read includes the new rows.
+    """
+    import stats
+
+    rows = client.get(f"/elevator_request/{simulation_id}").json()
+    payload = {**{key: rows[0][key] for key in ("current_floor", "last_floor", "time_idle", "timestamp", "floor_demand_histogram")},
+               "simulation_id": simulation_id, "next_floor_requested": 2}
+    client.post("/elevator_requests/bulk", json=[payload])
+
+    compute = stats.compute
+    def compute_then_ingest(db, simulation_ids):
+        summaries = compute(db, simulation_ids)
+        client.post("/elevator_requests/bulk", json=[payload])
+        return summaries
+
+    monkeypatch.setattr(stats, "compute", compute_then_ingest)
+    assert client.get(f"/simulation/{simulation_id}/stats").json()["row_count"] == len(rows) + 1
+    monkeypatch.setattr(stats, "compute", compute)
+    assert client.get(f"/simulation/{simulation_id}/stats").json()["row_count"] == len(rows) + 2
+
+
+def test_query_requests_filters_and_projects():
+    """
+    Test that /elevator_requests/query returns only the rows matching its filters,
+    with the selected columns, and joins simulation parameters.
+    """
+    rows = client.get(f"/elevator_request/{simulation_id}").json()
+    params = {"simulation_ids": [simulation_id], "columns": ["time_idle", "next_floor_requested"]}
+
+    response = client.get("/elevator_requests/query", params={**params, "next_floor_requested": 4, "max_time_idle": 1.0})
+    assert response.status_code == 200
+    expected = [req["id"] for req in rows if req["next_floor_requested"] == 4 and req["time_idle"] <= 1.0]
+    assert [row["id"] for row in response.json()] == expected
+    assert all(set(row) == {"id", "time_idle", "next_floor_requested"} for row in response.json())
+
+    matching = client.get("/elevator_requests/query", params={**params, "min_expo_lambda": 0.1, "max_floor_max": 5}).json()
+    assert len(matching) == len(rows)
+    assert client.get("/elevator_requests/query", params={**params, "min_elevator_speed": 100}).json() == []
+    assert client.get("/elevator_requests/query", params={"columns": ["not_a_column"]}).status_code == 422
+
+
+def test_simulation_reads_are_cached_with_etags():
+    """
+    Test that simulation reads carry an ETag and answer If-None-Match with a 304,
+    that creating a simulation invalidates the list, and that the list pages by id.
+    """
+    response = client.get(f"/simulation/{simulation_id}")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    not_modified = client.get(f"/simulation/{simulation_id}", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+
+    listing = client.get("/simulations")
+    assert client.get("/simulations", headers={"If-None-Match": listing.headers["etag"]}).status_code == 304
+    created = client.post("/simulation", json={key: value for key, value in response.json().items() if key != "id"}).json()
+    refreshed = client.get("/simulations", headers={"If-None-Match": listing.headers["etag"]})
+    assert refreshed.status_code == 200
+    assert created["id"] in [sim["id"] for sim in refreshed.json()]
+
+    page = client.get("/simulations", params={"after_id": simulation_id, "limit": 1}).json()
+    assert len(page) == 1 and page[0]["id"] > simulation_id
+
+
+def test_write_behind_fails_only_bad_rows():
+    """
+    Test that a row failing its INSERT only fails its own future, the rest of its batch is committed.
+    """
+    import write_behind
+    from datetime import datetime
+
+    buffer = write_behind.WriteBehindBuffer(max_rows=8, max_latency=10)
+    rows = [{
+        "simulation_id": simulation_id,
+        "current_floor": None if i in (2, 5) else 3, # NOT NULL violations
+        "last_floor": 1,
+        "time_idle": 0.25,
+        "timestamp": datetime(2025, 6, 29, 0, 4),
+        "floor_demand_histogram": [0, 1, 0, 0, 0],
+        "next_floor_requested": 4,
+    } for i in range(8)]
+    futures = [buffer.submit(row) for row in rows]
+    buffer.stop()
+
+    failed = [i for i, future in enumerate(futures) if future.exception() is not None]
+    assert failed == [2, 5]
+    rows = client.get(f"/elevator_request/{simulation_id}").json()
+    assert sum(req["time_idle"] == 0.25 for req in rows) == 6
+
+
+def test_failed_partition_leaves_no_simulation(monkeypatch):
+    """
+    Test that when the partition of a new simulation can not be created, the simulation row is not kept either.
+    """
+    import partitioning
+    from db import SessionLocal
+    from models import SimulationMetadata
+
+    def fail(db, simulation_id):
+        raise RuntimeError("partition creation failed")
+
+    monkeypatch.setattr(partitioning, "create_partition", fail)
+    with SessionLocal() as db:
+        before = db.query(SimulationMetadata).count()
+    response = TestClient(app, raise_server_exceptions=False).post("/simulation", json={
+        "wait_time": 1.0,
+        "elevator_speed": 1.0,
+        "expo_lambda": 0.1,
+        "start_datetime": "2025-06-29T00:00:00",
+        "duration": 100,
+        "base_floor": 1,
+        "base_floor_weight": 5,
+        "floor_min": 1,
+        "floor_max": 5,
+        "random_seed": 42
+    })
+    assert response.status_code == 500
+    with SessionLocal() as db:
+        assert db.query(SimulationMetadata).count() == before
+
+
+def test_write_behind_mode_is_validated():
+    """
+    Test that an unknown WRITE_BEHIND_MODE is refused instead of running in immediate mode.
+    """
+    import write_behind
+
+    assert [write_behind.parse_mode(mode) for mode in ("off", "durable", "immediate")] == ["off", "durable", "immediate"]
+    with pytest.raises(ValueError, match="WRITE_BEHIND_MODE"):
+        write_behind.parse_mode("durabel")
@@ -0,0 +1,50 @@
+from suite import run_suite, compare
+
+TINY = {
+    "simulation": {"floors": [5], "lambda_": [0.1], "duration": [300], "idle_mode": ["poll", "event"]},
+    "engine": {"floors": [5], "lambda_": [0.1], "duration": [300]},
+    "snapshot": {"floors": [5], "history": 500, "count": 100},
+    "sampling": {"sampling": ["python", "numpy"], "count": 1000},
+}
+
+
+def test_suite_reports_throughputs():
+    """
+    Test that a small run of the suite measures every simulator case with positive throughputs.
+    """
+    results = run_suite(TINY, repeat=1, api=False)
+    assert set(results) == {
+        "simulation/floors=5/lambda=0.1/duration=300/idle_mode=poll",
+        "simulation/floors=5/lambda=0.1/duration=300/idle_mode=event",
+        "engine/floors=5/lambda=0.1/duration=300/engine=simpy",
+        "engine/floors=5/lambda=0.1/duration=300/engine=numpy",
+        "snapshot/floors=5",
+        "sampling/python",
+        "sampling/numpy",
+    }
+    simulation = results["simulation/floors=5/lambda=0.1/duration=300/idle_mode=poll"]
+    assert simulation["events"] > 100
+    assert simulation["events_per_sec"] > 0 and simulation["sim_seconds_per_wall_second"] > 0
+    assert results["snapshot/floors=5"]["snapshots_per_sec"] > 0
+    numpy_engine = results["engine/floors=5/lambda=0.1/duration=300/engine=numpy"]
+    assert numpy_engine["snapshots"] == results["engine/floors=5/lambda=0.1/duration=300/engine=simpy"]["snapshots"]
+    assert numpy_engine["speedup"] > 0
+
+
+def test_compare_flags_throughput_drops_beyond_threshold():
+    """
+    Test that only throughputs that dropped past the threshold, in cases of both runs, are regressions.
+    """
+    baseline = {
+        "a": {"events_per_sec": 1000.0, "wall_seconds": 1.0},
+        "b": {"rows_per_sec": 500.0},
+        "gone": {"rows_per_sec": 500.0},
+    }
+    current = {
+        "a": {"events_per_sec": 850.0, "wall_seconds": 9.0}, # -15%, wall time is not a throughput
+        "b": {"rows_per_sec": 300.0}, # -40%
+        "new": {"rows_per_sec": 1.0},
+    }
+    regressions = compare(current, baseline, threshold=0.2)
+    assert [(case, metric) for case, metric, *_ in regressions] == [("b", "rows_per_sec")]
+    assert compare(current, baseline, threshold=0.1)[0][:2] == ("a", "events_per_sec")
@@ -0,0 +1,82 @@
+import pytest
+
+from sinks import HttpSink, JsonlSink
+from simulation import Simulation
+from test_simulation import FakeClient, ListSink, make_simulation
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashingSink(JsonlSink):
+    """
+    JSONL sink that fails after a number of snapshots, like a run killed halfway.
+    """
+    def __init__(self, directory, snapshots):
+        super().__init__(directory)
+        self.left = snapshots
+
+    def write_snapshot(self, snapshot):
+        if not self.left:
+            raise Crash()
+        self.left -= 1
+        super().write_snapshot(snapshot)
+
+
+@pytest.mark.parametrize("params", [
+    dict(),
+    dict(sampling="numpy"),
+    dict(elevators=3, policy="look", lambda_=0.3),
+])
+def test_resume_matches_uninterrupted_run(tmp_path, params):
+    """
+    Test that a run resumed from its last checkpoint after a crash writes exactly the files
+    of an uninterrupted run, and ends with the same KPIs.
+    """
+    params = {"sim_time": 20000, "floors": tuple(range(1, 11)), "lambda_": 0.05, "idle_mode": "event", **params}
+
+    with JsonlSink(str(tmp_path / "reference")) as sink:
+        reference = make_simulation(sink=sink, **params)
+        reference.post_metadata()
+        reference.run()
+
+    checkpoint_path = str(tmp_path / "checkpoint.pkl")
+    sink = CrashingSink(str(tmp_path / "resumed"), snapshots=150)
+    crashed = make_simulation(sink=sink, **params)
+    crashed.post_metadata()
+    with pytest.raises(Crash):
+        crashed.run(checkpoint_path=checkpoint_path, checkpoint_interval=1000)
+    sink.close()
+
+    with JsonlSink(str(tmp_path / "resumed")) as sink:
+        resumed = Simulation.resume(checkpoint_path, sink)
+        assert 0 < resumed.env.now < crashed.env.now
+        resumed.run(checkpoint_path=checkpoint_path, checkpoint_interval=1000)
+
+    for name in ("simulations.jsonl", "elevator_requests.jsonl"):
+        assert (tmp_path / "resumed" / name).read_bytes() == (tmp_path / "reference" / name).read_bytes()
+    assert resumed.kpis() == reference.kpis()
+
+
+def test_checkpoints_need_event_idle_mode_and_a_restorable_sink(tmp_path):
+    """
+    Test that checkpointing is refused in poll mode, and by sinks that can not roll back their output
+    before anything is written.
+    """
+    with pytest.raises(ValueError):
+        make_simulation(sink=ListSink()).run(checkpoint_path=str(tmp_path / "checkpoint.pkl"))
+
+    sink = ListSink()
+    with pytest.raises(ValueError):
+        make_simulation(sink=sink, idle_mode="event", sim_time=5000).run(
+            checkpoint_path=str(tmp_path / "checkpoint.pkl"), checkpoint_interval=100,
+        )
+    assert sink.snapshots == []
+
+    client = FakeClient()
+    with pytest.raises(ValueError):
+        make_simulation(sink=HttpSink(client), idle_mode="event", sim_time=5000).run(
+            checkpoint_path=str(tmp_path / "checkpoint.pkl"), checkpoint_interval=100,
+        )
+    assert client.batches == []
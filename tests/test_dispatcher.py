@@ -0,0 +1,88 @@
+from collections import deque
+
+from dispatcher import Dispatcher, FloorIndex
+from policies import UP, DOWN
+from test_simulation import ListSink, make_simulation
+
+
+class Car:
+    """
+    Stands in for Elevator, only the state the dispatcher reads.
+    """
+    def __init__(self, elevator_id, floor):
+        self.elevator_id = elevator_id
+        self.current_floor = floor
+        self.task_queue = deque()
+
+    def add_request(self, origin, destination):
+        self.task_queue.extend((origin, destination))
+
+    def pending_tasks(self):
+        return len(self.task_queue)
+
+    def tail(self):
+        if not self.task_queue:
+            return None
+        previous = self.task_queue[-2] if len(self.task_queue) > 1 else self.current_floor
+        return self.task_queue[-1], (UP if self.task_queue[-1] >= previous else DOWN)
+
+
+def test_floor_index_nearest():
+    """
+    Test that the floor index finds the closest car, on either side or on one side only.
+    """
+    index = FloorIndex()
+    index.add(0, 2)
+    index.add(1, 9)
+    index.add(2, 9)
+    assert index.nearest(7) == 1
+    assert index.nearest(5) == 0 # 3 floors away on both sides, lowest floor wins
+    assert index.nearest(7, side=DOWN) == 0
+    assert index.nearest(1, side=DOWN) is None
+
+    index.remove(1)
+    assert index.nearest(9, side=UP) == 2
+    index.remove(2)
+    assert index.floors == [2]
+
+
+def test_dispatcher_prefers_idle_then_same_direction_then_least_loaded():
+    """
+    Test the assignment order: nearest idle car, busy car heading the same way, least loaded car.
+    """
+    cars = [Car(0, 1), Car(1, 10), Car(2, 20)]
+    dispatcher = Dispatcher(cars, slack=1)
+
+    assert dispatcher.assign(12, 15).elevator_id == 1
+    assert dispatcher.assign(3, 1).elevator_id == 0
+    assert dispatcher.assign(19, 2).elevator_id == 2
+
+    # No idle car: car 1 ends going up at 15, below an up request from 16
+    assert dispatcher.assign(16, 18).elevator_id == 1
+    # Car 1 now has 2 more tasks than the others, out of slack
+    assert dispatcher.assign(17, 19).elevator_id == 0
+
+    # Finished tasks make a car idle again, at its floor
+    cars[2].task_queue.clear()
+    cars[2].current_floor = 2
+    dispatcher.update(cars[2])
+    assert dispatcher.assign(4, 8).elevator_id == 2
+
+
+def test_elevator_bank_simulation():
+    """
+    Test that a bank shares the demand stream: every car serves requests, snapshots are tagged
+    with their car and the metadata records the bank size.
+    """
+    for idle_mode in ("poll", "event"):
+        sink = ListSink()
+        sim = make_simulation(sink=sink, idle_mode=idle_mode, elevators=3, floors=tuple(range(1, 21)), lambda_=0.3, sim_time=2000)
+        metadata = {}
+        sink.write_metadata = lambda payload: metadata.update(payload) or 1
+        sim.post_metadata()
+        sim.run()
+
+        assert metadata["elevators"] == 3
+        assert {snapshot["elevator_id"] for snapshot in sink.snapshots} == {0, 1, 2}
+        assert all(snapshot["next_floor_requested"] is not None for snapshot in sink.snapshots)
+        assert all(e.features is sim.elevator.features for e in sim.elevators)
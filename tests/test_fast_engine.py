@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+import pytest
+
+from fast_engine import FastEngine
+from sinks import JsonlSink, ParquetSink
+from test_simulation import ListSink, make_simulation
+
+
+def run_engine(engine, **kwargs):
+    sink = ListSink()
+    sim = make_simulation(sink=sink, sampling="numpy", idle_mode="event", engine=engine, **kwargs)
+    sim.simulation_id = 1
+    sim.run()
+    return sink.snapshots
+
+
+@pytest.mark.parametrize("params", [
+    dict(),
+    dict(sim_time=20000, lambda_=0.02),
+    dict(sim_time=5000, lambda_=0.5), # saturated, long busy periods
+    dict(sim_time=5000, floors=tuple(range(1, 31)), speed_floors_per_sec=2.5, lambda_=0.05),
+    dict(sim_time=5000, floors=tuple(range(1, 11)), base_floor=4, base_floor_weight=10, lambda_=0.1),
+    dict(sim_time=3000, floors=(1, 2), lambda_=0.2),
+])
+@pytest.mark.parametrize("seed", [1, 31, 2024])
+def test_numpy_engine_matches_simpy_engine(params, seed):
+    """
+    Test that the numpy engine produces exactly the snapshots of the simpy engine under a shared seed.
+    """
+    simpy_snapshots = run_engine("simpy", seed=seed, **params)
+    numpy_snapshots = run_engine("numpy", seed=seed, **params)
+    assert simpy_snapshots
+    assert numpy_snapshots == simpy_snapshots
+
+
+def test_numpy_engine_needs_event_mode_and_numpy_sampling():
+    """
+    Test that the numpy engine refuses configurations it does not model.
+    """
+    with pytest.raises(ValueError):
+        make_simulation(engine="numpy", sampling="numpy", idle_mode="poll")
+    with pytest.raises(ValueError):
+        make_simulation(engine="numpy", sampling="python", idle_mode="event")
+
+
+@pytest.mark.parametrize("lambda_", [0.05, 0.12, 0.5])
+def test_vectorized_serve_matches_request_by_request(lambda_):
+    """
+    Test that the array recurrence of serve() gives the states, idle times and last floors of the
+    request by request loop, with whole second arrivals that often land exactly on done times.
+    """
+    sim = make_simulation(sampling="numpy", idle_mode="event", engine="numpy", floors=tuple(range(1, 9)), base_floor=3)
+    engine = FastEngine(sim)
+    rng = np.random.default_rng(7)
+    arrivals = np.cumsum(np.ceil(rng.exponential(1 / lambda_, 20000)))
+    origins = rng.integers(1, 9, len(arrivals))
+    destinations = (origins + rng.integers(1, 8, len(arrivals)) - 1) % 8 + 1
+    assert np.all(origins != destinations)
+
+    indices, idle_times, last_floors = engine.serve(arrivals, origins, destinations)
+    expected = engine.serve_sequential(arrivals.tolist(), origins.tolist(), destinations.tolist())
+    assert indices.tolist() == expected[0].tolist()
+    assert np.asarray(idle_times).tolist() == expected[1]
+    assert last_floors == expected[2]
+
+
+def test_numpy_engine_batches_match_in_columnar_sinks(tmp_path):
+    """
+    Test that snapshot batches copied as columns into a parquet file give the rows written one by one as JSON lines.
+    """
+    pq = pytest.importorskip("pyarrow.parquet")
+    for sink in (JsonlSink(str(tmp_path / "jsonl")), ParquetSink(str(tmp_path / "parquet"), row_group_size=7)):
+        with sink:
+            sim = make_simulation(sink=sink, sampling="numpy", idle_mode="event", engine="numpy", sim_time=5000, seed=5)
+            sim.post_metadata()
+            sim.run()
+
+    rows = [json.loads(line) for line in (tmp_path / "jsonl" / "elevator_requests.jsonl").read_text().splitlines()]
+    table = pq.read_table(tmp_path / "parquet" / "elevator_requests.parquet").to_pylist()
+    for row in table:
+        row["timestamp"] = row["timestamp"].isoformat()
+    assert len(rows) > 7 and table == rows
+    assert any(row["hot_floor_last_30s"] is None for row in rows)
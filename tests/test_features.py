@@ -0,0 +1,127 @@
+import math
+import random
+
+from features import DemandStats, SlidingWindow, Feature, FeatureEngine, register_feature, FEATURE_REGISTRY
+
+
+def direct_entropy(histogram: dict):
+    total = sum(histogram.values())
+    return -sum(c / total * math.log2(c / total) for c in histogram.values() if c)
+
+
+def test_demand_stats_match_full_recomputation():
+    """
+    Test that the running aggregates give the same entropy and mean as recomputing the histogram.
+    """
+    floors = tuple(range(1, 31))
+    stats = DemandStats(floors)
+    rng = random.Random(3)
+    assert stats.entropy() is None and stats.mean_floor() is None
+
+    for _ in range(2000):
+        stats.add(rng.choice(floors))
+        total = sum(stats.histogram.values())
+        assert stats.total == total
+        assert math.isclose(stats.mean_floor(), sum(f * c for f, c in stats.histogram.items()) / total)
+        assert math.isclose(stats.entropy(), direct_entropy(stats.histogram), abs_tol=1e-9)
+
+
+def test_single_floor_entropy_is_zero():
+    """
+    Test that a demand concentrated on one floor has zero (not negative) entropy.
+    """
+    stats = DemandStats((1, 2, 3))
+    for _ in range(1000):
+        stats.add(2)
+    assert stats.entropy() == 0.0
+
+
+def test_sliding_window_matches_rescan():
+    """
+    Test that the incrementally expired window gives the hot floor, entropy and rate of a rescan of the history.
+    """
+    floors = tuple(range(1, 11))
+    window = SlidingWindow(floors, 30.0)
+    rng = random.Random(5)
+    history = []
+    now = 0.0
+
+    for _ in range(3000):
+        now += rng.expovariate(0.3)
+        floor = rng.choice(floors[:4]) # few floors, many ties
+        if rng.random() < 0.5:
+            window.expire(now)
+            recent = {f: 0 for f in floors}
+            for t, f in history:
+                if t > now - 30.0:
+                    recent[f] += 1
+            total = sum(recent.values())
+            if total == 0:
+                assert window.hot_floor() is None and window.entropy() is None
+            else:
+                top = max(recent.values())
+                assert window.hot_floor() == min(f for f, c in recent.items() if c == top)
+                assert math.isclose(window.entropy(), direct_entropy(recent), abs_tol=1e-9)
+            assert window.rate() == total / 30.0
+        window.add(floor, now)
+        history.append((now, floor))
+
+
+def test_windowed_features_expire_with_time():
+    """
+    Test that windowed features forget requests older than their window when computed at a later time.
+    """
+    engine = FeatureEngine((1, 2, 3))
+    engine.add_request(3, now=0.0)
+    engine.add_request(2, now=10.0)
+    engine.add_request(2, now=20.0)
+
+    class Elevator:
+        current_floor = 1
+
+    values = engine.compute(Elevator(), now=25.0)
+    assert values["hot_floor_last_30s"] == 2
+    assert values["request_rate_last_30s"] == 3 / 30.0
+
+    values = engine.compute(Elevator(), now=45.0)
+    assert values["hot_floor_last_30s"] == 2
+    assert values["requests_entropy_last_30s"] == 0.0
+    assert values["floor_demand_histogram"] == [0, 2, 1] # cumulative features keep everything
+
+    values = engine.compute(Elevator(), now=60.0)
+    assert values["hot_floor_last_30s"] is None
+    assert values["request_rate_last_30s"] == 0.0
+
+
+def test_registered_feature_is_computed(monkeypatch):
+    """
+    Test that a feature added to the registry is updated on each request and shows up in compute().
+    """
+    monkeypatch.setattr("features.FEATURE_REGISTRY", dict(FEATURE_REGISTRY))
+
+    @register_feature
+    class LastRequestedFloor(Feature):
+        name = "last_requested_floor"
+
+        def __init__(self, floors):
+            super().__init__(floors)
+            self.last = None
+
+        def update(self, stats, floor, now):
+            self.last = floor
+
+        def value(self, stats, elevator):
+            return self.last
+
+    engine = FeatureEngine((1, 2, 3))
+    engine.add_request(3, now=1.0)
+    engine.add_request(2, now=2.0)
+
+    class Elevator:
+        current_floor = 1
+
+    values = engine.compute(Elevator())
+    assert values["last_requested_floor"] == 2
+    assert values["floor_demand_histogram"] == [0, 1, 1]
+    assert values["mean_requested_floor"] == 2.5
+    assert values["distance_to_center_of_mass"] == 1.5
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from policies import SortedFloors, Scan, Look, NearestRequest, UP, DOWN
+from test_simulation import ListSink, make_simulation
+
+
+def test_sorted_floors_neighbours():
+    """
+    Test that pending stops give the closest stop strictly above and below a floor.
+    """
+    stops = SortedFloors()
+    for floor in (7, 2, 9, 2):
+        stops.add(floor)
+    assert stops.floors == [2, 7, 9] and len(stops) == 3
+    assert stops.above(7) == 9 and stops.below(7) == 2
+    assert stops.above(9) is None and stops.below(2) is None
+    stops.discard(7)
+    assert 7 not in stops and stops.above(3) == 9
+
+
+def test_policy_targets():
+    """
+    Test where each policy heads from floor 5 going up, with stops at 3 and 6.
+    """
+    floors = tuple(range(1, 11))
+    stops = SortedFloors()
+    stops.add(3)
+    stops.add(6)
+    assert Scan(floors).next_target(stops, 5, UP) == (10, UP)
+    assert Scan(floors).next_target(stops, 10, UP) == (1, DOWN)
+    assert Look(floors).next_target(stops, 5, UP) == (6, UP)
+    assert Look(floors).next_target(stops, 7, UP) == (6, DOWN)
+    assert NearestRequest(floors).next_target(stops, 5, DOWN) == (6, UP)
+    assert NearestRequest(floors).next_target(stops, 4, DOWN) == (3, DOWN) # ties keep the direction
+
+
+@pytest.mark.parametrize("policy", ["fifo", "scan", "look", "nearest"])
+@pytest.mark.parametrize("elevators", [1, 3])
+def test_policies_serve_every_request(policy, elevators):
+    """
+    Test that every policy picks up and delivers the requests it gets, and snapshots keep being labeled.
+    """
+    sink = ListSink()
+    sim = make_simulation(sink=sink, policy=policy, elevators=elevators, floors=tuple(range(1, 16)), lambda_=0.2, sim_time=3000)
+    sim.run()
+    kpis = sim.kpis()
+
+    assert all(wait >= 0 for wait in sim.trips.waits)
+    assert kpis["picked_up"] > 100
+    assert sim.trips.delivered >= kpis["picked_up"] - 2 * elevators * 15 # at most the riders of the last trips
+    assert 0.0 <= kpis["idle_fraction"] <= 1.0
+    assert sink.snapshots and all(snapshot["next_floor_requested"] is not None for snapshot in sink.snapshots)
+
+
+def test_collective_policies_beat_fifo_under_load():
+    """
+    Test that serving stops on the way cuts waits when FIFO is saturated.
+    """
+    waits = {}
+    for policy in ("fifo", "look"):
+        sim = make_simulation(sink=ListSink(), policy=policy, idle_mode="event", floors=tuple(range(1, 21)), lambda_=0.2, sim_time=3600)
+        sim.run()
+        waits[policy] = sim.kpis()["mean_wait"]
+    assert waits["look"] < waits["fifo"] / 2
+
+
+def test_policy_travels_to_stops_and_keeps_the_previous_stop(caplog):
+    """
+    Test that with a policy a car travels straight to its next stop, stops for a call made on the way
+    at the next floor it reaches, and reports the floor of its previous stop as last_floor.
+    """
+    caplog.set_level("DEBUG", logger="elevator_sim.events")
+    sim = make_simulation(sink=ListSink(), policy="look", idle_mode="event", floors=tuple(range(1, 11)), lambda_=1e-9, log_level="DEBUG")
+    car = sim.elevator
+
+    def calls():
+        car.add_request(1, 8) # picked up at once, the car leaves floor 1 after holding 1 s
+        yield sim.env.timeout(3.0) # the car is at floor 3
+        car.add_request(5, 3)
+
+    sim.env.process(calls())
+    sim.env.run(until=100)
+
+    assert sim.trips.waits == [0.0, 2.0] # picked up at floor 5 on the way up
+    assert sim.trips.delivered == 2
+    moves = [json.loads(record.getMessage()) for record in caplog.records if '"move_start"' in record.getMessage()]
+    assert [(move["origin"], move["target"]) for move in moves] == [(1, 8), (3, 5), (5, 8), (8, 3), (3, 1)]
+    assert (car.current_floor, car.last_floor) == (1, 3) # rested at the base floor after the stop at 3
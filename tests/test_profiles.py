@@ -0,0 +1,124 @@
+import os
+
+import numpy as np
+import pytest
+
+from profiles import DemandProfile, ProfileSampler, od_matrix
+from test_simulation import ListSink, make_simulation
+
+OFFICE_DAY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "simulation", "demand_profiles", "office_day.json")
+
+
+@pytest.mark.parametrize("interpolation", ["constant", "linear"])
+def test_inversion_matches_cumulative_intensity(interpolation):
+    """
+    Test that arrival times invert the cumulative intensity exactly, across segments, zero rates and periods.
+    """
+    profile = DemandProfile([0, 100, 250, 300], [0.1, 1.0, 0.0, 0.5], interpolation=interpolation, period=400)
+    targets = np.linspace(0, 5 * profile.total, 2001)
+    times = profile.invert(targets)
+    assert np.all(np.diff(times) >= 0)
+    assert np.allclose(profile.cumulative(times), targets, atol=1e-9)
+    assert np.isclose(profile.cumulative(400.0), profile.total)
+
+
+@pytest.mark.filterwarnings("error")
+@pytest.mark.parametrize("interpolation", ["constant", "linear"])
+def test_open_ended_profile_totals(interpolation):
+    """
+    Test that without a period the total is inf when the last rate is positive and the finite sum when it is 0,
+    without NaN or warnings, and that targets past a finite total are never reached.
+    """
+    profile = DemandProfile([0, 100], [0.1, 0.5], interpolation=interpolation)
+    assert profile.total == np.inf
+    assert np.allclose(profile.cumulative(profile.invert([1.0, 50.0])), [1.0, 50.0])
+
+    profile = DemandProfile([0, 100], [0.1, 0.0], interpolation=interpolation)
+    assert profile.total == pytest.approx(10.0 if interpolation == "constant" else 5.0)
+    assert np.all(np.isinf(profile.invert([profile.total + 1, 100.0])))
+
+    with pytest.raises(ValueError):
+        DemandProfile([0], [0.0])
+
+
+@pytest.mark.filterwarnings("error")
+def test_sampler_gaps_are_infinite_once_demand_ends():
+    """
+    Test that past the end of a profile ending at rate 0 the sampler returns infinite gaps, batch after batch,
+    without NaN or warnings.
+    """
+    profile = DemandProfile([0, 100], [0.5, 0.0])
+    sampler = ProfileSampler(profile, (1, 2, 3), base_floor=1, seed=2, batch_size=16)
+    gaps = np.array([sampler.interarrival_time() for _ in range(200)])
+    finite = gaps[np.isfinite(gaps)]
+    assert len(finite) > 20 and np.all(finite >= 0) and finite.sum() <= 100
+    assert np.all(np.isinf(gaps[len(finite):]))
+
+
+def test_arrivals_follow_piecewise_rates():
+    """
+    Test that sampled arrivals are spread over segments in proportion to their rates, batch after batch.
+    """
+    profile = DemandProfile([0, 100], [0.1, 1.0], period=200)
+    sampler = ProfileSampler(profile, (1, 2, 3), base_floor=1, seed=3, batch_size=1000)
+    times = np.cumsum([sampler.interarrival_time() for _ in range(100000)])
+    in_period = np.mod(times, 200)
+    low, high = np.sum(in_period < 100), np.sum(in_period >= 100)
+    assert abs(low / high - 0.1) < 0.005
+    assert abs(len(times) / times[-1] - profile.mean_rate()) < 0.01
+
+
+def test_od_periods_follow_their_matrix():
+    """
+    Test that each request gets its pair from the OD spec of the period of its arrival.
+    """
+    only_up = [[0, 1, 0], [0, 0, 0], [0, 0, 0]] # 1 -> 2
+    only_down = [[0, 0, 0], [0, 0, 0], [1, 0, 0]] # 3 -> 1
+    profile = DemandProfile([0], [1.0], period=100, od=[(0, {"matrix": only_up}), (50, {"matrix": only_down})])
+    sampler = ProfileSampler(profile, (1, 2, 3), base_floor=1, seed=5)
+    now = 0.0
+    for _ in range(5000):
+        now += sampler.interarrival_time()
+        pair = sampler.origin_destination()
+        assert pair == ((1, 2) if now % 100 < 50 else (3, 1))
+
+
+def test_default_od_matches_base_floor_spike():
+    """
+    Test that origin/destination weights give the distribution of DemandGenerator: origin by weight,
+    then destination by weight among the other floors.
+    """
+    matrix = od_matrix({"origin_weights": {1: 3}, "destination_weights": {1: 3}}, (1, 2, 3, 4, 5))
+    assert np.allclose(matrix.sum(axis=1), [3 / 7, 1 / 7, 1 / 7, 1 / 7, 1 / 7])
+    assert np.isclose(matrix[0, 1], 3 / 7 * 1 / 4) # from the base floor, 4 other floors of weight 1
+    assert np.isclose(matrix[1, 0], 1 / 7 * 3 / 6) # to the base floor, among weights 3 + 1 + 1 + 1
+    assert np.all(np.diag(matrix) == 0)
+
+
+def test_simulated_day_from_config_is_reproducible():
+    """
+    Test that a full day runs from the example config, reproducibly by seed, with more demand at the peaks.
+    """
+    profile = DemandProfile.load(OFFICE_DAY)
+    runs = []
+    for _ in range(2):
+        sink = ListSink()
+        sim = make_simulation(
+            sink=sink, sim_time=86400, floors=tuple(range(1, 11)), idle_mode="event", elevators=6,
+            speed_floors_per_sec=2.0, demand_profile=profile,
+        )
+        sim.run()
+        runs.append(sink.snapshots)
+    assert runs[0] and runs[0] == runs[1]
+
+    hours = np.array([int(snapshot["timestamp"][11:13]) for snapshot in runs[0]])
+    assert np.sum(hours == 8) > 5 * np.sum(hours == 3)
+
+
+def test_profiles_need_the_simpy_engine():
+    """
+    Test that the numpy engine, which draws stationary demand, refuses a profile.
+    """
+    profile = DemandProfile([0], [0.1])
+    with pytest.raises(ValueError):
+        make_simulation(sink=ListSink(), engine="numpy", sampling="numpy", idle_mode="event", demand_profile=profile)
@@ -0,0 +1,63 @@
+from collections import Counter
+
+import numpy as np
+
+from sampling import AliasTable, DemandSampler
+
+
+def make_sampler(**kwargs):
+    params = dict(floors=tuple(range(1, 11)), lambda_=0.5, base_floor=1, base_floor_weight=3, seed=42)
+    params.update(kwargs)
+    return DemandSampler(**params)
+
+
+def test_alias_table_matches_weights():
+    """
+    Test that the alias table reproduces the weighted distribution.
+    """
+    table = AliasTable([10, 20, 30, 40], [1, 2, 3, 4])
+    samples = table.sample(np.random.default_rng(0).random(200000))
+    counts = Counter(samples.tolist())
+    for value, weight in zip([10, 20, 30, 40], [1, 2, 3, 4]):
+        assert abs(counts[value] / len(samples) - weight / 10) < 0.01
+
+
+def test_destination_never_equals_origin():
+    """
+    Test the per-origin tables: destination != origin and the base floor is still favored.
+    """
+    origins, destinations = make_sampler().origin_destinations(100000)
+    assert not np.any(origins == destinations)
+    assert abs(np.mean(origins == 1) - 3 / 12) < 0.01
+    assert abs(np.mean(destinations[origins == 5] == 1) - 3 / 11) < 0.02
+
+
+def test_sequence_is_reproducible_and_independent_of_batch_size():
+    """
+    Test that a seed gives the same requests whatever the batch size and the drawing pattern.
+    """
+    small, large = make_sampler(batch_size=7), make_sampler(batch_size=4096)
+    requests_small = [(small.interarrival_time(), small.origin_destination()) for _ in range(100)]
+    requests_large = [(large.interarrival_time(), large.origin_destination()) for _ in range(100)]
+    assert requests_small == requests_large
+
+    batch = make_sampler()
+    times = batch.interarrival_times(100).tolist()
+    origins, destinations = batch.origin_destinations(100)
+    assert list(zip(times, zip(origins.tolist(), destinations.tolist()))) == requests_small
+
+    assert make_sampler(seed=43).interarrival_times(5).tolist() != times[:5]
+
+
+def test_numpy_sampling_simulation_is_reproducible():
+    """
+    Test that simulations with numpy sampling give identical snapshots for the same seed.
+    """
+    from test_simulation import ListSink, make_simulation
+
+    runs = []
+    for _ in range(2):
+        sink = ListSink()
+        make_simulation(sim_time=2000, sampling="numpy", sink=sink).run()
+        runs.append(sink.snapshots)
+    assert runs[0] and runs[0] == runs[1]
@@ -0,0 +1,362 @@
+from datetime import datetime
+import json
+
+import pytest
+
+from api_client import ApiError, BackgroundUploader
+from sinks import Sink, HttpSink, JsonlSink, ParquetSink, make_sink
+from runner import build_runs, run_sweep
+from simulation import Simulation
+from snapshots import Snapshot
+from app.schemas import ElevatorRequestCreate
+
+
+class FakeClient:
+    """
+    Stands in for ApiClient, records posted batches or fails while down is set.
+    Batches with a row matching invalid are rejected with a 422.
+    """
+    def __init__(self, invalid=lambda row: False):
+        self.batches = []
+        self.down = False
+        self.invalid = invalid
+
+    def post(self, path, payload):
+        if self.down:
+            raise ApiError(f"Failed to post to {path}: 503 unavailable", 503)
+        if any(self.invalid(row) for row in payload):
+            raise ApiError(f"Failed to post to {path}: 422 invalid", 422)
+        self.batches.append((path, list(payload)))
+        return {"inserted": len(payload)}
+
+
+class ListSink(Sink):
+    """
+    Keeps metadata and snapshots in memory.
+    """
+    def __init__(self):
+        self.snapshots = []
+
+    def write_metadata(self, metadata):
+        return 1
+
+    def write_snapshot(self, snapshot):
+        self.snapshots.append(snapshot)
+
+
+def make_simulation(**kwargs):
+    params = dict(
+        sim_time=500,
+        floors=tuple(range(1, 6)),
+        speed_floors_per_sec=1.0,
+        lambda_=0.1,
+        base_floor=1,
+        start_datetime=datetime(2025, 6, 29),
+        seed=31,
+    )
+    params.update(kwargs)
+    return Simulation(**params)
+
+
+def test_uploader_batches_by_size(tmp_path):
+    """
+    Test that the uploader posts full batches of max_size and sends the remainder on close,
+    timing each HTTP post.
+    """
+    client = FakeClient()
+    uploader = BackgroundUploader(client, spool_path=str(tmp_path / "spool.jsonl"), max_size=3, max_interval=3600)
+    uploader.start()
+    for i in range(7):
+        uploader.add({"i": i})
+    uploader.close()
+
+    assert [len(batch) for _, batch in client.batches] == [3, 3, 1]
+    assert uploader.posted == 7
+    stats = uploader.stats()
+    assert stats["posted"] == 7 and stats["post_latency"]["count"] == 3
+    assert 0 < stats["post_latency"]["max"] <= stats["post_latency"]["sum"]
+
+
+def test_uploader_spools_and_replays(tmp_path):
+    """
+    Test that batches the backend fails to take are spooled instead of raising,
+    and that the spool is replayed, in order, once the backend is back.
+    """
+    client = FakeClient()
+    client.down = True
+    spool_path = tmp_path / "spool.jsonl"
+    uploader = BackgroundUploader(client, spool_path=str(spool_path), max_size=2, max_interval=3600, max_retries=1, backoff=0)
+    uploader.start()
+    for i in range(4):
+        uploader.add({"i": i})
+    uploader.close()
+
+    assert uploader.spooled == 4
+    assert len(spool_path.read_text().splitlines()) == 4
+
+    client.down = False
+    assert uploader.replay_spool() == 4
+    assert not spool_path.exists()
+    assert [row["i"] for _, batch in client.batches for row in batch] == [0, 1, 2, 3]
+
+
+def test_uploader_dead_letters_rejected_batches(tmp_path, caplog):
+    """
+    Test that a batch the backend rejects is neither retried nor spooled, sent or replayed:
+    it goes to the dead letter file, logged as a warning event, and the batches behind it are posted.
+    """
+    client = FakeClient(invalid=lambda row: row["i"] == 2)
+    spool_path = tmp_path / "spool.jsonl"
+    uploader = BackgroundUploader(client, spool_path=str(spool_path), max_size=2, max_interval=3600, max_retries=1, backoff=0)
+    uploader.start()
+    for i in range(6):
+        uploader.add({"i": i})
+    uploader.close()
+
+    assert (uploader.posted, uploader.spooled, uploader.rejected) == (4, 0, 2)
+    assert [json.loads(line)["i"] for line in (tmp_path / "spool.jsonl.rejected").read_text().splitlines()] == [2, 3]
+    events = [json.loads(record.getMessage()) for record in caplog.records if record.name == "elevator_sim.uploader"]
+    assert [(event["event"], event["rejected"]) for event in events] == [("upload_rejected", 2)]
+    assert all(record.levelname == "WARNING" for record in caplog.records)
+
+    uploader.spool([{"i": i} for i in range(6, 12)] + [{"i": 2}])
+    assert uploader.replay_spool() == 6
+    assert not spool_path.exists()
+    assert uploader.rejected == 3
+
+
+def test_uploader_spools_when_queue_is_full(tmp_path):
+    """
+    Test that snapshots beyond the queue size are spooled instead of piling up in memory.
+    """
+    client = FakeClient()
+    spool_path = tmp_path / "spool.jsonl"
+    uploader = BackgroundUploader(client, spool_path=str(spool_path), max_size=2, max_interval=3600, queue_size=3)
+    for i in range(5):
+        uploader.add({"i": i})
+    assert uploader.queue.qsize() == 3 and uploader.spooled == 2
+
+    uploader.start()
+    uploader.close()
+    assert not spool_path.exists()
+    assert sorted(row["i"] for _, batch in client.batches for row in batch) == [0, 1, 2, 3, 4]
+
+
+def test_simulation_posts_snapshots_in_bulk(tmp_path):
+    """
+    Test that a full run sends its labeled snapshots to the bulk endpoint, every row valid for its schema.
+    """
+    client = FakeClient()
+    sink = HttpSink(client, BackgroundUploader(client, spool_path=str(tmp_path / "spool.jsonl")))
+    sim = make_simulation(sink=sink)
+    sim.simulation_id = 1
+    sim.run()
+
+    assert client.batches
+    assert all(path == "/elevator_requests/bulk" for path, _ in client.batches)
+    rows = [row for _, batch in client.batches for row in batch]
+    assert all(row["next_floor_requested"] is not None for row in rows)
+    for row in rows:
+        ElevatorRequestCreate(**row)
+
+
+def test_http_sinks_of_workers_spool_apart(tmp_path, monkeypatch):
+    """
+    Test that HTTP sinks given part directories spool there, so worker processes never share a spool file.
+    """
+    monkeypatch.setenv("SNAPSHOT_SPOOL_PATH", str(tmp_path / "spool.jsonl"))
+    paths = []
+    for part in ("part-00000", "part-00001"):
+        with make_sink("http", str(tmp_path / part)) as sink:
+            paths.append(sink.uploader.spool_path)
+    assert paths == [str(tmp_path / "part-00000" / "spool.jsonl"), str(tmp_path / "part-00001" / "spool.jsonl")]
+    with make_sink("http") as sink:
+        assert sink.uploader.spool_path == str(tmp_path / "spool.jsonl")
+
+
+def test_jsonl_sink_runs_offline(tmp_path):
+    """
+    Test that a simulation can run end to end without the API, writing JSON lines.
+    """
+    with JsonlSink(str(tmp_path)) as sink:
+        sim = make_simulation(sink=sink)
+        sim.post_metadata()
+        sim.run()
+
+    simulations = [json.loads(line) for line in (tmp_path / "simulations.jsonl").read_text().splitlines()]
+    requests = [json.loads(line) for line in (tmp_path / "elevator_requests.jsonl").read_text().splitlines()]
+    assert simulations[0]["id"] == sim.simulation_id == 1
+    assert simulations[0]["random_seed"] == 31
+    assert requests and all(req["simulation_id"] == 1 for req in requests)
+
+
+def test_parquet_sink_matches_backend_schema(tmp_path):
+    """
+    Test that the parquet sink writes the ElevatorRequest columns in row groups.
+    """
+    pq = pytest.importorskip("pyarrow.parquet")
+    with ParquetSink(str(tmp_path), row_group_size=4) as sink:
+        sim = make_simulation(sink=sink)
+        sim.post_metadata()
+        sim.run()
+
+    table = pq.ParquetFile(tmp_path / "elevator_requests.parquet")
+    assert "floor_demand_histogram" in table.schema_arrow.names
+    assert table.metadata.num_row_groups > 1
+    assert all(len(hist) == 5 for hist in table.read().column("floor_demand_histogram").to_pylist())
+    assert pq.read_table(tmp_path / "simulations.parquet").column("id").to_pylist() == [1]
+
+
+def test_parquet_sink_matches_jsonl_rows(tmp_path):
+    """
+    Test that snapshots buffered in the fixed width array come out as the same rows as the JSON lines,
+    timestamps and nulls included, across buildings of different heights sharing a sink.
+    """
+    pq = pytest.importorskip("pyarrow.parquet")
+    runs = build_runs({"grid": {"floors": [8, 3, 12], "duration": [1500]}})
+    start = datetime(2025, 6, 29, 8, 30)
+    run_sweep(runs, workers=1, sink_kind="jsonl", output=str(tmp_path / "jsonl"), start_datetime=start, chunk_size=3)
+    run_sweep(runs, workers=1, sink_kind="parquet", output=str(tmp_path / "parquet"), start_datetime=start, chunk_size=3)
+
+    rows = [json.loads(line) for line in (tmp_path / "jsonl/part-00000/elevator_requests.jsonl").read_text().splitlines()]
+    table = pq.read_table(tmp_path / "parquet/part-00000/elevator_requests.parquet").to_pylist()
+    for row in table:
+        row["timestamp"] = row["timestamp"].isoformat()
+    assert table == rows
+    assert any(row["requests_entropy"] is None for row in rows)
+
+
+def test_snapshot_record_builds_backend_row():
+    """
+    Test that a snapshot record keeps numeric time and gives the backend row, and back.
+    """
+    snapshot = Snapshot(
+        simulation_id=3,
+        elevator_id=0,
+        current_floor=1,
+        last_floor=None,
+        time_idle=2.5,
+        sim_time=90.25,
+        start_datetime=datetime(2025, 6, 29),
+        names=("floor_demand_histogram", "requests_entropy"),
+        features=([1, 0, 2], None),
+        next_floor_requested=2,
+    )
+    row = snapshot.as_dict()
+    assert row["timestamp"] == "2025-06-29T00:01:30.250000"
+    assert row["floor_demand_histogram"] == [1, 0, 2] and row["requests_entropy"] is None
+    assert snapshot["next_floor_requested"] == 2
+    assert Snapshot.from_dict(row) == snapshot == row
+
+
+def test_sweep_grid_and_seeds():
+    """
+    Test that a sweep config expands its grid and spawns distinct seeds per run.
+    """
+    runs = build_runs({"grid": {"floors": [5, 10], "lambda_": [0.1, 0.5]}, "seeds_per_run": 3, "base_seed": 7})
+    assert len(runs) == 12
+    assert len({run["seed"] for run in runs}) == 12
+    assert build_runs({"grid": {"floors": [5]}, "seeds_per_run": 3, "base_seed": 7})[0]["seed"] == runs[0]["seed"]
+
+
+def test_sweep_is_reproducible_across_processes(tmp_path):
+    """
+    Test that a sweep on a process pool writes exactly the rows of a sequential sweep.
+    """
+    runs = build_runs({"grid": {"floors": [5, 8], "duration": [300]}, "seeds_per_run": 2})
+    start = datetime(2025, 6, 29)
+
+    ids_sequential = run_sweep(runs, workers=1, sink_kind="jsonl", output=str(tmp_path / "seq"), start_datetime=start)
+    ids_parallel = run_sweep(runs, workers=2, sink_kind="jsonl", output=str(tmp_path / "par"), start_datetime=start, chunk_size=1)
+
+    def read_rows(directory):
+        return sorted(line for path in directory.glob("part-*/elevator_requests.jsonl") for line in path.read_text().splitlines())
+
+    assert ids_sequential == ids_parallel == [1, 2, 3, 4]
+    assert read_rows(tmp_path / "seq") == read_rows(tmp_path / "par")
+
+
+def count_events(sim):
+    """
+    Runs the simulation counting processed simpy events.
+    """
+    count = 0
+    step = sim.env.step
+
+    def counting_step():
+        nonlocal count
+        count += 1
+        step()
+
+    sim.env.step = counting_step
+    sim.run()
+    return count
+
+
+def test_event_idle_mode_skips_polling():
+    """
+    Test that the event mode wakes the elevator on add_task instead of polling:
+    far fewer events, snapshots at the request time, and time_idle measured up to that time.
+    """
+    poll_sink, event_sink = ListSink(), ListSink()
+    poll_events = count_events(make_simulation(sim_time=5000, lambda_=0.01, sink=poll_sink))
+    event_events = count_events(make_simulation(sim_time=5000, lambda_=0.01, sink=event_sink, idle_mode="event"))
+
+    assert event_events * 10 < poll_events
+    assert event_sink.snapshots
+    for snapshot in event_sink.snapshots:
+        assert snapshot["current_floor"] == 1
+        assert snapshot["time_idle"] > 0
+        assert snapshot["next_floor_requested"] is not None
+    # Only the time of the label request is known, not quantized to the polling period
+    assert any(round(s["time_idle"] / 0.5, 6) % 1 for s in event_sink.snapshots)
+
+
+def test_metrics_count_events_and_snapshots():
+    """
+    Test that the run metrics match the engine: every event counted, every posted snapshot built first,
+    and one hand-off latency sample per sink call.
+    """
+    sink = ListSink()
+    sim = make_simulation(sim_time=2000, sink=sink)
+    events = count_events(sim)
+    metrics = sim.metrics.as_dict()
+
+    assert metrics["events_processed"] == events
+    assert metrics["snapshots_posted"] == len(sink.snapshots) > 0
+    assert metrics["snapshots_built"] >= metrics["snapshots_posted"] # poll mode overwrites unlabeled snapshots
+    assert metrics["handoff_latency"]["count"] == len(sink.snapshots)
+    assert 0 < metrics["handoff_latency"]["max"] <= metrics["handoff_latency"]["sum"]
+    assert metrics["sim_time"] == 2000
+    assert metrics["sim_wall_ratio"] > 0
+
+
+def test_event_log_is_quiet_by_default(caplog, capsys):
+    """
+    Test that a run prints and logs nothing by default, and emits JSON events with their simulated time when enabled.
+    """
+    caplog.set_level("DEBUG", logger="elevator_sim.events")
+    make_simulation(sim_time=300, sink=ListSink()).run()
+    assert not caplog.records
+    assert not capsys.readouterr().out
+
+    sim = make_simulation(sim_time=300, sink=ListSink(), log_level="INFO")
+    sim.post_metadata()
+    sim.run()
+    events = [json.loads(record.getMessage()) for record in caplog.records]
+    names = {event["event"] for event in events}
+    assert {"metadata_saved", "request", "snapshot_posted", "simulation_finished"} <= names
+    assert "move_start" not in names # DEBUG only
+    assert all(event["simulation_id"] == 1 for event in events)
+    assert all(0 <= event["sim_time"] <= 300 for event in events)
+
+
+def test_profile_hook_writes_stats(tmp_path):
+    """
+    Test that the profiling hook dumps cProfile stats of the run.
+    """
+    import pstats
+
+    path = tmp_path / "run.prof"
+    make_simulation(sim_time=300, sink=ListSink()).run(profile=str(path))
+    assert pstats.Stats(str(path)).total_calls > 0
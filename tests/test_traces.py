@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from traces import TraceSampler, TraceWriter, exact_gaps, read_records, trace_length
+from test_simulation import ListSink, make_simulation
+
+
+def test_replay_of_a_recorded_run_gives_its_snapshots(tmp_path):
+    """
+    Test that replaying the trace of a run, with any seed, gives back exactly its snapshots,
+    and that the replay records the same trace.
+    """
+    params = {"sim_time": 5000, "floors": tuple(range(1, 11)), "lambda_": 0.05, "idle_mode": "event"}
+    sink = ListSink()
+    make_simulation(sink=sink, **params).run(trace_path=str(tmp_path / "run.trace"))
+    assert sink.snapshots
+
+    replay_sink = ListSink()
+    replay = make_simulation(sink=replay_sink, **params, seed=7, demand_trace=str(tmp_path / "run.trace"))
+    replay.run(trace_path=str(tmp_path / "replay.trace"))
+    assert replay_sink.snapshots == sink.snapshots
+    assert (tmp_path / "replay.trace").read_bytes() == (tmp_path / "run.trace").read_bytes()
+
+
+def test_trace_gives_the_same_demand_across_engines_and_policies(tmp_path):
+    """
+    Test that a trace drives the simpy and numpy engines to the same snapshots, and every policy to the same requests.
+    """
+    path = str(tmp_path / "demand.trace")
+    params = {"sim_time": 5000, "floors": tuple(range(1, 11)), "idle_mode": "event", "demand_trace": path}
+    sink = ListSink()
+    make_simulation(sink=sink, sim_time=6000, floors=params["floors"], lambda_=0.05, sampling="numpy").run(trace_path=path)
+
+    simpy_sink, numpy_sink = ListSink(), ListSink()
+    make_simulation(sink=simpy_sink, **params).run()
+    make_simulation(sink=numpy_sink, engine="numpy", **params).run()
+    assert simpy_sink.snapshots and simpy_sink.snapshots == numpy_sink.snapshots
+
+    for policy in ("look", "nearest"):
+        recorded = str(tmp_path / f"{policy}.trace")
+        make_simulation(sink=ListSink(), elevators=3, policy=policy, **params).run(trace_path=recorded)
+        expected = read_records(path, 0, trace_length(path))
+        assert np.array_equal(read_records(recorded, 0, trace_length(recorded)), expected[expected["time"] < 5000])
+
+
+def test_trace_is_streamed_in_batches(tmp_path):
+    """
+    Test that a trace read a few records at a time replays every request at its recorded time, then stops.
+    """
+    path = str(tmp_path / "demand.trace")
+    rng = np.random.default_rng(3)
+    times = np.cumsum(rng.exponential(7.3, size=1000)) + 1e6 # large times make differences inexact
+    origins = rng.integers(1, 6, size=1000)
+    destinations = origins % 5 + 1
+    with TraceWriter(path, buffer_size=64) as writer:
+        for t, origin, destination in zip(times[:500].tolist(), origins[:500].tolist(), destinations[:500].tolist()):
+            writer.write(t, origin, destination)
+        writer.write_many(times[500:], origins[500:], destinations[500:])
+    assert trace_length(path) == 1000
+
+    sampler = TraceSampler(path, tuple(range(1, 6)), batch_size=37)
+    now = 0.0
+    for t, origin, destination in zip(times.tolist(), origins.tolist(), destinations.tolist()):
+        now += sampler.interarrival_time()
+        assert now == t and sampler.origin_destination() == (origin, destination)
+    assert sampler.interarrival_time() == np.inf
+    assert np.all(exact_gaps(0.0, times) > 0)
+
+
+def test_invalid_traces_are_refused(tmp_path):
+    """
+    Test that broken files, unordered records and unknown floors raise ValueError.
+    """
+    (tmp_path / "garbage.trace").write_bytes(b"not a trace at all")
+    with pytest.raises(ValueError):
+        trace_length(str(tmp_path / "garbage.trace"))
+
+    path = str(tmp_path / "demand.trace")
+    with TraceWriter(path) as writer:
+        writer.write(1.0, 1, 2)
+        with pytest.raises(ValueError):
+            writer.write(0.5, 2, 1)
+        writer.write(2.0, 1, 9)
+    with pytest.raises(ValueError):
+        TraceSampler(path, (1, 2, 3)).interarrival_time()
+
+    with open(path, "ab") as f:
+        f.write(b"\0" * 3)
+    with pytest.raises(ValueError):
+        trace_length(path)